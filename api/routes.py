@@ -1,11 +1,27 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import List, Optional
+import asyncio
+import json
+import time
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from pydantic import BaseModel
-from core.training import TrainingManager
-from core.models import FineTuningJob, TrainingConfig
+from config import config
+from core.catalog import get_dataset_catalog
+from core.inference import InferenceError, get_inference_server
+from core.training import get_training_manager
+from core.models import ExportConfig, FineTuningJob, JobStatus, Sweep, SweepConfig, SweepStatus, TrainingConfig
+from core.sweeps import sweep_cost
+from core.templates import resolve_template
+from core.uploads import DatasetValidationError, UploadManager, UploadOffsetError, UploadSession
 
 tuning_router = APIRouter()
 data_router = APIRouter()
+inference_router = APIRouter()
+
+upload_manager = UploadManager(config.DATA_DIR)
+
+# Bytes read per iteration when streaming a multipart upload to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 class TrainingRequest(BaseModel):
     model_name: str
@@ -15,29 +31,95 @@ class TrainingRequest(BaseModel):
     batch_size: int = 4
     num_epochs: int = 3
     max_length: int = 512
+    batching_strategy: Literal["padded", "dynamic", "packed"] = "padded"
+    prompt_template: Optional[str] = None
+    mask_prompt: bool = True
+    evaluation_strategy: Literal["steps", "epoch", "no"] = "steps"
+    eval_steps: int = 500
+    eval_dataset_path: Optional[str] = None
+    eval_holdout: float = 0.05
+    eval_max_samples: Optional[int] = 512
+    eval_batch_size: Optional[int] = None
+    eval_max_fraction: float = 0.1
+    cpu_bf16: bool = False
+    cpu_int8_base: bool = False
+    cpu_cores: Optional[List[int]] = None
+    cpu_threads: Optional[int] = None
+    dataloader_num_workers: int = 0
+    memory_gb: Optional[float] = None
+    priority: int = 0
 
 @tuning_router.post("/start")
 async def start_training(request: TrainingRequest):
     try:
-        training_manager = TrainingManager()
+        training_manager = get_training_manager()
         job_id = await training_manager.start_training(
             model_name=request.model_name,
             dataset_path=request.dataset_path,
-            config=TrainingConfig(**request.dict())
+            config=TrainingConfig(**request.dict(exclude={"priority"})),
+            priority=request.priority
         )
-        return {"job_id": job_id, "status": "started"}
+        job = await training_manager.get_job(job_id)
+        return {"job_id": job_id, "status": job.status}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class PrewarmRequest(BaseModel):
+    model_names: List[str]
+
+@tuning_router.post("/prewarm")
+async def prewarm_models(request: PrewarmRequest):
+    training_manager = get_training_manager()
+    training_manager.prewarm(request.model_names)
+    return {"status": "prewarming", "model_names": request.model_names}
+
+@tuning_router.get("/workers")
+async def list_workers():
+    """Queue state and, with WORKER_MODE=redis, the worker nodes with their capacity and jobs"""
+    training_manager = get_training_manager()
+    return training_manager.worker_status()
+
 @tuning_router.get("/jobs")
-async def list_jobs():
-    training_manager = TrainingManager()
-    jobs = await training_manager.get_all_jobs()
-    return {"jobs": jobs}
+async def list_jobs(
+    status: Optional[List[JobStatus]] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    view: str = Query("summary", pattern="^(summary|full)$"),
+):
+    training_manager = get_training_manager()
+    jobs, total = await training_manager.list_jobs(
+        statuses=status, limit=limit, offset=offset, full=view == "full"
+    )
+    return {"jobs": jobs, "total": total, "limit": limit, "offset": offset}
+
+@tuning_router.get("/jobs/stream")
+async def stream_jobs(request: Request):
+    """Server-sent events carrying coalesced job updates, at most one batch per JOB_STREAM_INTERVAL"""
+    training_manager = get_training_manager()
+    subscription = training_manager.events.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(timeout=15)
+                if batch:
+                    yield f"event: jobs\ndata: {json.dumps(batch)}\n\n"
+                    await asyncio.sleep(config.JOB_STREAM_INTERVAL)
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            training_manager.events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @tuning_router.get("/jobs/{job_id}")
 async def get_job_status(job_id: str):
-    training_manager = TrainingManager()
+    training_manager = get_training_manager()
     job = await training_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -45,34 +127,262 @@ async def get_job_status(job_id: str):
 
 @tuning_router.delete("/jobs/{job_id}")
 async def cancel_job(job_id: str):
-    training_manager = TrainingManager()
+    training_manager = get_training_manager()
     success = await training_manager.cancel_job(job_id)
     if not success:
         raise HTTPException(status_code=404, detail="Job not found")
     return {"status": "cancelled"}
 
+@tuning_router.post("/jobs/{job_id}/pause")
+async def pause_job(job_id: str):
+    """Pause a job; a running job saves a checkpoint first and reports ``paused`` when it has stopped"""
+    training_manager = get_training_manager()
+    job = await training_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await training_manager.pause_job(job_id):
+        raise HTTPException(status_code=409, detail=f"Job cannot be paused while {job.status.value}")
+    job = await training_manager.get_job(job_id)
+    return {"status": "paused" if job.status == JobStatus.PAUSED else "pausing"}
+
+class ResumeRequest(BaseModel):
+    priority: int = 0
+
+@tuning_router.post("/jobs/{job_id}/resume")
+async def resume_job(job_id: str, request: Optional[ResumeRequest] = None):
+    """Requeue a paused, failed or cancelled job from its latest checkpoint"""
+    training_manager = get_training_manager()
+    job = await training_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    priority = request.priority if request else 0
+    if not await training_manager.resume_job(job_id, priority=priority):
+        raise HTTPException(status_code=409, detail=f"Job cannot be resumed while {job.status.value}")
+    return {"status": "pending"}
+
+@tuning_router.post("/jobs/{job_id}/export")
+async def export_job(job_id: str, request: Optional[ExportConfig] = None):
+    """
+    Merge a completed job's adapter into its base model and write it as
+    sharded safetensors, optionally quantized; poll the job's ``metrics.export``
+    """
+    try:
+        export = await get_training_manager().export_job(job_id, request or ExportConfig())
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if export is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return export
+
+def _sweep_response(sweep: Sweep):
+    return {**sweep.model_dump(mode="json"), "cost": sweep_cost(sweep)}
+
+@tuning_router.post("/sweeps")
+async def start_sweep(config: SweepConfig):
+    """Start a hyperparameter sweep with one job per trial; trials are pruned by ASHA unless pruning is none"""
+    training_manager = get_training_manager()
+    try:
+        sweep = await training_manager.start_sweep(config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _sweep_response(sweep)
+
+@tuning_router.get("/sweeps")
+async def list_sweeps(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    training_manager = get_training_manager()
+    sweeps, total = await training_manager.list_sweeps(limit=limit, offset=offset)
+    return {"sweeps": [_sweep_response(sweep) for sweep in sweeps], "total": total, "limit": limit, "offset": offset}
+
+@tuning_router.get("/sweeps/{sweep_id}")
+async def get_sweep(sweep_id: str):
+    training_manager = get_training_manager()
+    sweep = await training_manager.get_sweep(sweep_id)
+    if not sweep:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    return _sweep_response(sweep)
+
+@tuning_router.delete("/sweeps/{sweep_id}")
+async def cancel_sweep(sweep_id: str):
+    training_manager = get_training_manager()
+    sweep = await training_manager.get_sweep(sweep_id)
+    if not sweep:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    if sweep.status != SweepStatus.RUNNING or not await training_manager.cancel_sweep(sweep_id):
+        raise HTTPException(status_code=409, detail=f"Sweep cannot be cancelled while {sweep.status.value}")
+    return {"status": "cancelled"}
+
+class UploadRequest(BaseModel):
+    filename: str
+    total_size: Optional[int] = None
+
+def _upload_status(session: UploadSession):
+    return {
+        "upload_id": session.upload_id,
+        "filename": session.filename,
+        "offset": session.offset,
+        "total_size": session.total_size,
+    }
+
 @data_router.post("/upload")
 async def upload_dataset(file: UploadFile = File(...)):
-    if not file.filename.endswith(('.json', '.csv', '.jsonl')):
-        raise HTTPException(status_code=400, detail="Only JSON, CSV, and JSONL files are supported")
-    
-    file_path = f"data/{file.filename}"
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-    
-    return {"filename": file.filename, "path": file_path}
+    try:
+        session = upload_manager.create(file.filename)
+    except DatasetValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def chunks():
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+    try:
+        await session.write(chunks(), offset=0)
+        dataset = await upload_manager.complete(session.upload_id)
+    except DatasetValidationError as e:
+        await upload_manager.abort(session.upload_id)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    get_dataset_catalog().register(dataset)
+    return {"filename": dataset.name, "path": dataset.path, "dataset": dataset}
+
+@data_router.post("/uploads")
+async def create_upload(request: UploadRequest):
+    """Start a chunked, resumable upload; send the body with PUT /uploads/{upload_id}"""
+    try:
+        session = upload_manager.create(request.filename, request.total_size)
+    except DatasetValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _upload_status(session)
+
+@data_router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    session = upload_manager.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return _upload_status(session)
+
+@data_router.put("/uploads/{upload_id}")
+async def append_upload(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """Append the raw request body, starting at ``offset``, streaming it straight to disk"""
+    session = upload_manager.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    try:
+        await session.write(request.stream(), offset=offset)
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DatasetValidationError as e:
+        await upload_manager.abort(upload_id)
+        raise HTTPException(status_code=400, detail=str(e))
+    return _upload_status(session)
+
+@data_router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    if upload_manager.get(upload_id) is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    try:
+        dataset = await upload_manager.complete(upload_id)
+    except DatasetValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    get_dataset_catalog().register(dataset)
+    return dataset
+
+@data_router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    if upload_manager.get(upload_id) is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    await upload_manager.abort(upload_id)
+    return {"status": "aborted"}
 
 @data_router.get("/datasets")
 async def list_datasets():
-    import os
-    datasets = []
-    if os.path.exists("data"):
-        for file in os.listdir("data"):
-            if file.endswith(('.json', '.csv', '.jsonl')):
-                datasets.append({
-                    "name": file,
-                    "path": f"data/{file}",
-                    "size": os.path.getsize(f"data/{file}")
-                })
-    return {"datasets": datasets}
\ No newline at end of file
+    catalog = get_dataset_catalog()
+    await catalog.maybe_refresh()
+    return {"datasets": catalog.list_datasets()}
+
+@data_router.post("/datasets/refresh")
+async def refresh_datasets():
+    return await get_dataset_catalog().refresh_async()
+
+@data_router.get("/storage")
+async def storage_usage(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """Disk usage of outputs, datasets and caches, deduplication savings and one page of jobs' output usage"""
+    janitor = get_training_manager().janitor
+    areas = {"outputs": config.DEFAULT_OUTPUT_DIR, "data": config.DATA_DIR, "cache": config.HF_CACHE_DIR}
+    return await asyncio.get_running_loop().run_in_executor(None, janitor.usage, areas, limit, offset)
+
+@data_router.post("/storage/cleanup")
+async def cleanup_storage(dry_run: bool = False):
+    """Apply the retention policies now; ``dry_run`` only reports what would be removed"""
+    janitor = get_training_manager().janitor
+    return await asyncio.get_running_loop().run_in_executor(None, janitor.run, dry_run)
+
+class GenerationRequest(BaseModel):
+    # The model of a completed job, or a base model
+    job_id: Optional[str] = None
+    model_name: Optional[str] = None
+    # A raw prompt, or an instruction (and input) formatted with prompt_template,
+    # which defaults to the job's template and then to "alpaca"
+    prompt: Optional[str] = None
+    instruction: Optional[str] = None
+    input: Optional[str] = None
+    prompt_template: Optional[str] = None
+    max_new_tokens: int = 128
+    temperature: float = 0.0
+    top_p: float = 1.0
+
+@inference_router.post("/generate")
+async def generate(request: GenerationRequest):
+    """Generate from a fine-tuned job's model; concurrent requests are batched by the inference worker"""
+    start = time.perf_counter()
+    if (request.job_id is None) == (request.model_name is None):
+        raise HTTPException(status_code=400, detail="Pass either job_id or model_name")
+    if (request.prompt is None) == (request.instruction is None):
+        raise HTTPException(status_code=400, detail="Pass either prompt or instruction")
+    if not 1 <= request.max_new_tokens <= config.INFERENCE_MAX_NEW_TOKENS:
+        raise HTTPException(
+            status_code=400, detail=f"max_new_tokens must be between 1 and {config.INFERENCE_MAX_NEW_TOKENS}"
+        )
+    if request.temperature < 0 or not 0 < request.top_p <= 1:
+        raise HTTPException(status_code=400, detail="temperature must be >= 0 and top_p in (0, 1]")
+
+    model_name, adapter_path = request.model_name, None
+    template = request.prompt_template
+    if request.job_id is not None:
+        job = await get_training_manager().get_job(request.job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.status != JobStatus.COMPLETED:
+            raise HTTPException(status_code=409, detail=f"Job cannot serve while {job.status.value}")
+        if (job.metrics or {}).get("storage", {}).get("status") == "removed":
+            raise HTTPException(status_code=410, detail="The job's model was removed by the retention policy")
+        export = (job.metrics or {}).get("export", {})
+        if export.get("status") == "completed":
+            # The merged export loads faster and needs no adapter
+            model_name = export["path"]
+        elif job.config.use_lora:
+            model_name, adapter_path = job.config.model_name, job.config.output_dir
+        else:
+            model_name = job.config.output_dir
+        template = template or job.config.prompt_template
+
+    prompt = request.prompt
+    if prompt is None:
+        try:
+            prompt = resolve_template(template or "alpaca").render(request.instruction, request.input)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        result = await get_inference_server().generate({
+            "model_name": model_name,
+            "adapter_path": adapter_path,
+            "prompt": prompt,
+            "max_new_tokens": request.max_new_tokens,
+            "temperature": request.temperature,
+            "top_p": request.top_p,
+        })
+    except InferenceError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {**result, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
@@ -1,11 +1,15 @@
+import asyncio
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 import uvicorn
+from core.inference import get_inference_server
 from core.models import FineTuningJob
-from core.training import TrainingManager
-from api.routes import tuning_router, data_router
+from core.prometheus import CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE
+from core.training import get_training_manager
+from api.routes import tuning_router, data_router, inference_router
+from config import config
 
 app = FastAPI(title="TuneSpace - LLM Fine-tuning Platform", version="1.0.0")
 
@@ -14,6 +18,7 @@ templates = Jinja2Templates(directory="templates")
 
 app.include_router(tuning_router, prefix="/api/tuning", tags=["tuning"])
 app.include_router(data_router, prefix="/api/data", tags=["data"])
+app.include_router(inference_router, prefix="/api/inference", tags=["inference"])
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -23,9 +28,32 @@ async def home(request: Request):
 async def dashboard(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
+@app.on_event("startup")
+async def prewarm_workers():
+    if config.PREWARM_MODELS:
+        get_training_manager().prewarm(config.PREWARM_MODELS)
+
+@app.on_event("startup")
+async def start_storage_janitor():
+    if config.CLEANUP_INTERVAL_MINUTES > 0:
+        janitor = get_training_manager().janitor
+        app.state.janitor_task = asyncio.create_task(janitor.run_periodically(config.CLEANUP_INTERVAL_MINUTES * 60))
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    janitor_task = getattr(app.state, "janitor_task", None)
+    if janitor_task is not None:
+        janitor_task.cancel()
+    get_training_manager().shutdown()
+    get_inference_server().shutdown()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    return Response(get_training_manager().prometheus_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=9090, reload=True)
\ No newline at end of file
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark of LoRA training throughput on CPU under the TrainingConfig CPU
+profiles (bf16 autocast, int8 base weights, thread counts) against the
+defaults, on a randomly initialized Llama model. With --concurrent, two jobs
+also run side by side, once sharing all cores and once pinned to disjoint
+halves.
+
+    python benchmarks/bench_cpu_training.py --hidden-size 512 --layers 4 --output cpu_training.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiny_model import build_tiny_model, word_corpus
+
+WORDS = ("the customer reports that our service page fails to load after login and the invoice "
+         "total is wrong please reset password billing account shipping label refund").split()
+
+PROFILES = {
+    "default": {},
+    "bf16": {"cpu_bf16": True},
+    "int8_base": {"cpu_int8_base": True},
+    "bf16_int8_base": {"cpu_bf16": True, "cpu_int8_base": True},
+}
+
+
+def write_dataset(path: str, samples: int, words: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(samples):
+            f.write(json.dumps({"text": " ".join(rng.choice(WORDS) for _ in range(words))}) + "\n")
+
+
+def train(model_dir: str, dataset_path: str, output_dir: str, batch_size: int, max_length: int,
+          profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one job in this process through the worker entry point and summarize its events"""
+    # Imported here so config picks up the HF_CACHE_DIR set by run()
+    from core.models import FineTuningJob, JobStatus, TrainingConfig
+    from core.model_registry import get_model_registry
+    from core.training_worker import run_training_worker
+
+    config = TrainingConfig(
+        model_name=model_dir,
+        dataset_path=dataset_path,
+        output_dir=output_dir,
+        batch_size=batch_size,
+        max_length=max_length,
+        num_epochs=1,
+        warmup_steps=0,
+        logging_steps=5,
+        save_steps=1_000_000,
+        evaluation_strategy="no",
+        batching_strategy="packed",
+        **profile,
+    )
+    job = FineTuningJob(job_id=os.path.basename(output_dir), status=JobStatus.PENDING,
+                        config=config, created_at=datetime.now())
+
+    events = queue.Queue()
+    start = time.perf_counter()
+    run_training_worker(job.model_dump(mode="json"), events)
+    seconds = time.perf_counter() - start
+
+    result: Dict[str, Any] = {"profile": profile, "wall_seconds": round(seconds, 3)}
+    while not events.empty():
+        _, kind, data = events.get()
+        if kind == "progress":
+            result["steps"] = data["current_step"]
+        elif kind == "log":
+            result.update({key: value for key, value in data.items() if key != "step"})
+        elif kind == "failed":
+            result["error"] = data["error"]
+
+    if result.get("steps"):
+        result["steps_per_second"] = round(result["steps"] / seconds, 3)
+    result["base_model_bytes"] = sum(entry["bytes"] for entry in get_model_registry().loaded())
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def run(hidden_size: int, layers: int, samples: int, batch_size: int, max_length: int,
+        threads: Optional[int], concurrent: bool) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "cpu_count": os.cpu_count(),
+        "model": {"hidden_size": hidden_size, "layers": layers},
+        "samples": samples,
+        "batch_size": batch_size,
+        "max_length": max_length,
+    }
+    ctx = mp.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["HF_CACHE_DIR"] = os.path.join(tmp, "cache")
+        model_dir = os.path.join(tmp, "model")
+        dataset_path = os.path.join(tmp, "data.jsonl")
+        build_tiny_model(model_dir, word_corpus(WORDS), hidden_size, layers)
+        write_dataset(dataset_path, samples, max_length)
+
+        # One fresh process per run so thread settings, caches and peak RSS do not carry over
+        profiles = dict(PROFILES)
+        if threads:
+            profiles = {name: {**profile, "cpu_threads": threads} for name, profile in profiles.items()}
+        for name, profile in profiles.items():
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                report[name] = pool.submit(
+                    train, model_dir, dataset_path, os.path.join(tmp, name), batch_size, max_length, profile
+                ).result()
+
+        if concurrent:
+            from core.cpu_profile import partition_cores
+
+            core_sets = partition_cores(2)
+            layouts = {"concurrent_shared": [None, None]}
+            if core_sets[0] is not None:
+                layouts["concurrent_pinned"] = core_sets
+            for name, layout in layouts.items():
+                with ProcessPoolExecutor(max_workers=2, mp_context=ctx) as pool:
+                    futures = [
+                        pool.submit(train, model_dir, dataset_path, os.path.join(tmp, f"{name}-{i}"),
+                                    batch_size, max_length, {"cpu_cores": cores} if cores else {})
+                        for i, cores in enumerate(layout)
+                    ]
+                    report[name] = [future.result() for future in futures]
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hidden-size", type=int, default=512, help="Hidden size of the random Llama model")
+    parser.add_argument("--layers", type=int, default=4, help="Number of decoder layers")
+    parser.add_argument("--samples", type=int, default=64, help="Number of training samples")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--max-length", type=int, default=256, help="Tokens per packed training sample")
+    parser.add_argument("--threads", type=int, help="cpu_threads for every profile (default: torch's choice)")
+    parser.add_argument("--concurrent", action="store_true", help="Also run two jobs at once, shared vs. pinned")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.hidden_size, args.layers, args.samples, args.batch_size, args.max_length,
+                 args.threads, args.concurrent)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark of EnterpriseDataProcessor.create_training_dataset (streaming,
+deduplicated JSONL) against the original in-memory shuffle and indented
+JSON dump, on synthetic records with injected exact and near duplicates.
+
+    python benchmarks/bench_dataset_writer.py --records 200000 --duplicates 0.1 --output writer.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_preparation_example import EnterpriseDataProcessor
+
+WORDS = ("the customer reports that our service page fails to load after login and the invoice "
+         "total is wrong please reset password billing account shipping label refund").split()
+
+
+def generate_records(count: int, duplicates: float, seed: int = 0) -> Iterator[Dict]:
+    """Yield records of which about ``duplicates`` are exact or one-word-changed copies of earlier ones"""
+    rng = random.Random(seed)
+    recent: List[Dict] = []
+    for i in range(count):
+        if recent and rng.random() < duplicates:
+            record = dict(rng.choice(recent))
+            if rng.random() < 0.5:
+                words = record["output"].split()
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+                record["output"] = " ".join(words)
+        else:
+            record = {
+                "instruction": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20))),
+                "input": "",
+                "output": " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))),
+                "source": "synthetic",
+            }
+            recent.append(record)
+            if len(recent) > 1000:
+                recent.pop(0)
+        yield record
+
+
+# Original implementation, kept verbatim as the baseline
+
+def legacy_create_training_dataset(processed_data: List[Dict], output_file: str, test_split: float = 0.1):
+    random.shuffle(processed_data)
+
+    split_idx = int(len(processed_data) * (1 - test_split))
+    train_data = processed_data[:split_idx]
+    test_data = processed_data[split_idx:]
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(train_data, f, ensure_ascii=False, indent=2)
+
+    test_file = output_file.replace('.json', '_test.json')
+    with open(test_file, 'w', encoding='utf-8') as f:
+        json.dump(test_data, f, ensure_ascii=False, indent=2)
+
+    return train_data, test_data
+
+
+def _max_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _read_jsonl(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def run(records: int, duplicates: float, shard_size: int, compression: str) -> Dict:
+    report = {"records": records, "injected_duplicate_fraction": duplicates}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.jsonl")
+        with open(source, "w", encoding="utf-8") as f:
+            for record in generate_records(records, duplicates):
+                f.write(json.dumps(record) + "\n")
+
+        # Streaming runs first, reading the source lazily, so its peak RSS is not inflated by the baseline
+        for label, dedup in [("streaming_no_dedup", False), ("streaming", True)]:
+            processor = EnterpriseDataProcessor()
+            start = time.perf_counter()
+            result = processor.create_training_dataset(
+                os.path.join(tmp, f"{label}.jsonl"),
+                records=_read_jsonl(source),
+                dedup=dedup,
+                shard_size=shard_size,
+                compression=compression,
+            )
+            report[label] = {
+                "wall_seconds": round(time.perf_counter() - start, 3),
+                "peak_rss_mb": _max_rss_mb(),
+                **{key: value for key, value in result.items() if not key.endswith("_files")},
+                "files": len(result["train_files"]) + len(result["test_files"]),
+            }
+
+        start = time.perf_counter()
+        data = list(_read_jsonl(source))
+        legacy_create_training_dataset(data, os.path.join(tmp, "legacy.json"))
+        report["legacy"] = {
+            "wall_seconds": round(time.perf_counter() - start, 3),
+            "peak_rss_mb": _max_rss_mb(),
+            "bytes": os.path.getsize(os.path.join(tmp, "legacy.json")),
+        }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100_000, help="Number of synthetic records")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Fraction of injected duplicates")
+    parser.add_argument("--shard-size", type=int, default=50_000, help="Records per output shard")
+    parser.add_argument("--compression", choices=["gzip"], help="Compress the output shards")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.records, args.duplicates, args.shard_size, args.compression)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Load test of generation with adapter hot-swapping and micro-batching. Builds
+a tiny random Llama model and LoRA adapters locally (no downloads) and drives
+an InferenceServer with a closed loop of concurrent clients that cycle
+through the adapters, so consecutive batches switch adapters. Every scenario
+reports p50/p99 latency and throughput; the default scenarios compare one
+request at a time with micro-batching.
+
+With --url the same load goes to /api/inference/generate of a running
+TuneSpace instead, for the completed jobs given with --job-id.
+
+    python benchmarks/bench_inference.py --concurrency 16 --requests 256 --output inference.json
+    python benchmarks/bench_inference.py --url http://localhost:9090 --job-id JOB_A --job-id JOB_B
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiny_model import build_tiny_model, word_corpus
+
+WORDS = ("the customer reports that our service page fails to load after login and the invoice "
+         "total is wrong please reset password billing account shipping label refund").split()
+
+Send = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def build_adapters(model_dir: str, root: str, count: int, r: int = 8, seed: int = 0) -> List[str]:
+    """Save ``count`` LoRA adapters with random (non-zero) weights, so each changes the model's output"""
+    import torch
+    from peft import LoraConfig, TaskType, get_peft_model
+    from transformers import AutoModelForCausalLM
+
+    base = AutoModelForCausalLM.from_pretrained(model_dir)
+    paths = []
+    for i in range(count):
+        torch.manual_seed(seed + i)
+        model = get_peft_model(base, LoraConfig(
+            task_type=TaskType.CAUSAL_LM, r=r, lora_alpha=2 * r,
+            target_modules=["q_proj", "k_proj", "v_proj", "o_proj"],
+        ))
+        for name, param in model.named_parameters():
+            if "lora_B" in name:
+                torch.nn.init.normal_(param, std=0.02)
+        path = os.path.join(root, f"adapter-{i}")
+        model.save_pretrained(path)
+        base = model.unload()
+        paths.append(path)
+    return paths
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_load(send: Send, payloads: List[Dict[str, Any]], total: int, concurrency: int) -> Dict[str, Any]:
+    """``concurrency`` clients each send a request as soon as their previous one returns, ``total`` in all"""
+    latencies: List[float] = []
+    results: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                results.append(await send(payloads[i % len(payloads)]))
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    if not latencies:
+        return {"errors": len(errors), "first_error": errors[0] if errors else None}
+    tokens = sum(result["completion_tokens"] for result in results)
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(len(latencies) / wall, 2),
+        "tokens_per_second": round(tokens / wall, 1),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.5) * 1000, 1),
+            "p90": round(_percentile(latencies, 0.9) * 1000, 1),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1),
+        },
+        "mean_batch_size": round(sum(r["batch_size"] for r in results) / len(results), 2),
+        "mean_queue_ms": round(sum(r.get("queue_ms", 0.0) for r in results) / len(results), 1),
+    }
+
+
+def make_prompts(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 48))) for _ in range(count)]
+
+
+async def run_local(args) -> Dict[str, Any]:
+    from core.inference import InferenceServer
+
+    report: Dict[str, Any] = {"scenarios": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = os.path.join(tmp, "model")
+        build_tiny_model(model_dir, word_corpus(WORDS), args.hidden_size, args.layers)
+        adapters = build_adapters(model_dir, tmp, args.adapters)
+        payloads = [{
+            "model_name": model_dir,
+            "adapter_path": adapters[i % len(adapters)] if adapters else None,
+            "prompt": prompt,
+            "max_new_tokens": args.max_new_tokens,
+            "temperature": 0.0,
+            "top_p": 1.0,
+        } for i, prompt in enumerate(make_prompts(max(64, args.adapters)))]
+
+        scenarios = {"unbatched": (0.0, 1), "batched": (args.window_ms, args.max_batch_size)}
+        for name, (window_ms, max_batch_size) in scenarios.items():
+            server = InferenceServer(batch_window=window_ms / 1000, max_batch_size=max_batch_size,
+                                     max_adapters=max(1, args.adapters))
+            try:
+                # Loads the model and every adapter before measuring
+                start = time.perf_counter()
+                for payload in payloads[:max(1, args.adapters)]:
+                    await server.generate(payload)
+                warmup = time.perf_counter() - start
+                result = await run_load(server.generate, payloads, args.requests, args.concurrency)
+            finally:
+                server.shutdown()
+            report["scenarios"][name] = {
+                "batch_window_ms": window_ms,
+                "max_batch_size": max_batch_size,
+                "warmup_seconds": round(warmup, 3),
+                **result,
+            }
+    return report
+
+
+async def run_remote(args) -> Dict[str, Any]:
+    import httpx
+
+    prompts = make_prompts(64)
+    payloads = [{
+        "job_id": args.job_id[i % len(args.job_id)],
+        "prompt": prompt,
+        "max_new_tokens": args.max_new_tokens,
+    } for i, prompt in enumerate(prompts)]
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client:
+        async def send(payload: Dict[str, Any]) -> Dict[str, Any]:
+            response = await client.post("/api/inference/generate", json=payload)
+            response.raise_for_status()
+            return response.json()
+
+        for job_id in args.job_id:
+            await send({**payloads[0], "job_id": job_id})
+        return {"scenarios": {"remote": await run_load(send, payloads, args.requests, args.concurrency)}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=256, help="Requests per scenario")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--adapters", type=int, default=2, help="Adapters the requests cycle through (0 for none)")
+    parser.add_argument("--window-ms", type=float, default=10, help="Batching window of the batched scenario")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--hidden-size", type=int, default=256, help="Hidden size of the random Llama model")
+    parser.add_argument("--layers", type=int, default=4, help="Number of decoder layers")
+    parser.add_argument("--url", help="Load test a running TuneSpace instead")
+    parser.add_argument("--job-id", action="append", default=[], help="Completed job to query (with --url)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if args.url and not args.job_id:
+        parser.error("--url needs at least one --job-id")
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    report = {"created_at": datetime.now().isoformat(timespec="seconds"), "params": params}
+    report.update(asyncio.run(run_remote(args) if args.url else run_local(args)))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
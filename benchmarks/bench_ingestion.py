@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark of EnterpriseDataProcessor ingestion against the original
+row-by-row (iterrows) implementation, on synthetic support tickets and
+chat logs.
+
+    python benchmarks/bench_ingestion.py --rows 200000 --output ingestion.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_preparation_example import EnterpriseDataProcessor
+
+CATEGORIES = ["billing", "technical", "account", "shipping", "general"]
+WORDS = "the customer reports that our service page fails to load after login and the invoice total is wrong".split()
+
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def write_tickets(path: str, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    pd.DataFrame({
+        "ticket_id": range(rows),
+        "subject": [_sentence(rng, 3, 8) for _ in range(rows)],
+        "description": [_sentence(rng, 10, 40) for _ in range(rows)],
+        "resolution": [_sentence(rng, 10, 40) if rng.random() > 0.1 else None for _ in range(rows)],
+        "category": [rng.choice(CATEGORIES) for _ in range(rows)],
+    }).to_csv(path, index=False)
+
+
+def write_chats(path: str, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    conversations = max(1, rows // 6)
+    pd.DataFrame({
+        "conversation_id": [f"c{rng.randrange(conversations)}" for _ in range(rows)],
+        "timestamp": [f"2024-01-01T{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}" for _ in range(rows)],
+        "role": [rng.choice(["customer", "agent"]) for _ in range(rows)],
+        "message": [_sentence(rng, 5, 30) for _ in range(rows)],
+    }).to_csv(path, index=False)
+
+
+# Original implementations, kept verbatim as the baseline
+
+def legacy_process_support_tickets(tickets_csv: str) -> List[Dict]:
+    df = pd.read_csv(tickets_csv)
+    processed = []
+
+    for _, row in df.iterrows():
+        if pd.isna(row['resolution']) or not row['resolution'].strip():
+            continue
+
+        instruction = f"Help resolve this {row['category']} issue: {row['subject']}"
+        input_text = row['description']
+        output_text = row['resolution']
+
+        processed.append({
+            "instruction": instruction,
+            "input": input_text,
+            "output": output_text,
+            "source": "support_tickets",
+            "category": row['category']
+        })
+
+    return processed
+
+
+def legacy_process_chat_logs(chat_csv: str) -> List[Dict]:
+    df = pd.read_csv(chat_csv)
+    conversations = {}
+
+    for _, row in df.iterrows():
+        conv_id = row['conversation_id']
+        if conv_id not in conversations:
+            conversations[conv_id] = []
+
+        conversations[conv_id].append({
+            "role": "user" if row['role'] == 'customer' else "assistant",
+            "content": row['message'],
+            "timestamp": row['timestamp']
+        })
+
+    processed = []
+    for conv_id, messages in conversations.items():
+        messages.sort(key=lambda x: x['timestamp'])
+
+        for i in range(0, len(messages)-1, 2):
+            if i+1 < len(messages) and messages[i]['role'] == 'user':
+                processed.append({
+                    "instruction": messages[i]['content'],
+                    "input": "",
+                    "output": messages[i+1]['content'],
+                    "source": "chat_logs",
+                    "conversation_id": conv_id
+                })
+
+    return processed
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(rows: int, workers: int = 1) -> Dict:
+    processor = EnterpriseDataProcessor()
+    report = {"rows": rows, "workers": workers}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tickets_csv = os.path.join(tmp, "tickets.csv")
+        chats_csv = os.path.join(tmp, "chats.csv")
+        write_tickets(tickets_csv, rows)
+        write_chats(chats_csv, rows)
+
+        for name, legacy, current, path in [
+            ("support_tickets", legacy_process_support_tickets,
+             functools.partial(processor.process_support_tickets, workers=workers), tickets_csv),
+            ("chat_logs", legacy_process_chat_logs,
+             functools.partial(processor.process_chat_logs, workers=workers), chats_csv),
+        ]:
+            expected, legacy_seconds = _timed(legacy, path)
+            actual, current_seconds = _timed(current, path)
+            report[name] = {
+                "records": len(actual),
+                "identical_output": actual == expected,
+                "legacy_seconds": round(legacy_seconds, 3),
+                "current_seconds": round(current_seconds, 3),
+                "speedup": round(legacy_seconds / current_seconds, 1) if current_seconds else None,
+            }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows per synthetic CSV")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used by the current implementation")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.rows, args.workers)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
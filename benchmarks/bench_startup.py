@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Startup time and memory of the API tier. Each scenario runs in a fresh
+interpreter, with a throwaway database and cache directory:
+
+- import: ``import app``, with its wall time, peak RSS and which heavy ML
+  libraries ended up loaded (the API process should load none of them)
+- worker: the same plus the training worker module, i.e. what the API
+  process would cost if it imported the training stack
+- serve: uvicorn serving ``app:app``, timed until /health answers, then the
+  latency of the first /health, /dashboard and job listing requests and
+  the server's RSS
+
+    python benchmarks/bench_startup.py --repeat 5 --output startup.json
+    python benchmarks/bench_startup.py --compare startup.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the API process must not import
+HEAVY_MODULES = ("torch", "transformers", "peft", "datasets", "accelerate", "safetensors", "numpy", "pandas")
+
+FIRST_REQUESTS = {
+    "health": "/health",
+    "dashboard": "/dashboard",
+    "jobs": "/api/tuning/jobs?view=summary",
+}
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+{extra}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def _environment(tmp: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        "HF_CACHE_DIR": os.path.join(tmp, "cache"),
+        "DEFAULT_OUTPUT_DIR": os.path.join(tmp, "models"),
+        "PREWARM_MODELS": "",
+        "PYTHONWARNINGS": "ignore",
+    }
+
+
+def measure_import(env: Dict[str, str], extra: str = "") -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(extra=extra, heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _get(url: str) -> float:
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=30) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def measure_serve(env: Dict[str, str], timeout: float) -> Dict[str, Any]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError("The API did not become ready")
+            try:
+                first_health = _get(base + "/health")
+                break
+            except OSError:
+                time.sleep(0.02)
+        ready = time.perf_counter() - start
+
+        first_requests = {"health": first_health}
+        for name, path in FIRST_REQUESTS.items():
+            if name not in first_requests:
+                first_requests[name] = _get(base + path)
+        return {
+            "ready_seconds": ready,
+            "first_request_ms": {name: seconds * 1000 for name, seconds in first_requests.items()},
+            "rss_mb": _rss_mb(process.pid),
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of every numeric field across runs, rounded; other fields from the last run"""
+    summary: Dict[str, Any] = {}
+    for key, value in runs[-1].items():
+        if isinstance(value, dict):
+            summary[key] = _summarize([run[key] for run in runs])
+        elif isinstance(value, (int, float)):
+            summary[key] = round(statistics.median(run[key] for run in runs), 3)
+        else:
+            summary[key] = value
+    return summary
+
+
+def run(repeat: int, scenarios: List[str], timeout: float) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"scenarios": {}}
+    for scenario in scenarios:
+        runs = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = _environment(tmp)
+                if scenario == "import":
+                    runs.append(measure_import(env))
+                elif scenario == "worker":
+                    runs.append(measure_import(env, "import core.training_worker"))
+                else:
+                    runs.append(measure_serve(env, timeout))
+        report["scenarios"][scenario] = _summarize(runs)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the report has the medians")
+    parser.add_argument("--scenario", action="append", choices=["import", "worker", "serve"],
+                        help="Scenarios to run (repeatable, default: all)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for the API to become ready")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    report = {"created_at": datetime.now().isoformat(timespec="seconds"), "params": params}
+    report.update(run(args.repeat, args.scenario or ["import", "worker", "serve"], args.timeout))
+    if args.compare:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from bench_training import compare
+
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+End-to-end training benchmark. Builds a tiny random Llama model locally (no
+downloads), scales sample_datasets/enterprise_sample.json up synthetically
+and runs two jobs through the API and TrainingManager: a cold one that loads
+the model and tokenizes the dataset, and a warm one that reuses both. While
+the jobs run, the job endpoints are polled to measure API latency.
+
+The JSON report records the commit it ran on; pass an earlier report with
+--compare to add the relative change of every metric.
+
+    python benchmarks/bench_training.py --records 2000 --output training.json
+    python benchmarks/bench_training.py --records 2000 --compare training.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tiny_model import build_tiny_model
+
+SAMPLE_PATH = os.path.join(ROOT, "sample_datasets", "enterprise_sample.json")
+
+# Endpoints polled while jobs run; {job_id} is filled in
+API_ENDPOINTS = {
+    "job": "/api/tuning/jobs/{job_id}",
+    "jobs_summary": "/api/tuning/jobs?view=summary",
+    "health": "/health",
+    "prometheus": "/metrics",
+}
+
+
+def format_record(record: Dict[str, str]) -> str:
+    parts = [f"### Instruction:\n{record['instruction']}"]
+    if record.get("input"):
+        parts.append(f"### Input:\n{record['input']}")
+    parts.append(f"### Response:\n{record['output']}")
+    return "\n\n".join(parts)
+
+
+def synthesize(samples: List[Dict[str, str]], count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    ``count`` variations of ``samples``: numbers are redrawn, response
+    sentences shuffled and occasionally borrowed from another sample, so
+    texts differ while keeping the sample's vocabulary and length profile.
+    """
+    rng = random.Random(seed)
+    sentences = [re.split(r"(?<=[.!?])\s+", sample["output"]) for sample in samples]
+
+    def renumber(text: str) -> str:
+        return re.sub(r"\d+", lambda m: str(rng.randint(1, 10 ** len(m.group())) - 1), text)
+
+    records = []
+    for i in range(count):
+        index = rng.randrange(len(samples))
+        output = list(sentences[index])
+        rng.shuffle(output)
+        if rng.random() < 0.3:
+            output.append(rng.choice(rng.choice(sentences)))
+        records.append({
+            "instruction": renumber(samples[index]["instruction"]),
+            "input": renumber(samples[index].get("input", "")),
+            "output": renumber(" ".join(output)),
+        })
+    return records
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def percentile(q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(0.5) * 1000, 3),
+        "p95_ms": round(percentile(0.95) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_job(client, request: Dict[str, Any], latencies: Dict[str, List[float]],
+            poll_interval: float, timeout: float) -> Dict[str, Any]:
+    """Start a job through the API and poll it until it finishes, timing every request"""
+    start = time.perf_counter()
+    response = client.post("/api/tuning/start", json=request)
+    latencies.setdefault("start", []).append(time.perf_counter() - start)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    job: Dict[str, Any] = {}
+    while time.perf_counter() - start < timeout:
+        for name, path in API_ENDPOINTS.items():
+            request_start = time.perf_counter()
+            response = client.get(path.format(job_id=job_id))
+            latencies.setdefault(name, []).append(time.perf_counter() - request_start)
+            if name == "job":
+                job = response.json()
+        if job.get("status") in ("completed", "failed", "cancelled", "paused"):
+            break
+        time.sleep(poll_interval)
+    wall_seconds = time.perf_counter() - start
+
+    metrics = job.get("metrics") or {}
+    phases = metrics.get("phases") or {}
+
+    def phase_seconds(*names: str) -> Optional[float]:
+        seconds = [phases[name]["wall_seconds"] for name in names if name in phases]
+        return round(sum(seconds), 4) if seconds else None
+
+    train_seconds = phase_seconds("train")
+    return {
+        "status": job.get("status"),
+        "error": job.get("error_message"),
+        "steps": job.get("current_step"),
+        "wall_seconds": round(wall_seconds, 3),
+        "load_seconds": phase_seconds("tokenizer_load", "model_load", "lora_wrap"),
+        "tokenize_seconds": phase_seconds("dataset_load", "tokenize"),
+        "tokenized_cache_hit": metrics.get("tokenized_cache_hit"),
+        "train_seconds": train_seconds,
+        "steps_per_second": (
+            round(job["current_step"] / train_seconds, 3) if train_seconds and job.get("current_step") else None
+        ),
+        "tokens_per_second": metrics.get("tokens_per_second"),
+        "loss": metrics.get("loss"),
+        "phases": phases,
+    }
+
+
+def run(records: int, hidden_size: int, layers: int, batch_size: int, max_length: int,
+        batching_strategy: str, poll_interval: float, timeout: float) -> Dict[str, Any]:
+    import torch
+    import transformers
+
+    report: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "platform": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "params": {
+            "records": records,
+            "hidden_size": hidden_size,
+            "layers": layers,
+            "batch_size": batch_size,
+            "max_length": max_length,
+            "batching_strategy": batching_strategy,
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before config is imported; workers inherit them
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "HF_CACHE_DIR": os.path.join(tmp, "cache"),
+            "MAX_CONCURRENT_JOBS": "1",
+            "AUTO_RESUME_JOBS": "false",
+            "PREWARM_MODELS": "",
+        })
+
+        with open(SAMPLE_PATH, "r", encoding="utf-8") as f:
+            samples = json.load(f)
+        start = time.perf_counter()
+        texts = [format_record(record) for record in synthesize(samples, records)]
+        dataset_path = os.path.join(tmp, "train.jsonl")
+        with open(dataset_path, "w", encoding="utf-8") as f:
+            for text in texts:
+                f.write(json.dumps({"text": text}) + "\n")
+        report["dataset"] = {
+            "records": records,
+            "bytes": os.path.getsize(dataset_path),
+            "generate_seconds": round(time.perf_counter() - start, 3),
+        }
+
+        model_dir = os.path.join(tmp, "model")
+        start = time.perf_counter()
+        build_tiny_model(model_dir, texts[:2000], hidden_size, layers, max_positions=max(512, max_length))
+        report["model_build_seconds"] = round(time.perf_counter() - start, 3)
+
+        # The app resolves templates and static files relative to the working directory
+        os.chdir(ROOT)
+        from fastapi.testclient import TestClient
+        from app import app
+
+        latencies: Dict[str, List[float]] = {}
+        with TestClient(app) as client:
+            for label in ("cold", "warm"):
+                report[label] = run_job(client, {
+                    "model_name": model_dir,
+                    "dataset_path": dataset_path,
+                    "output_dir": os.path.join(tmp, label),
+                    "batch_size": batch_size,
+                    "num_epochs": 1,
+                    "max_length": max_length,
+                    "batching_strategy": batching_strategy,
+                }, latencies, poll_interval, timeout)
+        # Leaving the client shuts the workers down, so their usage is in RUSAGE_CHILDREN
+
+    report["api_latency"] = {name: _percentiles(values) for name, values in latencies.items()}
+    report["memory"] = {
+        "api_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "worker_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    return report
+
+
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change of every numeric metric present in both reports (+0.25 means 25% higher)"""
+    current, previous = _flatten(report), _flatten(baseline)
+    changes = {
+        key: round(current[key] / previous[key] - 1, 4)
+        for key in sorted(current.keys() & previous.keys())
+        if not key.startswith(("params.", "platform.")) and not key.endswith(".count") and previous[key]
+    }
+    return {"baseline_commit": baseline.get("commit"), "changes": changes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=2000, help="Synthetic records generated from the sample")
+    parser.add_argument("--hidden-size", type=int, default=64, help="Hidden size of the random Llama model")
+    parser.add_argument("--layers", type=int, default=2, help="Number of decoder layers")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--batching-strategy", choices=["padded", "dynamic", "packed"], default="padded")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="Seconds between API polls")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds to wait for each job")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    # run() changes the working directory
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    report = run(args.records, args.hidden_size, args.layers, args.batch_size, args.max_length,
+                 args.batching_strategy, args.poll_interval, args.timeout)
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Builds small, randomly initialized causal LMs for benchmarks, so they run
+offline and are identical on every machine for the same arguments.
+"""
+
+import random
+from typing import Iterable, List
+
+
+def build_tiny_model(path: str, texts: Iterable[str], hidden_size: int = 64, layers: int = 2,
+                     vocab_size: int = 1000, max_positions: int = 2048, seed: int = 0):
+    """Save a random Llama model and a byte-level BPE tokenizer trained on ``texts`` to ``path``"""
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel()
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(
+        list(texts), trainers.BpeTrainer(vocab_size=vocab_size, special_tokens=["<unk>", "<s>", "</s>"])
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token="<unk>", bos_token="<s>", eos_token="</s>",
+        model_input_names=["input_ids", "attention_mask"],
+    )
+    tokenizer.save_pretrained(path)
+
+    heads = max(1, hidden_size // 64)
+    torch.manual_seed(seed)
+    model = LlamaForCausalLM(LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 11 // 4,
+        num_hidden_layers=layers,
+        num_attention_heads=heads,
+        num_key_value_heads=heads,
+        max_position_embeddings=max_positions,
+    ))
+    model.save_pretrained(path)
+
+
+def word_corpus(words: List[str], count: int = 500, length: int = 50, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(words) for _ in range(length)) for _ in range(count)]
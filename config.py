@@ -13,13 +13,41 @@ class Config:
     
     HF_TOKEN = os.getenv('HF_TOKEN')
     HF_CACHE_DIR = os.getenv('HF_CACHE_DIR', './cache')
+    TOKENIZED_CACHE_DIR = os.path.join(HF_CACHE_DIR, 'tokenized')
+    TOKENIZED_CACHE_MAX_GB = float(os.getenv('TOKENIZED_CACHE_MAX_GB', '20'))
+    # Deduplicated files are hard links into this directory, so it must share a filesystem with outputs and data
+    BLOB_STORE_DIR = os.getenv('BLOB_STORE_DIR', os.path.join(HF_CACHE_DIR, 'blobs'))
+    DEDUP_MIN_BYTES = int(os.getenv('DEDUP_MIN_BYTES', str(64 * 1024)))
     
     WANDB_API_KEY = os.getenv('WANDB_API_KEY')
     WANDB_PROJECT = os.getenv('WANDB_PROJECT', 'tunespace')
     
     DEFAULT_OUTPUT_DIR = os.getenv('DEFAULT_OUTPUT_DIR', './models')
     MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', '2'))
+    PIN_WORKER_CORES = os.getenv('PIN_WORKER_CORES', 'False').lower() == 'true'
+    MODEL_CACHE_MAX_GB = float(os.getenv('MODEL_CACHE_MAX_GB', '8'))
+    PREWARM_MODELS = [m for m in os.getenv('PREWARM_MODELS', '').split(',') if m]
+    AUTO_RESUME_JOBS = os.getenv('AUTO_RESUME_JOBS', 'True').lower() == 'true'
+    MAX_AUTO_RESUMES = int(os.getenv('MAX_AUTO_RESUMES', '3'))
+    SHUTDOWN_GRACE_SECONDS = float(os.getenv('SHUTDOWN_GRACE_SECONDS', '30'))
+    # "local" runs jobs in this process's workers, "redis" queues them in REDIS_URL for worker.py nodes
+    WORKER_MODE = os.getenv('WORKER_MODE', 'local')
+    WORKER_CPUS = float(os.getenv('WORKER_CPUS', '0'))
+    WORKER_MEMORY_GB = float(os.getenv('WORKER_MEMORY_GB', '0'))
+    WORKER_MAX_JOBS = int(os.getenv('WORKER_MAX_JOBS', os.getenv('MAX_CONCURRENT_JOBS', '2')))
+    WORKER_HEARTBEAT_SECONDS = float(os.getenv('WORKER_HEARTBEAT_SECONDS', '5'))
+    WORKER_TIMEOUT_SECONDS = float(os.getenv('WORKER_TIMEOUT_SECONDS', '30'))
+    JOB_MEMORY_GB = float(os.getenv('JOB_MEMORY_GB', '4'))
     AUTO_CLEANUP_DAYS = int(os.getenv('AUTO_CLEANUP_DAYS', '30'))
+    COMPLETED_RETENTION_DAYS = int(os.getenv('COMPLETED_RETENTION_DAYS', '0'))
+    CLEANUP_INTERVAL_MINUTES = float(os.getenv('CLEANUP_INTERVAL_MINUTES', '60'))
+    CATALOG_REFRESH_SECONDS = float(os.getenv('CATALOG_REFRESH_SECONDS', '30'))
+    JOB_STREAM_INTERVAL = float(os.getenv('JOB_STREAM_INTERVAL', '1.0'))
+    INFERENCE_BATCH_WINDOW_MS = float(os.getenv('INFERENCE_BATCH_WINDOW_MS', '10'))
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '8'))
+    INFERENCE_MAX_MODELS = int(os.getenv('INFERENCE_MAX_MODELS', '2'))
+    INFERENCE_MAX_ADAPTERS = int(os.getenv('INFERENCE_MAX_ADAPTERS', '8'))
+    INFERENCE_MAX_NEW_TOKENS = int(os.getenv('INFERENCE_MAX_NEW_TOKENS', '512'))
     
     ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:8000').split(',')
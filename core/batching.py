@@ -0,0 +1,91 @@
+import time
+from typing import Any, Dict, List, Optional
+from transformers import Trainer
+
+LENGTH_COLUMN = "length"
+
+
+def add_lengths(examples: Dict[str, List]) -> Dict[str, List]:
+    """Batched map function recording each sample's token count for length-grouped sampling"""
+    return {LENGTH_COLUMN: [len(ids) for ids in examples["input_ids"]]}
+
+
+def pack_sequences(examples: Dict[str, List], block_size: int, separator_id: Optional[int] = None) -> Dict[str, List]:
+    """
+    Batched map function concatenating samples and cutting them into blocks of
+    exactly ``block_size`` tokens, so no batch carries padding. The remainder
+    that does not fill a whole block is dropped.
+    """
+    concatenated: List[int] = []
+    # Samples from a prompt template carry labels, which are packed alongside
+    labels: Optional[List[int]] = [] if "labels" in examples else None
+    for i, ids in enumerate(examples["input_ids"]):
+        concatenated.extend(ids)
+        if labels is not None:
+            labels.extend(examples["labels"][i])
+        if separator_id is not None and (not ids or ids[-1] != separator_id):
+            concatenated.append(separator_id)
+            if labels is not None:
+                labels.append(separator_id)
+
+    usable = len(concatenated) // block_size * block_size
+    blocks = [concatenated[i:i + block_size] for i in range(0, usable, block_size)]
+    packed = {
+        "input_ids": blocks,
+        "attention_mask": [[1] * block_size for _ in blocks],
+    }
+    if labels is not None:
+        packed["labels"] = [labels[i:i + block_size] for i in range(0, usable, block_size)]
+    return packed
+
+
+class ColumnDroppingCollator:
+    """Removes bookkeeping columns such as ``length`` before delegating to ``collator``"""
+
+    def __init__(self, collator, drop_columns=(LENGTH_COLUMN,)):
+        self.collator = collator
+        self.drop_columns = set(drop_columns)
+
+    def __call__(self, features: List[Dict[str, Any]]):
+        features = [{k: v for k, v in f.items() if k not in self.drop_columns} for f in features]
+        return self.collator(features)
+
+
+class MeteredTrainer(Trainer):
+    """
+    Trainer that counts real and padding tokens in every training batch and
+    adds ``tokens_per_second`` and ``pad_fraction`` to its logs.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.real_tokens = 0
+        self.total_tokens = 0
+        self._train_start: Optional[float] = None
+
+    def training_step(self, model, inputs, *args, **kwargs):
+        if self._train_start is None:
+            self._train_start = time.perf_counter()
+
+        attention_mask = inputs.get("attention_mask")
+        if attention_mask is not None:
+            self.real_tokens += int(attention_mask.sum())
+            self.total_tokens += attention_mask.numel()
+        elif "input_ids" in inputs:
+            self.real_tokens += inputs["input_ids"].numel()
+            self.total_tokens += inputs["input_ids"].numel()
+
+        return super().training_step(model, inputs, *args, **kwargs)
+
+    def log(self, logs: Dict[str, float], *args, **kwargs):
+        logs.update(self.throughput_metrics())
+        super().log(logs, *args, **kwargs)
+
+    def throughput_metrics(self) -> Dict[str, float]:
+        if self._train_start is None or not self.total_tokens:
+            return {}
+        elapsed = time.perf_counter() - self._train_start
+        return {
+            "tokens_per_second": round(self.real_tokens / elapsed, 2) if elapsed > 0 else 0.0,
+            "pad_fraction": round(1 - self.real_tokens / self.total_tokens, 4),
+        }
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    Table,
+    Text,
+    delete,
+    insert,
+    select,
+)
+from config import config as app_config
+from .models import DatasetInfo
+from .store import create_database_engine, metadata
+from .uploads import SUPPORTED_FORMATS, TEMP_PREFIX, DatasetValidationError, inspect_file
+
+datasets_table = Table(
+    "datasets",
+    metadata,
+    Column("path", String(1024), primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("format", String(16), nullable=False),
+    Column("size", BigInteger, nullable=False),
+    Column("mtime_ns", BigInteger, nullable=False),
+    Column("num_samples", Integer),
+    Column("column_names", Text),
+    Column("content_hash", String(64)),
+    Column("token_length_histogram", Text),
+    Column("validation_error", Text),
+    Column("indexed_at", DateTime, nullable=False),
+    Index("ix_datasets_name", "name"),
+)
+
+
+class DatasetCatalog:
+    """
+    Persistent index of the datasets in ``data_dir``.
+
+    Each file is inspected once; its metadata (sample count, columns, content
+    hash, token-length histogram) is stored alongside the jobs and served
+    from there. ``refresh`` only re-inspects files whose size or mtime
+    changed and drops entries for deleted files.
+    """
+
+    def __init__(self, database_url: str, data_dir: str, refresh_interval: float = 30.0):
+        self.engine = create_database_engine(database_url)
+        self.data_dir = data_dir
+        self.refresh_interval = refresh_interval
+        self._last_refresh: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+        # The background refresh, if one was started; kept so it is not garbage collected while running
+        self._refresh_task: Optional[asyncio.Task] = None
+        metadata.create_all(self.engine)
+
+    def list_datasets(self) -> List[DatasetInfo]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(datasets_table).order_by(datasets_table.c.name)
+            ).mappings().all()
+        return [self._from_row(row) for row in rows]
+
+    def get(self, path: str) -> Optional[DatasetInfo]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(datasets_table).where(datasets_table.c.path == path)
+            ).mappings().first()
+        return self._from_row(row) if row else None
+
+    def register(self, info: DatasetInfo):
+        """Store metadata that was already computed, e.g. while the file was uploaded"""
+        self._upsert(info, os.stat(info.path).st_mtime_ns)
+
+    def refresh(self) -> Dict[str, int]:
+        """Bring the index in line with ``data_dir``, inspecting new and changed files only"""
+        with self.engine.connect() as conn:
+            known = {
+                row.path: (row.size, row.mtime_ns)
+                for row in conn.execute(
+                    select(datasets_table.c.path, datasets_table.c.size, datasets_table.c.mtime_ns)
+                )
+            }
+
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0}
+        present = set()
+        if os.path.isdir(self.data_dir):
+            with os.scandir(self.data_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.name.startswith(TEMP_PREFIX):
+                        continue
+                    if os.path.splitext(entry.name)[1].lower().lstrip(".") not in SUPPORTED_FORMATS:
+                        continue
+
+                    path = os.path.join(self.data_dir, entry.name)
+                    present.add(path)
+                    stat = entry.stat()
+                    if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                        stats["unchanged"] += 1
+                        continue
+
+                    self._upsert(self._inspect(path), stat.st_mtime_ns)
+                    stats["indexed"] += 1
+
+        removed = [path for path in known if path not in present]
+        if removed:
+            with self.engine.begin() as conn:
+                conn.execute(delete(datasets_table).where(datasets_table.c.path.in_(removed)))
+        stats["removed"] = len(removed)
+
+        self._last_refresh = time.monotonic()
+        return stats
+
+    async def refresh_async(self) -> Dict[str, int]:
+        async with self._refresh_lock:
+            return await asyncio.get_running_loop().run_in_executor(None, self.refresh)
+
+    async def maybe_refresh(self):
+        """
+        Refresh if the index is older than ``refresh_interval``. Only the first
+        refresh of the process is awaited; later ones run in the background
+        while callers keep reading the current index, one at a time.
+        """
+        if self._last_refresh is None:
+            await self.refresh_async()
+        elif time.monotonic() - self._last_refresh > self.refresh_interval:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self.refresh_async())
+
+    @staticmethod
+    def _inspect(path: str) -> DatasetInfo:
+        try:
+            return inspect_file(path)
+        except DatasetValidationError as e:
+            return DatasetInfo(
+                name=os.path.basename(path),
+                path=path,
+                size=os.path.getsize(path),
+                format=os.path.splitext(path)[1].lower().lstrip("."),
+                validation_error=str(e),
+            )
+
+    def _upsert(self, info: DatasetInfo, mtime_ns: int):
+        row = {
+            "path": info.path,
+            "name": info.name,
+            "format": info.format,
+            "size": info.size,
+            "mtime_ns": mtime_ns,
+            "num_samples": info.num_samples,
+            "column_names": json.dumps(info.columns) if info.columns is not None else None,
+            "content_hash": info.content_hash,
+            "token_length_histogram": (
+                json.dumps(info.token_length_histogram) if info.token_length_histogram is not None else None
+            ),
+            "validation_error": info.validation_error,
+            "indexed_at": datetime.now(),
+        }
+        with self.engine.begin() as conn:
+            conn.execute(delete(datasets_table).where(datasets_table.c.path == info.path))
+            conn.execute(insert(datasets_table).values(**row))
+
+    @staticmethod
+    def _from_row(row) -> DatasetInfo:
+        return DatasetInfo(
+            name=row["name"],
+            path=row["path"],
+            size=row["size"],
+            format=row["format"],
+            num_samples=row["num_samples"],
+            columns=json.loads(row["column_names"]) if row["column_names"] else None,
+            content_hash=row["content_hash"],
+            token_length_histogram=(
+                json.loads(row["token_length_histogram"]) if row["token_length_histogram"] else None
+            ),
+            validation_error=row["validation_error"],
+        )
+
+
+_catalog: Optional[DatasetCatalog] = None
+
+def get_dataset_catalog() -> DatasetCatalog:
+    """Return the process-wide DatasetCatalog"""
+    global _catalog
+    if _catalog is None:
+        _catalog = DatasetCatalog(
+            app_config.DATABASE_URL, app_config.DATA_DIR, refresh_interval=app_config.CATALOG_REFRESH_SECONDS
+        )
+    return _catalog
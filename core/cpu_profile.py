@@ -0,0 +1,137 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+import torch
+from torch import nn
+# Re-exported; they live with the scheduler so the API process can plan cores without torch
+from .scheduler import available_cores, partition_cores
+
+# Modules jobs attach LoRA adapters to. They stay nn.Linear in int8 base
+# models so peft can wrap them; lm_head is kept for output quality.
+INT8_SKIP_MODULES = ("q_proj", "k_proj", "v_proj", "o_proj", "lm_head")
+
+
+def bf16_supported() -> bool:
+    """Whether this CPU runs bf16 matmuls natively (AVX512-BF16 or AMX) rather than emulating them"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def int8_supported() -> bool:
+    return any(engine in torch.backends.quantized.supported_engines for engine in ("x86", "fbgemm"))
+
+
+def use_int8_engine():
+    """Select the x86 quantized kernels (fbgemm on older torch) used by Int8Linear"""
+    torch.backends.quantized.engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+
+
+class _Int8LinearFunction(torch.autograd.Function):
+    """
+    Dynamically quantized matmul against frozen int8 weights. Only the input
+    gets a gradient; the backward pass dequantizes the weight on the fly so
+    no full precision copy outlives a single layer.
+    """
+
+    @staticmethod
+    def forward(ctx, x, packed, qweight):
+        ctx.qweight = qweight
+        shape = x.shape
+        y = torch.ops.quantized.linear_dynamic(x.reshape(-1, shape[-1]).float().contiguous(), packed, True)
+        return y.reshape(*shape[:-1], y.shape[-1]).to(x.dtype)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        weight = ctx.qweight.dequantize().to(grad_output.dtype)
+        return grad_output @ weight, None, None
+
+
+class Int8Linear(nn.Module):
+    """Frozen replacement for ``nn.Linear`` holding per-channel int8 weights"""
+
+    def __init__(self, linear: nn.Linear):
+        super().__init__()
+        self.in_features = linear.in_features
+        self.out_features = linear.out_features
+
+        weight = linear.weight.detach().float()
+        scales = (weight.abs().amax(dim=1) / 127).clamp(min=1e-8)
+        zero_points = torch.zeros(self.out_features, dtype=torch.long)
+        self.register_buffer("qweight", torch.quantize_per_channel(weight, scales, zero_points, 0, torch.qint8))
+        bias = linear.bias.detach().float() if linear.bias is not None else None
+        self._packed = torch.ops.quantized.linear_prepack(self.qweight, bias)
+
+    @classmethod
+    def from_int8(cls, weight: torch.Tensor, scales: torch.Tensor, bias: Optional[torch.Tensor] = None) -> "Int8Linear":
+        """Rebuild a layer from int8 weights and per-output-channel scales, as written by an int8 export"""
+        use_int8_engine()
+        module = cls.__new__(cls)
+        nn.Module.__init__(module)
+        module.out_features, module.in_features = weight.shape
+        zero_points = torch.zeros(module.out_features, dtype=torch.long)
+        qweight = torch._make_per_channel_quantized_tensor(weight, scales.double(), zero_points, 0)
+        module.register_buffer("qweight", qweight)
+        module._packed = torch.ops.quantized.linear_prepack(qweight, bias.float() if bias is not None else None)
+        return module
+
+    def forward(self, x):
+        return _Int8LinearFunction.apply(x, self._packed, self.qweight)
+
+    def extra_repr(self) -> str:
+        return f"in_features={self.in_features}, out_features={self.out_features}, dtype=qint8"
+
+
+def quantize_frozen_linears(model: nn.Module, skip: Sequence[str] = INT8_SKIP_MODULES) -> int:
+    """
+    Replace the model's ``nn.Linear`` layers with ``Int8Linear`` in place,
+    except those whose attribute name is in ``skip``. Returns the number of
+    layers replaced.
+    """
+    use_int8_engine()
+
+    replaced = 0
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if type(child) is nn.Linear and name not in skip:
+                setattr(module, name, Int8Linear(child))
+                replaced += 1
+    return replaced
+
+
+def pin_process(cores: Sequence[int]):
+    """Restrict every thread of this process, including existing OpenMP workers, to ``cores``"""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    try:
+        thread_ids = [int(tid) for tid in os.listdir("/proc/self/task")]
+    except OSError:
+        thread_ids = [0]
+    for thread_id in thread_ids:
+        try:
+            os.sched_setaffinity(thread_id, cores)
+        except OSError:
+            # The thread exited in the meantime
+            pass
+
+
+@contextmanager
+def cpu_resources(cores: Optional[Sequence[int]] = None, threads: Optional[int] = None) -> Iterator[int]:
+    """
+    Pin this process to ``cores`` and run torch with ``threads`` intra-op
+    threads (default with ``cores``: one per core) until the block exits,
+    then restore the previous settings. Yields the thread count in effect.
+    """
+    previous_cores = available_cores()
+    previous_threads = torch.get_num_threads()
+    if cores:
+        pin_process(cores)
+    if threads or cores:
+        torch.set_num_threads(threads or len(cores))
+    try:
+        yield torch.get_num_threads()
+    finally:
+        torch.set_num_threads(previous_threads)
+        if cores:
+            pin_process(previous_cores)
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
+from filelock import FileLock
+from config import config as app_config
+
+if TYPE_CHECKING:
+    from datasets import Dataset
+
+LAST_USED_MARKER = ".last_used"
+HASH_INDEX_FILE = "content_hashes.json"
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of everything about a tokenizer that affects the ids it produces"""
+    digest = hashlib.sha256()
+    digest.update(type(tokenizer).__name__.encode())
+    digest.update(str(getattr(tokenizer, "name_or_path", "")).encode())
+    digest.update(str(len(tokenizer)).encode())
+    for attr in ("pad_token", "eos_token", "bos_token", "padding_side", "truncation_side"):
+        digest.update(f"{attr}={getattr(tokenizer, attr, None)}".encode())
+
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        # Truncation and padding are left behind by the last call, not part of the tokenizer
+        state = json.loads(backend.to_str())
+        state.pop("truncation", None)
+        state.pop("padding", None)
+        digest.update(json.dumps(state, sort_keys=True).encode())
+    else:
+        digest.update(json.dumps(tokenizer.get_vocab(), sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class TokenizedDatasetCache:
+    """
+    On-disk cache of tokenized datasets, stored as Arrow and memory-mapped on load.
+
+    Entries are keyed by the dataset content hash, the tokenizer fingerprint
+    and the tokenization parameters, so jobs that only differ in training
+    hyperparameters share one entry. Builds are serialized per key with a file
+    lock, which also makes concurrent worker processes wait for a single
+    build instead of tokenizing the same data in parallel. Once the cache
+    grows past ``max_bytes`` the least recently used entries are removed.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def content_hash(self, path: str) -> str:
+        """SHA-256 of a dataset file, memoized by path, size and mtime"""
+        stat = os.stat(path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        index_path = os.path.join(self.root, HASH_INDEX_FILE)
+
+        with FileLock(index_path + ".lock"):
+            index = self._read_json(index_path)
+            entry = index.get(os.path.abspath(path))
+            if entry and entry["signature"] == signature:
+                return entry["sha256"]
+
+        sha256 = file_sha256(path)
+
+        with FileLock(index_path + ".lock"):
+            index = self._read_json(index_path)
+            index[os.path.abspath(path)] = {"signature": signature, "sha256": sha256}
+            self._write_json(index_path, index)
+        return sha256
+
+    def key(self, dataset_path: str, tokenizer, **params: Any) -> str:
+        payload = {
+            "dataset": self.content_hash(dataset_path),
+            "tokenizer": tokenizer_fingerprint(tokenizer),
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def get_or_build(self, key: str, build: Callable[[], "Dataset"]) -> Tuple["Dataset", bool]:
+        """Return ``(dataset, hit)``, building and storing the entry on a miss"""
+        # Imported here so the API process, which only manages the cache, does not load datasets
+        from datasets import load_from_disk
+
+        entry_dir = os.path.join(self.root, key)
+
+        with FileLock(entry_dir + ".lock"):
+            if os.path.isdir(entry_dir):
+                self._touch(entry_dir)
+                return load_from_disk(entry_dir), True
+
+            dataset = build()
+            tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+            dataset.save_to_disk(tmp_dir)
+            os.replace(tmp_dir, entry_dir)
+            self._touch(entry_dir)
+
+        self.evict(keep={key})
+        # Reload so the returned dataset is backed by the memory-mapped cache files
+        return load_from_disk(entry_dir), False
+
+    def entries(self) -> List[Dict[str, Any]]:
+        entries = []
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            if not os.path.isdir(entry_dir) or ".tmp-" in name:
+                continue
+            marker = os.path.join(entry_dir, LAST_USED_MARKER)
+            entries.append({
+                "key": name,
+                "size": _dir_size(entry_dir),
+                "last_used": os.path.getmtime(marker) if os.path.exists(marker) else 0.0,
+            })
+        return entries
+
+    def evict(self, keep=()):
+        entries = sorted(self.entries(), key=lambda e: e["last_used"])
+        total = sum(e["size"] for e in entries)
+
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry["key"] in keep:
+                continue
+            self.remove(entry["key"])
+            total -= entry["size"]
+
+    def remove(self, key: str):
+        entry_dir = os.path.join(self.root, key)
+        with FileLock(entry_dir + ".lock"):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    @staticmethod
+    def _touch(entry_dir: str):
+        marker = os.path.join(entry_dir, LAST_USED_MARKER)
+        with open(marker, "a"):
+            pass
+        now = time.time()
+        os.utime(marker, (now, now))
+
+    @staticmethod
+    def _read_json(path: str) -> Dict[str, Any]:
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+
+def get_dataset_cache() -> TokenizedDatasetCache:
+    return TokenizedDatasetCache(
+        app_config.TOKENIZED_CACHE_DIR,
+        max_bytes=int(app_config.TOKENIZED_CACHE_MAX_GB * 1024 ** 3),
+    )
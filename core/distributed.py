@@ -0,0 +1,422 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+from config import config as app_config
+from .scheduler import TERMINAL_EVENTS, EventHandler, JobScheduler
+
+logger = logging.getLogger(__name__)
+
+# Tasks name their target as "module:function"; worker nodes only import targets from these modules
+TASK_MODULE_PREFIX = "core."
+
+# Queue scores are -priority * PRIORITY_SCALE + sequence number: higher priority first, FIFO within one
+PRIORITY_SCALE = 10 ** 12
+
+# Queued jobs a worker node looks at, in queue order, for one that fits its free capacity
+CLAIM_SCAN = 50
+
+RESOURCE_NAMES = ("cpus", "memory_gb")
+
+
+def get_redis_client(url: Optional[str] = None):
+    """Client for REDIS_URL. Clients passed to this module must decode responses to str."""
+    try:
+        import redis
+    except ImportError as e:
+        raise RuntimeError("WORKER_MODE=redis needs the redis package") from e
+    return redis.Redis.from_url(url or app_config.REDIS_URL, decode_responses=True)
+
+
+def task_name(target: Callable) -> str:
+    return f"{target.__module__}:{target.__qualname__}"
+
+
+def resolve_task(name: str) -> Callable:
+    module, _, attr = name.partition(":")
+    if not module.startswith(TASK_MODULE_PREFIX):
+        raise ValueError(f"Refusing to run task {name!r} from outside {TASK_MODULE_PREFIX}*")
+    return getattr(importlib.import_module(module), attr)
+
+
+class _Keys:
+    """Redis key layout shared by the API and the worker nodes"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        # Sorted set of queued job ids, see PRIORITY_SCALE
+        self.queue = f"{prefix}:queue"
+        self.sequence = f"{prefix}:sequence"
+        # Hash of job id -> id of the worker node running it
+        self.running = f"{prefix}:running"
+        # List of [job_id, kind, data] events for the API
+        self.events = f"{prefix}:events"
+        # Set of worker node ids that registered
+        self.workers = f"{prefix}:workers"
+
+    def task(self, job_id: str) -> str:
+        return f"{self.prefix}:task:{job_id}"
+
+    def worker(self, worker_id: str) -> str:
+        """Status of a worker node; it expires unless the node keeps sending heartbeats"""
+        return f"{self.prefix}:worker:{worker_id}"
+
+    def control(self, worker_id: str) -> str:
+        """List of commands for a worker node"""
+        return f"{self.prefix}:control:{worker_id}"
+
+
+class RedisJobQueue:
+    """
+    ``JobScheduler`` counterpart for distributed mode: jobs are queued in
+    Redis and run by ``WorkerNode`` processes on any number of machines.
+
+    Events of the jobs come back through Redis and are delivered to
+    ``on_event`` on the event loop that created the queue, like the local
+    scheduler's. Jobs outlive this object: on shutdown they keep running on
+    their nodes and their events wait in Redis for the next API process.
+    When a node stops sending heartbeats for ``worker_timeout`` seconds, its
+    jobs are reported ``failed`` with ``worker_lost`` so they can be
+    requeued. ``client`` must decode responses to str.
+    """
+
+    remote = True
+
+    def __init__(self, client, on_event: EventHandler, prefix: str = "tunespace", worker_timeout: float = 30.0):
+        self.client = client
+        self.keys = _Keys(prefix)
+        self.worker_timeout = worker_timeout
+        self._on_event = on_event
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def pending_count(self) -> int:
+        return self.client.zcard(self.keys.queue)
+
+    @property
+    def running_count(self) -> int:
+        return self.client.hlen(self.keys.running)
+
+    def is_running(self, job_id: str) -> bool:
+        return bool(self.client.hexists(self.keys.running, job_id))
+
+    def active_jobs(self) -> Set[str]:
+        """Jobs that are queued, running, or have events this queue has not delivered yet"""
+        jobs = set(self.client.zrange(self.keys.queue, 0, -1)) | set(self.client.hkeys(self.keys.running))
+        jobs.update(json.loads(event)[0] for event in self.client.lrange(self.keys.events, 0, -1))
+        return jobs
+
+    def start(self):
+        """Start delivering events, including those that arrived while no API process was listening"""
+        self._capture_loop()
+        self._ensure_listener()
+
+    def submit(self, job_id: str, target: Callable, args: tuple = (), priority: int = 0,
+               resources: Optional[Dict[str, float]] = None):
+        """
+        Queue ``target(*args, events)`` for the first worker node with
+        ``resources`` (``cpus``, ``memory_gb``) free. ``args`` must be JSON
+        serializable.
+        """
+        self._capture_loop()
+        task = {"job_id": job_id, "target": task_name(target), "args": list(args), "resources": resources or {}}
+        sequence = self.client.incr(self.keys.sequence)
+        with self.client.pipeline() as pipe:
+            pipe.set(self.keys.task(job_id), json.dumps(task))
+            pipe.zadd(self.keys.queue, {job_id: -priority * PRIORITY_SCALE + sequence})
+            pipe.execute()
+        self._ensure_listener()
+
+    def broadcast(self, target: Callable, args: tuple = ()):
+        """Run ``target(*args, events)`` once on every live worker node"""
+        command = json.dumps({"action": "run", "target": task_name(target), "args": list(args)})
+        for worker in self.workers():
+            self.client.rpush(self.keys.control(worker["worker_id"]), command)
+
+    def dequeue(self, job_id: str) -> bool:
+        """Drop a job that no worker node has claimed yet"""
+        if not self.client.zrem(self.keys.queue, job_id):
+            return False
+        self.client.delete(self.keys.task(job_id))
+        return True
+
+    def interrupt(self, job_id: str) -> bool:
+        """Ask the node running ``job_id`` to checkpoint it and stop; it reports ``paused``"""
+        return self._command(job_id, "interrupt")
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job or have its node terminate it"""
+        if self.dequeue(job_id):
+            return True
+        worker_id = self.client.hget(self.keys.running, job_id)
+        if worker_id is None or not self.client.hdel(self.keys.running, job_id):
+            return False
+        self.client.rpush(self.keys.control(worker_id), json.dumps({"action": "cancel", "job_id": job_id}))
+        return True
+
+    def workers(self) -> List[Dict[str, Any]]:
+        """Status of the live worker nodes, as sent with their last heartbeat"""
+        workers = []
+        for worker_id in sorted(self.client.smembers(self.keys.workers)):
+            status = self.client.get(self.keys.worker(worker_id))
+            if status is not None:
+                workers.append(json.loads(status))
+        return workers
+
+    def shutdown(self, grace: float = 2):
+        """Stop receiving events; jobs keep running on their worker nodes"""
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def _command(self, job_id: str, action: str) -> bool:
+        worker_id = self.client.hget(self.keys.running, job_id)
+        if worker_id is None:
+            return False
+        self.client.rpush(self.keys.control(worker_id), json.dumps({"action": action, "job_id": job_id}))
+        return True
+
+    def _capture_loop(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    def _ensure_listener(self):
+        if self._listener is None or not self._listener.is_alive():
+            self._stopping.clear()
+            self._listener = threading.Thread(target=self._listen, name="tunespace-redis-queue", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        last_check = 0.0
+        while not self._stopping.is_set():
+            try:
+                item = self.client.blpop(self.keys.events, timeout=1)
+                if item is not None:
+                    job_id, kind, data = json.loads(item[1])
+                    self._deliver(job_id, kind, data)
+                if time.monotonic() - last_check > self.worker_timeout / 3:
+                    last_check = time.monotonic()
+                    self._requeue_lost()
+            except Exception:
+                logger.exception("Receiving job events from Redis failed")
+                self._stopping.wait(1)
+
+    def _requeue_lost(self):
+        for job_id, worker_id in self.client.hgetall(self.keys.running).items():
+            if self.client.exists(self.keys.worker(worker_id)):
+                continue
+            # Nodes remove a job from running together with its final event, so this job never finished
+            if self.client.hdel(self.keys.running, job_id):
+                self._deliver(job_id, "failed", {
+                    "error": f"Worker node {worker_id} stopped sending heartbeats",
+                    "worker_lost": True,
+                })
+
+        for worker_id in self.client.smembers(self.keys.workers):
+            if not self.client.exists(self.keys.worker(worker_id)):
+                with self.client.pipeline() as pipe:
+                    pipe.srem(self.keys.workers, worker_id)
+                    pipe.delete(self.keys.control(worker_id))
+                    pipe.execute()
+
+    def _deliver(self, job_id: str, kind: str, data: Dict[str, Any]):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._on_event, job_id, kind, data)
+        else:
+            self._on_event(job_id, kind, data)
+
+
+class WorkerNode:
+    """
+    Runs queued jobs on this machine for a ``RedisJobQueue``.
+
+    The node declares its capacity (``cpus``, ``memory_gb`` and at most
+    ``max_jobs`` jobs at once) and claims queued jobs, in queue order, whose
+    resources fit into what is left. Claimed jobs run in a local
+    ``JobScheduler`` and their events are forwarded to Redis. A heartbeat
+    every ``heartbeat_interval`` seconds keeps the API from declaring the
+    node lost; a node that finds one of its jobs reassigned stops it, so a
+    job never runs twice. Datasets and output directories must be on storage
+    every node and the API can reach.
+    """
+
+    def __init__(self, client, cpus: float, memory_gb: float, max_jobs: int, prefix: str = "tunespace",
+                 worker_id: Optional[str] = None, heartbeat_interval: float = 5.0, worker_timeout: float = 30.0,
+                 poll_interval: float = 1.0, shutdown_grace: float = 30.0,
+                 core_sets: Optional[List[Optional[List[int]]]] = None):
+        self.client = client
+        self.keys = _Keys(prefix)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.capacity = {"cpus": cpus, "memory_gb": memory_gb}
+        self.max_jobs = max_jobs
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_timeout = worker_timeout
+        self.poll_interval = poll_interval
+        self.shutdown_grace = shutdown_grace
+        self.scheduler = JobScheduler(max_workers=max_jobs, on_event=self._forward, core_sets=core_sets)
+        # Job id -> resources it holds on this node
+        self._jobs: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def free_capacity(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                name: self.capacity[name] - sum(resources.get(name, 0) for resources in self._jobs.values())
+                for name in RESOURCE_NAMES
+            }
+
+    def run(self):
+        """Claim and run jobs until ``stop`` is called"""
+        self._heartbeat()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="tunespace-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info("Worker node %s started with %s, up to %d jobs", self.worker_id, self.capacity, self.max_jobs)
+        try:
+            while not self._stopping.is_set():
+                try:
+                    self._handle_commands()
+                    self._reconcile()
+                    while not self._stopping.is_set() and self._claim():
+                        pass
+                except Exception:
+                    logger.exception("Worker node loop failed")
+                self._stopping.wait(self.poll_interval)
+        finally:
+            self._stopping.set()
+            # Running jobs get shutdown_grace to checkpoint; removing the
+            # heartbeat then lets the API requeue them right away
+            self.scheduler.shutdown(grace=self.shutdown_grace)
+            heartbeat.join(timeout=self.heartbeat_interval + 5)
+            with self.client.pipeline() as pipe:
+                pipe.delete(self.keys.worker(self.worker_id))
+                pipe.srem(self.keys.workers, self.worker_id)
+                pipe.execute()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _claim(self) -> bool:
+        """Claim and start one queued job that fits; returns whether one was started"""
+        with self._lock:
+            if len(self._jobs) >= self.max_jobs:
+                return False
+        free = self.free_capacity()
+
+        for job_id in self.client.zrange(self.keys.queue, 0, CLAIM_SCAN - 1):
+            raw = self.client.get(self.keys.task(job_id))
+            if raw is None:
+                continue
+            task = json.loads(raw)
+            if any(task["resources"].get(name, 0) > free[name] for name in RESOURCE_NAMES):
+                continue
+            if self._try_claim(job_id):
+                self._start(task)
+                return True
+        return False
+
+    def _try_claim(self, job_id: str) -> bool:
+        from redis.exceptions import WatchError
+
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.keys.queue)
+                if pipe.zscore(self.keys.queue, job_id) is None:
+                    return False
+                pipe.multi()
+                pipe.zrem(self.keys.queue, job_id)
+                pipe.delete(self.keys.task(job_id))
+                pipe.hset(self.keys.running, job_id, self.worker_id)
+                pipe.execute()
+            except WatchError:
+                # The queue changed meanwhile; the next pass looks again
+                return False
+        return True
+
+    def _start(self, task: Dict[str, Any]):
+        job_id = task["job_id"]
+        with self._lock:
+            self._jobs[job_id] = task["resources"]
+        try:
+            target = resolve_task(task["target"])
+        except Exception as e:
+            self._forward(job_id, "failed", {"error": str(e)})
+            return
+        self.scheduler.submit(job_id, target, args=tuple(task["args"]))
+
+    def _forward(self, job_id: str, kind: str, data: Dict[str, Any]):
+        if self._stopping.is_set() and kind == "paused":
+            # Interrupted by this node shutting down, not by a user: have the API requeue it
+            kind, data = "failed", {"error": f"Worker node {self.worker_id} shut down", "worker_lost": True}
+
+        with self.client.pipeline() as pipe:
+            pipe.rpush(self.keys.events, json.dumps([job_id, kind, data]))
+            if kind in TERMINAL_EVENTS:
+                pipe.hdel(self.keys.running, job_id)
+            pipe.execute()
+        if kind in TERMINAL_EVENTS:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+
+    def _handle_commands(self):
+        while True:
+            raw = self.client.lpop(self.keys.control(self.worker_id))
+            if raw is None:
+                return
+            command = json.loads(raw)
+            action = command["action"]
+            if action == "run":
+                self.scheduler.broadcast(resolve_task(command["target"]), args=tuple(command["args"]))
+            elif action == "interrupt":
+                self.scheduler.interrupt(command["job_id"])
+            elif action == "cancel":
+                self._drop(command["job_id"])
+
+    def _reconcile(self):
+        """Stop jobs the API no longer assigns to this node, e.g. after it was declared lost"""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            if self.client.hget(self.keys.running, job_id) != self.worker_id:
+                logger.warning("Job %s is no longer assigned to %s, stopping it", job_id, self.worker_id)
+                self._drop(job_id)
+
+    def _drop(self, job_id: str):
+        self.scheduler.cancel(job_id)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            try:
+                self._heartbeat()
+            except Exception:
+                logger.exception("Heartbeat failed")
+
+    def _heartbeat(self):
+        with self._lock:
+            jobs = list(self._jobs)
+        free = self.free_capacity()
+        status = {
+            "worker_id": self.worker_id,
+            "host": socket.gethostname(),
+            "capacity": {**self.capacity, "max_jobs": self.max_jobs},
+            "free": free,
+            "jobs": jobs,
+            "heartbeat_at": time.time(),
+        }
+        with self.client.pipeline() as pipe:
+            pipe.set(self.keys.worker(self.worker_id), json.dumps(status), ex=max(1, int(self.worker_timeout)))
+            pipe.sadd(self.keys.workers, self.worker_id)
+            pipe.execute()
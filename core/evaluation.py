@@ -0,0 +1,184 @@
+import math
+import os
+import random
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+import torch
+from transformers import TrainerCallback
+from .templates import IGNORE_INDEX
+
+# Token ids and labels of one evaluation example
+Sample = Tuple[List[int], List[int]]
+
+
+def companion_eval_path(dataset_path: str) -> Optional[str]:
+    """The ``<stem>_test`` split written next to ``<stem>.jsonl`` by create_training_dataset, if present"""
+    match = re.match(r"(.*?)(\.jsonl?(?:\.gz)?)$", dataset_path)
+    if match is None:
+        return None
+    candidate = f"{match.group(1)}_test{match.group(2)}"
+    return candidate if os.path.isfile(candidate) else None
+
+
+def holdout_split(dataset, size: int, seed: int = 0):
+    """
+    ``(train, eval)`` views of ``dataset`` with ``size`` random rows held out.
+    The index mappings stay in memory, so the memory-mapped source (e.g. a
+    shared cache entry) is neither copied nor written to.
+    """
+    indices = list(range(len(dataset)))
+    random.Random(seed).shuffle(indices)
+    return (
+        dataset.select(sorted(indices[size:]), keep_in_memory=True),
+        dataset.select(sorted(indices[:size]), keep_in_memory=True),
+    )
+
+
+def eval_samples(dataset, max_samples: Optional[int] = None, seed: int = 0) -> List[Sample]:
+    """
+    Token ids and labels of up to ``max_samples`` rows of a tokenized
+    dataset, padding removed; rows without labels are scored on every token.
+    The subsample is fixed by ``seed`` so every evaluation of a job scores
+    the same rows.
+    """
+    indices = list(range(len(dataset)))
+    if max_samples and max_samples < len(indices):
+        indices = sorted(random.Random(seed).sample(indices, max_samples))
+
+    rows = dataset.select(indices)
+    samples = []
+    for row in rows:
+        ids = row["input_ids"]
+        labels = row.get("labels") or ids
+        mask = row.get("attention_mask")
+        if mask is not None:
+            ids = [token for token, keep in zip(ids, mask) if keep]
+            labels = [label for label, keep in zip(labels, mask) if keep]
+        if len(ids) > 1:
+            samples.append((ids, labels))
+    return samples
+
+
+def length_sorted_batches(samples: List[Sample], batch_size: int) -> List[List[Sample]]:
+    """Batches of samples of similar length, longest first, so each batch carries little padding"""
+    ordered = sorted(samples, key=lambda sample: len(sample[0]), reverse=True)
+    return [ordered[i:i + batch_size] for i in range(0, len(ordered), batch_size)]
+
+
+def _collate(batch: List[Sample], pad_id: int, device) -> Dict[str, torch.Tensor]:
+    width = max(len(ids) for ids, _ in batch)
+    input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+    labels = torch.full((len(batch), width), IGNORE_INDEX, dtype=torch.long)
+    for i, (ids, targets) in enumerate(batch):
+        input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[i, :len(ids)] = 1
+        labels[i, :len(targets)] = torch.tensor(targets, dtype=torch.long)
+    return {
+        "input_ids": input_ids.to(device),
+        "attention_mask": attention_mask.to(device),
+        "labels": labels.to(device),
+    }
+
+
+def evaluate_loss(model, batches: List[List[Sample]], pad_id: int) -> Dict[str, float]:
+    """Token-weighted mean loss and perplexity of ``model`` on ``batches``, without gradients"""
+    device = next(model.parameters()).device
+    was_training = model.training
+    model.eval()
+    total_loss = 0.0
+    total_tokens = 0
+    start = time.perf_counter()
+    try:
+        with torch.no_grad():
+            for batch in batches:
+                inputs = _collate(batch, pad_id, device)
+                # The model averages over predicted (shifted, unmasked) tokens
+                tokens = int((inputs["labels"][:, 1:] != IGNORE_INDEX).sum())
+                if not tokens:
+                    continue
+                loss = model(**inputs).loss
+                total_loss += float(loss) * tokens
+                total_tokens += tokens
+    finally:
+        model.train(was_training)
+
+    loss = total_loss / total_tokens if total_tokens else float("nan")
+    return {
+        "eval_loss": round(loss, 4),
+        "eval_perplexity": round(math.exp(min(loss, 50.0)), 4),
+        "eval_tokens": total_tokens,
+        "eval_seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+class EvaluationCallback(TrainerCallback):
+    """
+    Evaluates every ``eval_steps`` steps (or every epoch) with
+    ``evaluate_loss`` and reports the results as ``log`` events, which end up
+    in the job's metrics history as loss and perplexity curves.
+
+    Evaluations are skipped while their accumulated wall time would exceed
+    ``max_fraction`` of the training time so far, so eval overhead stays
+    bounded however small ``eval_steps`` is. A final evaluation always runs
+    when training completes.
+    """
+
+    def __init__(self, reporter, samples: List[Sample], batch_size: int, pad_id: int,
+                 strategy: str = "steps", eval_steps: int = 500, max_fraction: float = 0.1):
+        self.reporter = reporter
+        self.batches = length_sorted_batches(samples, batch_size)
+        self.pad_id = pad_id
+        self.strategy = strategy
+        self.eval_steps = eval_steps
+        self.max_fraction = max_fraction
+        self.eval_seconds = 0.0
+        self.last_eval_seconds = 0.0
+        self.last_eval_step: Optional[int] = None
+        self.skipped = 0
+        self._train_start: Optional[float] = None
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._train_start = time.perf_counter()
+
+    def on_step_end(self, args, state, control, model=None, **kwargs):
+        # A stopping run (last step or pause) is handled in on_train_end
+        if control.should_training_stop:
+            return
+        if self.strategy == "steps" and self.eval_steps > 0 and state.global_step % self.eval_steps == 0:
+            self._maybe_evaluate(model, state)
+
+    def on_epoch_end(self, args, state, control, model=None, **kwargs):
+        if self.strategy == "epoch":
+            self._maybe_evaluate(model, state)
+
+    def on_train_end(self, args, state, control, model=None, **kwargs):
+        # Paused jobs skip the final evaluation; it runs when they complete
+        if state.global_step >= state.max_steps and self.last_eval_step != state.global_step:
+            self._evaluate(model, state)
+
+    def _maybe_evaluate(self, model, state):
+        train_seconds = time.perf_counter() - self._train_start - self.eval_seconds
+        if self.eval_seconds + self.last_eval_seconds > self.max_fraction * train_seconds:
+            self.skipped += 1
+            return
+        self._evaluate(model, state)
+
+    def _evaluate(self, model, state):
+        if model is None or not self.batches:
+            return
+        result = evaluate_loss(model, self.batches, self.pad_id)
+        self.last_eval_seconds = result["eval_seconds"]
+        self.eval_seconds += result["eval_seconds"]
+        self.last_eval_step = state.global_step
+
+        elapsed = time.perf_counter() - self._train_start
+        self.reporter.emit(
+            "log",
+            step=state.global_step,
+            **result,
+            eval_time_fraction=round(self.eval_seconds / elapsed, 4) if elapsed > 0 else 0.0,
+            eval_skipped=self.skipped,
+        )
+
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Dict, List, Set
+
+
+class Subscription:
+    """
+    Pending updates for one streaming client.
+
+    Deltas for the same job are merged until the client collects them, so a
+    slow or rate-limited client receives at most one update per job per batch.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, job_id: str, delta: Dict[str, Any]):
+        self._pending.setdefault(job_id, {"job_id": job_id}).update(delta)
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """Wait up to ``timeout`` seconds for updates; an empty list means none arrived"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        self._ready.clear()
+        batch, self._pending = list(self._pending.values()), {}
+        return batch
+
+
+class JobEventBroadcaster:
+    """Fans job updates out to every subscribed client"""
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, job_id: str, delta: Dict[str, Any]):
+        for subscription in self._subscriptions:
+            subscription.push(job_id, delta)
@@ -0,0 +1,287 @@
+import gc
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import torch
+import torch.nn.functional as F
+from safetensors.torch import save_file
+from safetensors import safe_open
+from torch import nn
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+from transformers.modeling_utils import shard_checkpoint
+from .cpu_profile import Int8Linear
+from .model_registry import default_dtype, load_base_model
+from .scheduler import JobReporter
+from .storage import EXPORT_MANIFEST, read_export_manifest, unshare_tree
+
+logger = logging.getLogger(__name__)
+
+# Written next to the weights of int8/int4 exports; plain exports load with from_pretrained
+QUANTIZATION_FILE = "tunespace_quantization.json"
+
+WEIGHTS_NAME = "model.safetensors"
+
+# Kept in full precision for output quality
+QUANTIZE_SKIP_MODULES = ("lm_head",)
+
+
+def quantize_int8(weight: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Symmetric per-output-channel int8 weights and their float32 scales"""
+    weight = weight.detach().float()
+    scales = (weight.abs().amax(dim=1) / 127).clamp(min=1e-8)
+    return torch.round(weight / scales[:, None]).clamp(-127, 127).to(torch.int8), scales
+
+
+def quantize_int4(weight: torch.Tensor, group_size: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Symmetric int4 weights with one scale per ``group_size`` inputs of each
+    output channel, packed two per byte (low nibble first, offset by 8).
+    """
+    out_features, in_features = weight.shape
+    groups = weight.detach().float().reshape(out_features, in_features // group_size, group_size)
+    scales = (groups.abs().amax(dim=2) / 7).clamp(min=1e-8)
+    q = (torch.round(groups / scales[..., None]).clamp(-8, 7) + 8).to(torch.uint8).reshape(out_features, in_features)
+    return q[:, ::2] | (q[:, 1::2] << 4), scales
+
+
+def dequantize_int4(packed: torch.Tensor, scales: torch.Tensor, group_size: int) -> torch.Tensor:
+    out_features = packed.shape[0]
+    q = torch.stack((packed & 0x0F, packed >> 4), dim=2).reshape(out_features, -1).to(torch.int8) - 8
+    groups = q.reshape(out_features, -1, group_size).float() * scales[..., None].float()
+    return groups.reshape(out_features, -1)
+
+
+class Int4Linear(nn.Module):
+    """
+    ``nn.Linear`` replacement holding group-wise int4 weights. There is no
+    int4 matmul kernel on CPU, so each forward dequantizes the weight; the
+    layer trades speed for a quarter of the float32 footprint.
+    """
+
+    def __init__(self, packed: torch.Tensor, scales: torch.Tensor, group_size: int,
+                 bias: Optional[torch.Tensor] = None):
+        super().__init__()
+        self.out_features = packed.shape[0]
+        self.in_features = packed.shape[1] * 2
+        self.group_size = group_size
+        self.register_buffer("weight_packed", packed)
+        self.register_buffer("weight_scale", scales)
+        self.register_buffer("bias", bias)
+
+    def forward(self, x):
+        weight = dequantize_int4(self.weight_packed, self.weight_scale, self.group_size).to(x.dtype)
+        return F.linear(x, weight, self.bias.to(x.dtype) if self.bias is not None else None)
+
+    def extra_repr(self) -> str:
+        return f"in_features={self.in_features}, out_features={self.out_features}, group_size={self.group_size}"
+
+
+def quantized_state_dict(model: nn.Module, bits: int,
+                         group_size: int = 128) -> Tuple[Dict[str, torch.Tensor], List[str], List[str]]:
+    """
+    The model's state dict with the weights of its linear layers (except
+    QUANTIZE_SKIP_MODULES) replaced by int8 or int4 weights and scales.
+    int4 skips layers whose input size is not a multiple of ``group_size``.
+    Returns the state dict and the names of the quantized and skipped layers;
+    raises ValueError when no layer can be quantized.
+    """
+    state = model.state_dict()
+    quantized, skipped = [], []
+    for name, module in model.named_modules():
+        if type(module) is not nn.Linear or name.rsplit(".", 1)[-1] in QUANTIZE_SKIP_MODULES:
+            continue
+        if bits == 4 and (module.in_features % group_size or group_size % 2):
+            skipped.append(name)
+            continue
+        del state[f"{name}.weight"]
+        if bits == 8:
+            state[f"{name}.weight_int8"], state[f"{name}.weight_scale"] = quantize_int8(module.weight)
+        else:
+            state[f"{name}.weight_packed"], scales = quantize_int4(module.weight, group_size)
+            state[f"{name}.weight_scale"] = scales.half()
+        quantized.append(name)
+
+    if not quantized:
+        reason = f" with group_size {group_size}" if skipped else ""
+        raise ValueError(f"No linear layer of the model can be quantized to int{bits}{reason}")
+    if skipped:
+        logger.warning("Kept %d of %d linear layers in full precision, their input size is not a multiple "
+                       "of group_size %d: %s", len(skipped), len(skipped) + len(quantized), group_size,
+                       ", ".join(skipped))
+    return state, quantized, skipped
+
+
+def save_sharded(state: Dict[str, torch.Tensor], output_dir: str, max_shard_size: str = "2GB") -> List[str]:
+    """Write ``state`` as safetensors shards (with an index when there are several); returns the file names"""
+    # Tied weights share storage, which safetensors rejects; tie_weights restores them on load
+    seen, unique = set(), {}
+    for name, tensor in state.items():
+        key = (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape))
+        if tensor.data_ptr() and key in seen:
+            continue
+        seen.add(key)
+        unique[name] = tensor.contiguous()
+
+    shards, index = shard_checkpoint(unique, max_shard_size=max_shard_size, weights_name=WEIGHTS_NAME)
+    for file_name, shard in shards.items():
+        save_file(shard, os.path.join(output_dir, file_name), metadata={"format": "pt"})
+    if index is not None:
+        with open(os.path.join(output_dir, f"{WEIGHTS_NAME}.index.json"), "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+    return sorted(shards)
+
+
+def export_model(model_name: str, adapter_dir: Optional[str], output_dir: str, quantization: str = "none",
+                 dtype: Optional[str] = None, max_shard_size: str = "2GB", group_size: int = 128,
+                 tokenizer_dir: Optional[str] = None, job_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Merge ``adapter_dir`` (if given) into ``model_name`` and write the result
+    to ``output_dir`` as sharded safetensors, optionally with int8 or int4
+    weights. The files written are listed in the directory's EXPORT_MANIFEST;
+    a later export to the same directory replaces only those. Returns the
+    export's size, how many linear layers were quantized and skipped, how
+    long it took and how long the export and the base model plus adapter
+    each take to load.
+    """
+    torch_dtype = getattr(torch, dtype) if dtype else default_dtype()
+    start = time.perf_counter()
+    model = load_base_model(model_name, torch_dtype)
+    if adapter_dir:
+        from peft import PeftModel
+
+        model = PeftModel.from_pretrained(model, adapter_dir).merge_and_unload()
+    source_load_seconds = time.perf_counter() - start
+
+    # Quantized before the previous export is removed, so an export that cannot be made leaves it in place
+    modules, skipped = [], []
+    if quantization != "none":
+        bits = 8 if quantization == "int8" else 4
+        state, modules, skipped = quantized_state_dict(model, bits, group_size)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # A previous export may have had more shards, and its files may be shared with
+    # other copies by the storage janitor, so they are removed rather than overwritten
+    previous = read_export_manifest(output_dir) or {}
+    for name in previous.get("files", []) + [EXPORT_MANIFEST]:
+        path = os.path.join(output_dir, os.path.basename(name))
+        if os.path.isfile(path):
+            os.remove(path)
+    unshare_tree(output_dir)
+    before = _file_mtimes(output_dir)
+
+    if quantization == "none":
+        model.save_pretrained(output_dir, safe_serialization=True, max_shard_size=max_shard_size)
+    else:
+        model.config.save_pretrained(output_dir)
+        if model.generation_config is not None:
+            model.generation_config.save_pretrained(output_dir)
+        save_sharded(state, output_dir, max_shard_size)
+        with open(os.path.join(output_dir, QUANTIZATION_FILE), "w", encoding="utf-8") as f:
+            json.dump({"bits": bits, "group_size": group_size, "dtype": str(torch_dtype).replace("torch.", ""),
+                       "modules": modules}, f)
+        del state
+
+    AutoTokenizer.from_pretrained(tokenizer_dir or model_name).save_pretrained(output_dir)
+    written = sorted(name for name, mtime in _file_mtimes(output_dir).items() if before.get(name) != mtime)
+    with open(os.path.join(output_dir, EXPORT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"job_id": job_id, "files": written}, f)
+    export_seconds = time.perf_counter() - start
+
+    del model
+    gc.collect()
+    start = time.perf_counter()
+    load_exported(output_dir)
+    load_seconds = time.perf_counter() - start
+
+    files = [os.path.join(output_dir, name) for name in _weight_files(output_dir)]
+    return {
+        "path": output_dir,
+        "quantization": quantization,
+        "quantized_modules": len(modules),
+        "skipped_modules": len(skipped),
+        "dtype": str(torch_dtype).replace("torch.", ""),
+        "files": len(files),
+        "bytes": sum(os.path.getsize(path) for path in files),
+        "export_seconds": round(export_seconds, 3),
+        "load_seconds": round(load_seconds, 3),
+        "source_load_seconds": round(source_load_seconds, 3),
+    }
+
+
+def _file_mtimes(path: str) -> Dict[str, int]:
+    with os.scandir(path) as entries:
+        return {entry.name: entry.stat().st_mtime_ns for entry in entries if entry.is_file()}
+
+
+def _weight_files(path: str) -> List[str]:
+    """Safetensors files of the export in ``path``, per its shard index"""
+    index_path = os.path.join(path, f"{WEIGHTS_NAME}.index.json")
+    if os.path.isfile(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            return sorted(set(json.load(f)["weight_map"].values()))
+    return [WEIGHTS_NAME]
+
+
+def is_quantized_export(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, QUANTIZATION_FILE))
+
+
+def load_exported(path: str):
+    """Load a model written by ``export_model``"""
+    if not is_quantized_export(path):
+        with open(os.path.join(path, "config.json"), "r", encoding="utf-8") as f:
+            dtype = json.load(f).get("torch_dtype")
+        return load_base_model(path, getattr(torch, dtype) if dtype else default_dtype())
+
+    with open(os.path.join(path, QUANTIZATION_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    from accelerate import init_empty_weights
+
+    config = AutoConfig.from_pretrained(path)
+    with init_empty_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=getattr(torch, manifest["dtype"]))
+
+    state: Dict[str, torch.Tensor] = {}
+    for file_name in _weight_files(path):
+        with safe_open(os.path.join(path, file_name), framework="pt") as f:
+            for key in f.keys():
+                state[key] = f.get_tensor(key)
+
+    for name in manifest["modules"]:
+        parent_name, _, attr = name.rpartition(".")
+        parent = model.get_submodule(parent_name) if parent_name else model
+        bias = state.pop(f"{name}.bias", None)
+        scales = state.pop(f"{name}.weight_scale")
+        if manifest["bits"] == 8:
+            layer = Int8Linear.from_int8(state.pop(f"{name}.weight_int8"), scales, bias)
+        else:
+            layer = Int4Linear(state.pop(f"{name}.weight_packed"), scales, manifest["group_size"], bias)
+        setattr(parent, attr, layer)
+
+    model.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise ValueError(f"Export at {path} is missing weights: {', '.join(missing[:5])}")
+    return model.eval()
+
+
+def run_export_worker(task_id: str, job_data: Dict[str, Any], options: Dict[str, Any], events) -> None:
+    """Worker entry point exporting a completed job's model; reports through ``events`` as ``task_id``"""
+    reporter = JobReporter(task_id, events)
+    config = job_data["config"]
+    reporter.emit("started")
+    result = export_model(
+        config["model_name"] if config["use_lora"] else config["output_dir"],
+        config["output_dir"] if config["use_lora"] else None,
+        options["output_dir"],
+        quantization=options["quantization"],
+        dtype=options.get("dtype"),
+        max_shard_size=options["max_shard_size"],
+        group_size=options["group_size"],
+        tokenizer_dir=config["output_dir"],
+        job_id=job_data["job_id"],
+    )
+    reporter.emit("completed", **result)
@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from config import config as app_config
+
+
+class InferenceError(Exception):
+    """Generation failed in the inference worker, or the worker is gone"""
+
+
+class InferenceServer:
+    """
+    Serves generation requests from a dedicated, long-lived worker process
+    (see ``core.inference_engine``), so the API process never loads models.
+
+    The worker is started on the first request. Requests from all callers
+    share one queue; the worker collects those arriving within
+    ``batch_window`` seconds into micro-batches of up to ``max_batch_size``.
+    Results are delivered to the event loop that made the request.
+    """
+
+    def __init__(self, batch_window: float, max_batch_size: int, max_models: int = 2, max_adapters: int = 8):
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_models = max_models
+        self.max_adapters = max_adapters
+        self._ctx = mp.get_context("spawn")
+        self._requests = None
+        self._results = None
+        self._process = None
+        self._futures: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    async def generate(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate for one request: ``model_name``, optional ``adapter_path``,
+        ``prompt``, ``max_new_tokens``, ``temperature`` and ``top_p``.
+        Raises InferenceError if generation fails.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._ensure_worker()
+            request_id = next(self._ids)
+            self._futures[request_id] = (loop, future)
+            # Wall clock, comparable across processes, for the queue time in results
+            self._requests.put((request_id, time.time(), request))
+        return await future
+
+    def shutdown(self, timeout: float = 10):
+        self._stopping.set()
+        with self._lock:
+            process, self._process = self._process, None
+            if process is not None:
+                self._requests.put(None)
+        if process is not None:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+        self._fail_all("Inference server shut down")
+
+    def _ensure_worker(self):
+        # Caller must hold self._lock
+        if self._process is not None and self._process.is_alive():
+            return
+        self._requests = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_run_worker,
+            args=(self._requests, self._results, self.batch_window, self.max_batch_size,
+                  self.max_models, self.max_adapters),
+            name="tunespace-inference",
+        )
+        self._process.start()
+        if self._listener is None or not self._listener.is_alive():
+            self._stopping.clear()
+            self._listener = threading.Thread(target=self._listen, name="tunespace-inference", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                results, process = self._results, self._process
+            try:
+                request_id, output, error = results.get(timeout=0.5)
+            except queue.Empty:
+                if process is not None and not process.is_alive():
+                    with self._lock:
+                        if self._process is process:
+                            self._process = None
+                    self._fail_all(f"Inference worker exited unexpectedly (exit code {process.exitcode})")
+                continue
+            except (EOFError, OSError):
+                continue
+
+            with self._lock:
+                entry = self._futures.pop(request_id, None)
+            if entry is not None:
+                loop, future = entry
+                loop.call_soon_threadsafe(_resolve, future, output, error)
+
+    def _fail_all(self, message: str):
+        with self._lock:
+            entries = list(self._futures.values())
+            self._futures.clear()
+        for loop, future in entries:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, future, None, message)
+
+
+def _resolve(future: asyncio.Future, output: Optional[Dict[str, Any]], error: Optional[str]):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(InferenceError(error))
+    else:
+        future.set_result(output)
+
+
+def _run_worker(*args):
+    # Imported here so torch is only loaded in the worker process
+    from .inference_engine import inference_loop
+    inference_loop(*args)
+
+
+_server: Optional[InferenceServer] = None
+
+def get_inference_server() -> InferenceServer:
+    """Return the process-wide InferenceServer"""
+    global _server
+    if _server is None:
+        _server = InferenceServer(
+            batch_window=app_config.INFERENCE_BATCH_WINDOW_MS / 1000,
+            max_batch_size=app_config.INFERENCE_MAX_BATCH_SIZE,
+            max_models=app_config.INFERENCE_MAX_MODELS,
+            max_adapters=app_config.INFERENCE_MAX_ADAPTERS,
+        )
+    return _server
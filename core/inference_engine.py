@@ -0,0 +1,184 @@
+import logging
+import queue
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+import torch
+from peft import PeftModel
+from transformers import AutoTokenizer
+from .export import is_quantized_export, load_exported
+from .model_registry import default_dtype, load_base_model
+
+logger = logging.getLogger(__name__)
+
+
+class _LoadedModel:
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        # Adapter path -> adapter name inside the PeftModel, least recently used first
+        self.adapters: "OrderedDict[str, str]" = OrderedDict()
+        self.adapter_count = 0
+
+
+class InferenceEngine:
+    """
+    Generation on cached base models with LoRA adapters swapped in per batch.
+
+    Each base model is loaded once; the first adapter wraps it in a
+    ``PeftModel`` and later adapters are added to the same wrapper, so
+    switching adapters only changes which LoRA weights are active. Requests
+    without an adapter run with the adapters disabled. At most
+    ``max_models`` base models and ``max_adapters`` adapters per model stay
+    loaded, least recently used first out.
+    """
+
+    def __init__(self, max_models: int = 2, max_adapters: int = 8):
+        self.max_models = max_models
+        self.max_adapters = max_adapters
+        self.dtype = default_dtype()
+        self._models: "OrderedDict[str, _LoadedModel]" = OrderedDict()
+
+    def generate(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Generate for requests sharing a model, adapter and sampling settings
+        as one padded batch, reusing the KV cache across decoding steps.
+        """
+        first = requests[0]
+        loaded = self._load(first["model_name"])
+        model, tokenizer = loaded.model, loaded.tokenizer
+        if first.get("adapter_path"):
+            self._activate(loaded, first["adapter_path"])
+            model = loaded.model
+
+        inputs = tokenizer([r["prompt"] for r in requests], return_tensors="pt", padding=True)
+        inputs = {name: tensor.to(model.device) for name, tensor in inputs.items()}
+        prompt_width = inputs["input_ids"].shape[1]
+        generation_kwargs = {
+            "max_new_tokens": max(r["max_new_tokens"] for r in requests),
+            "use_cache": True,
+            "pad_token_id": tokenizer.pad_token_id,
+            "do_sample": first["temperature"] > 0,
+        }
+        if generation_kwargs["do_sample"]:
+            generation_kwargs.update(temperature=first["temperature"], top_p=first["top_p"])
+
+        start = time.perf_counter()
+        with torch.inference_mode():
+            if not first.get("adapter_path") and isinstance(model, PeftModel):
+                with model.disable_adapter():
+                    output = model.generate(**inputs, **generation_kwargs)
+            else:
+                output = model.generate(**inputs, **generation_kwargs)
+        generate_ms = (time.perf_counter() - start) * 1000
+
+        results = []
+        for i, request in enumerate(requests):
+            tokens = output[i, prompt_width:prompt_width + request["max_new_tokens"]].tolist()
+            if tokenizer.eos_token_id in tokens:
+                tokens = tokens[:tokens.index(tokenizer.eos_token_id)]
+            results.append({
+                "text": tokenizer.decode(tokens, skip_special_tokens=True),
+                "prompt_tokens": int(inputs["attention_mask"][i].sum()),
+                "completion_tokens": len(tokens),
+                "batch_size": len(requests),
+                "generate_ms": round(generate_ms, 3),
+            })
+        return results
+
+    def _load(self, model_name: str) -> _LoadedModel:
+        loaded = self._models.get(model_name)
+        if loaded is not None:
+            self._models.move_to_end(model_name)
+            return loaded
+
+        # Left padding keeps every prompt's last token next to the generated ones
+        tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="left")
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        if is_quantized_export(model_name):
+            model = load_exported(model_name)
+        else:
+            model = load_base_model(model_name, self.dtype)
+        model.eval()
+
+        loaded = _LoadedModel(model, tokenizer)
+        self._models[model_name] = loaded
+        while len(self._models) > self.max_models:
+            self._models.popitem(last=False)
+        return loaded
+
+    def _activate(self, loaded: _LoadedModel, adapter_path: str):
+        name = loaded.adapters.get(adapter_path)
+        if name is None:
+            # Adapter names become module keys, so they cannot be paths
+            name = f"adapter_{loaded.adapter_count}"
+            loaded.adapter_count += 1
+            if isinstance(loaded.model, PeftModel):
+                loaded.model.load_adapter(adapter_path, adapter_name=name)
+            else:
+                loaded.model = PeftModel.from_pretrained(loaded.model, adapter_path, adapter_name=name)
+                loaded.model.eval()
+            loaded.adapters[adapter_path] = name
+
+            while len(loaded.adapters) > self.max_adapters:
+                _, evicted = loaded.adapters.popitem(last=False)
+                loaded.model.delete_adapter(evicted)
+        else:
+            loaded.adapters.move_to_end(adapter_path)
+
+        loaded.model.set_adapter(name)
+
+
+def _batch_key(request: Dict[str, Any]) -> Tuple:
+    return (
+        request["model_name"],
+        request.get("adapter_path"),
+        request["temperature"],
+        request["top_p"] if request["temperature"] > 0 else None,
+    )
+
+
+def inference_loop(requests, results, batch_window: float, max_batch_size: int,
+                   max_models: int, max_adapters: int):
+    """
+    Main loop of the inference worker process. After the first request
+    arrives, further requests are collected for up to ``batch_window``
+    seconds (or until ``max_batch_size``) and generated as one batch per
+    model, adapter and sampling settings.
+    """
+    engine = InferenceEngine(max_models=max_models, max_adapters=max_adapters)
+    stopping = False
+    while not stopping:
+        item = requests.get()
+        if item is None:
+            return
+
+        batch = [item]
+        deadline = time.monotonic() + batch_window
+        while len(batch) < max_batch_size:
+            try:
+                item = requests.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+
+        groups: Dict[Tuple, List[Tuple[int, float, Dict[str, Any]]]] = {}
+        for request_id, submitted, request in batch:
+            groups.setdefault(_batch_key(request), []).append((request_id, submitted, request))
+
+        for group in groups.values():
+            started = time.time()
+            try:
+                outputs = engine.generate([request for _, _, request in group])
+            except Exception as e:
+                logger.exception("Generation failed")
+                for request_id, _, _ in group:
+                    results.put((request_id, None, str(e)))
+                continue
+            for (request_id, submitted, _), output in zip(group, outputs):
+                output["queue_ms"] = round((started - submitted) * 1000, 3)
+                results.put((request_id, output, None))
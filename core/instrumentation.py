@@ -0,0 +1,101 @@
+import os
+import resource
+import time
+from typing import Any, Dict, Optional
+
+# Phases of a training job, in the order they run
+PHASES = ("tokenizer_load", "model_load", "lora_wrap", "dataset_load", "tokenize", "eval_prepare", "train", "save")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def cpu_seconds() -> float:
+    """User and system CPU time used by all threads of this process"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, where /proc is available"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size since the last ``reset_peak_rss``, or since the process started"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    # ru_maxrss is in kilobytes on Linux and cannot be reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_peak_rss():
+    """Restart peak RSS tracking at the current RSS (Linux only; a no-op elsewhere)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class PhaseRecorder:
+    """
+    Measures consecutive phases of a job in a worker process. ``start`` ends
+    the running phase, so phases never overlap and their wall times add up to
+    the job's. Each phase records wall time, CPU time, CPU utilization (1.0
+    is one fully busy core) and peak RSS, and every finished phase is sent as
+    a ``log`` event carrying all phases so far.
+    """
+
+    def __init__(self, reporter):
+        self.reporter = reporter
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self._current: Optional[tuple] = None
+
+    def start(self, name: str):
+        self.stop()
+        reset_peak_rss()
+        self._current = (name, time.perf_counter(), cpu_seconds())
+
+    def stop(self):
+        if self._current is None:
+            return
+        name, wall_start, cpu_start = self._current
+        self._current = None
+
+        wall = time.perf_counter() - wall_start
+        cpu = cpu_seconds() - cpu_start
+        self.phases[name] = {
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "cpu_utilization": round(cpu / wall, 2) if wall > 0 else 0.0,
+            "peak_rss_mb": round(peak_rss_bytes() / 1024 ** 2, 1),
+        }
+        self.reporter.emit("log", phases=dict(self.phases))
+
+
+class ResourceSampler:
+    """RSS and CPU utilization since the previous sample, for periodic training logs"""
+
+    def __init__(self):
+        self._last = (time.perf_counter(), cpu_seconds())
+
+    def sample(self) -> Dict[str, float]:
+        now, cpu = time.perf_counter(), cpu_seconds()
+        wall = now - self._last[0]
+        utilization = (cpu - self._last[1]) / wall if wall > 0 else 0.0
+        self._last = (now, cpu)
+
+        sample = {"cpu_utilization": round(utilization, 2)}
+        rss = rss_bytes()
+        if rss is not None:
+            sample["rss_mb"] = round(rss / 1024 ** 2, 1)
+        return sample
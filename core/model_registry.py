@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from config import config as app_config
+from .cpu_profile import quantize_frozen_linears
+
+
+class _Entry:
+    def __init__(self, model, nbytes: int):
+        self.model = model
+        self.nbytes = nbytes
+        self.in_use = False
+
+
+class ModelRegistry:
+    """
+    Per-process cache of base models and tokenizers shared by consecutive jobs.
+
+    Weights are loaded from safetensors with ``low_cpu_mem_usage`` so they are
+    read straight from the memory-mapped checkpoint instead of being
+    initialized first, and the page cache for a checkpoint is shared by every
+    worker reading it. A base model is handed to one job at a time via
+    ``acquire``; jobs wrap it in a fresh LoRA adapter and hand the unwrapped
+    model back with ``release``. Idle models are evicted least recently used
+    first once the total exceeds ``max_bytes``. Int8 base models (see
+    ``load_base_model``) are cached separately from full precision ones.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._models: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._tokenizers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._models.values())
+
+    def tokenizer(self, model_name: str):
+        with self._lock:
+            tokenizer = self._tokenizers.get(model_name)
+            if tokenizer is None:
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                if tokenizer.pad_token is None:
+                    tokenizer.pad_token = tokenizer.eos_token
+                self._tokenizers[model_name] = tokenizer
+            return tokenizer
+
+    def acquire(self, model_name: str, torch_dtype: torch.dtype, int8: bool = False, **load_kwargs):
+        """Return a cached base model, loading it on a miss. Call ``release`` when done."""
+        key = (model_name, _variant(torch_dtype, int8))
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and not entry.in_use:
+                self._models.move_to_end(key)
+                entry.in_use = True
+                return entry.model
+
+        model = load_base_model(model_name, torch_dtype, int8=int8, **load_kwargs)
+        if entry is not None:
+            # Already lent out; the caller gets a private copy that is not cached
+            return model
+
+        with self._lock:
+            entry = _Entry(model, model.get_memory_footprint())
+            entry.in_use = True
+            self._models[key] = entry
+            self._evict()
+        return model
+
+    def release(self, model_name: str, torch_dtype: torch.dtype, model, int8: bool = False):
+        """Return a base model obtained from ``acquire``, with any adapters removed"""
+        key = (model_name, _variant(torch_dtype, int8))
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None or entry.model is not model:
+                return
+            entry.in_use = False
+            self._evict()
+
+    def discard(self, model_name: str, torch_dtype: torch.dtype, int8: bool = False):
+        """Drop a cached model, e.g. after a job left it in an unknown state"""
+        with self._lock:
+            self._models.pop((model_name, _variant(torch_dtype, int8)), None)
+
+    def loaded(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"model_name": name, "dtype": dtype, "bytes": entry.nbytes, "in_use": entry.in_use}
+                for (name, dtype), entry in self._models.items()
+            ]
+
+    def _evict(self):
+        # Caller must hold self._lock
+        total = self.total_bytes
+        for key in list(self._models):
+            if total <= self.max_bytes:
+                break
+            entry = self._models[key]
+            if entry.in_use:
+                continue
+            del self._models[key]
+            total -= entry.nbytes
+
+
+def _variant(torch_dtype: torch.dtype, int8: bool) -> str:
+    return f"{torch_dtype}+int8" if int8 else str(torch_dtype)
+
+
+def load_base_model(model_name: str, torch_dtype: torch.dtype, int8: bool = False, **load_kwargs):
+    """
+    Load a base model. With ``int8`` its frozen linear layers, apart from the
+    LoRA targets, are quantized to int8 for CPU training under LoRA.
+    """
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch_dtype,
+        low_cpu_mem_usage=True,
+        **load_kwargs
+    )
+    if int8:
+        quantize_frozen_linears(model)
+    return model
+
+
+_registry: Optional[ModelRegistry] = None
+
+def get_model_registry() -> ModelRegistry:
+    """Return this process's ModelRegistry"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry(max_bytes=int(app_config.MODEL_CACHE_MAX_GB * 1024 ** 3))
+    return _registry
+
+
+def default_dtype() -> torch.dtype:
+    return torch.float16 if torch.cuda.is_available() else torch.float32
+
+
+def prewarm_models(model_names: List[str], events=None):
+    """Worker task loading base models and tokenizers into the registry ahead of jobs"""
+    registry = get_model_registry()
+    dtype = default_dtype()
+    for model_name in model_names:
+        registry.tokenizer(model_name)
+        model = registry.acquire(model_name, dtype)
+        registry.release(model_name, dtype, model)
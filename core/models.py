@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Literal, Union
 from datetime import datetime
 from enum import Enum
 
@@ -9,6 +9,7 @@ class JobStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     CANCELLED = "cancelled"
+    PAUSED = "paused"
 
 class TrainingConfig(BaseModel):
     model_name: str
@@ -21,12 +22,43 @@ class TrainingConfig(BaseModel):
     warmup_steps: int = 500
     logging_steps: int = 50
     save_steps: int = 1000
+    # "steps" (every eval_steps), "epoch" or "no"
     evaluation_strategy: str = "steps"
     eval_steps: int = 500
+    # Evaluated on eval_dataset_path, else the "<stem>_test" split next to
+    # dataset_path, else an eval_holdout fraction of the training data
+    eval_dataset_path: Optional[str] = None
+    eval_holdout: float = 0.05
+    # Evaluation scores a fixed subsample and is skipped while it would take
+    # more than eval_max_fraction of the training time
+    eval_max_samples: Optional[int] = 512
+    eval_batch_size: Optional[int] = None
+    eval_max_fraction: float = 0.1
     use_lora: bool = True
     lora_r: int = 16
     lora_alpha: int = 32
     lora_dropout: float = 0.1
+    # "padded": pad every map chunk to its longest sample (legacy behaviour)
+    # "dynamic": pad per training batch and group samples of similar length
+    # "packed": concatenate samples into max_length blocks without padding
+    batching_strategy: Literal["padded", "dynamic", "packed"] = "padded"
+    # Builds training text from instruction/input/output records instead of a
+    # "text" column: a built-in template ("alpaca", "chatml", "plain") or a
+    # format string with {instruction} and {input}. mask_prompt trains on the
+    # response tokens only.
+    prompt_template: Optional[str] = None
+    mask_prompt: bool = True
+    # CPU performance profile, ignored when training on a GPU
+    # cpu_bf16: bf16 autocast, if the CPU supports bf16 natively
+    # cpu_int8_base: int8 frozen base weights outside the LoRA targets (LoRA only)
+    # cpu_cores / cpu_threads: pin the job to these cores / intra-op thread count
+    cpu_bf16: bool = False
+    cpu_int8_base: bool = False
+    cpu_cores: Optional[List[int]] = None
+    cpu_threads: Optional[int] = None
+    dataloader_num_workers: int = 0
+    # Memory the job needs, for placing it on a distributed worker node (defaults to JOB_MEMORY_GB)
+    memory_gb: Optional[float] = None
 
 class FineTuningJob(BaseModel):
     job_id: str
@@ -41,6 +73,78 @@ class FineTuningJob(BaseModel):
     current_step: int = 0
     total_steps: int = 0
 
+# TrainingConfig fields a sweep may vary. Fields that change tokenization
+# (max_length, batching_strategy, prompt_template) stay fixed so all trials
+# share one tokenized dataset.
+SWEEP_FIELDS = ("learning_rate", "lora_r", "lora_alpha", "lora_dropout", "batch_size", "warmup_steps")
+
+class SweepStatus(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+class TrialStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    PRUNED = "pruned"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class ParameterRange(BaseModel):
+    """Continuous range for random search; ``log`` samples log-uniformly"""
+    min: float
+    max: float
+    log: bool = False
+
+class SweepConfig(BaseModel):
+    base: TrainingConfig
+    # Field name -> candidate values (grid or random) or a range (random only)
+    parameters: Dict[str, Union[List[Any], ParameterRange]]
+    search: Literal["grid", "random"] = "grid"
+    # Random search: number of samples. Grid search: optional random subset of the grid
+    num_trials: Optional[int] = None
+    # "asha": asynchronous successive halving on the training loss
+    pruning: Literal["asha", "none"] = "asha"
+    # Step of the first ASHA rung; rung k is at grace_steps * reduction_factor ** k
+    grace_steps: int = 50
+    # Only the best 1 / reduction_factor of the trials reaching a rung continue past it
+    reduction_factor: int = 3
+    seed: int = 0
+    priority: int = 0
+
+class SweepTrial(BaseModel):
+    index: int
+    params: Dict[str, Any]
+    job_id: Optional[str] = None
+    status: TrialStatus = TrialStatus.PENDING
+    current_step: int = 0
+    total_steps: int = 0
+    loss: Optional[float] = None
+    # Training loss when the trial reached each rung, keyed by the rung's step
+    rung_losses: Dict[str, float] = {}
+
+class Sweep(BaseModel):
+    sweep_id: str
+    status: SweepStatus
+    config: SweepConfig
+    trials: List[SweepTrial]
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    best_trial: Optional[int] = None
+
+class ExportConfig(BaseModel):
+    # Weight-only quantization of the merged model's linear layers (lm_head stays in full precision)
+    quantization: Literal["none", "int8", "int4"] = "none"
+    # Defaults to the training dtype
+    dtype: Optional[Literal["float32", "float16", "bfloat16"]] = None
+    max_shard_size: str = "2GB"
+    # Inputs per int4 scale; layers whose input size it does not divide are left unquantized
+    group_size: int = 128
+    # Defaults to export-<quantization> inside the job's output_dir
+    output_dir: Optional[str] = None
+
 class ModelInfo(BaseModel):
     name: str
     type: str
@@ -54,4 +158,28 @@ class DatasetInfo(BaseModel):
     size: int
     format: str
     num_samples: Optional[int] = None
-    columns: Optional[list] = None
\ No newline at end of file
+    columns: Optional[list] = None
+    content_hash: Optional[str] = None
+    token_length_histogram: Optional[Dict[str, int]] = None
+    validation_error: Optional[str] = None
+
+class JobSummary(BaseModel):
+    job_id: str
+    status: JobStatus
+    model_name: str
+    dataset_path: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+    progress: float = 0.0
+    current_step: int = 0
+    total_steps: int = 0
+
+    @classmethod
+    def from_job(cls, job: FineTuningJob) -> "JobSummary":
+        return cls(
+            model_name=job.config.model_name,
+            dataset_path=job.config.dataset_path,
+            **job.model_dump(include=set(cls.model_fields) - {"model_name", "dataset_path"})
+        )
@@ -0,0 +1,92 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from .models import FineTuningJob, JobStatus
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latest training log values exported per active job: (metrics key, metric name, help)
+JOB_GAUGES = (
+    ("loss", "tunespace_job_loss", "Latest training loss"),
+    ("learning_rate", "tunespace_job_learning_rate", "Latest learning rate"),
+    ("tokens_per_second", "tunespace_job_tokens_per_second", "Non-padding tokens trained per second"),
+    ("pad_fraction", "tunespace_job_pad_fraction", "Fraction of padding tokens in training batches"),
+    ("eval_loss", "tunespace_job_eval_loss", "Latest evaluation loss"),
+    ("eval_perplexity", "tunespace_job_eval_perplexity", "Latest evaluation perplexity"),
+    ("cpu_utilization", "tunespace_job_cpu_utilization", "Busy cores of the worker since the previous log"),
+)
+
+# Per-phase values exported per active job: (phase key, metric name, help, scale)
+PHASE_GAUGES = (
+    ("wall_seconds", "tunespace_job_phase_seconds", "Wall time spent in each phase", 1),
+    ("cpu_seconds", "tunespace_job_phase_cpu_seconds", "CPU time spent in each phase", 1),
+    ("peak_rss_mb", "tunespace_job_phase_peak_rss_bytes", "Peak worker RSS during each phase", 1024 ** 2),
+)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_family(name: str, kind: str, help_text: str, samples: Iterable[Sample]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+
+def _number(value) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def render_metrics(status_counts: Dict[str, int], active_jobs: Iterable[FineTuningJob],
+                   pending: int, running: int) -> str:
+    """
+    Render job counts, scheduler state and the progress, training metrics
+    and phase timings of active jobs in the Prometheus text format. Finished
+    jobs only contribute to the counts, which keeps label cardinality bounded.
+    """
+    jobs = list(active_jobs)
+    lines = _format_family(
+        "tunespace_jobs", "gauge", "Jobs in the job store by status",
+        [({"status": status.value}, status_counts.get(status.value, 0)) for status in JobStatus],
+    )
+    lines += _format_family("tunespace_queue_pending", "gauge", "Jobs waiting for a worker", [({}, pending)])
+    lines += _format_family("tunespace_workers_busy", "gauge", "Workers running a job", [({}, running)])
+
+    def job_labels(job: FineTuningJob) -> Dict[str, str]:
+        return {"job_id": job.job_id, "model": job.config.model_name}
+
+    lines += _format_family(
+        "tunespace_job_step", "gauge", "Current training step",
+        [(job_labels(job), job.current_step) for job in jobs],
+    )
+    lines += _format_family(
+        "tunespace_job_progress_ratio", "gauge", "Fraction of training steps completed",
+        [(job_labels(job), round(job.progress / 100, 6)) for job in jobs],
+    )
+
+    for key, name, help_text in JOB_GAUGES:
+        samples = [
+            (job_labels(job), value) for job in jobs
+            if (value := _number((job.metrics or {}).get(key))) is not None
+        ]
+        lines += _format_family(name, "gauge", help_text, samples)
+
+    rss = [
+        (job_labels(job), value * 1024 ** 2) for job in jobs
+        if (value := _number((job.metrics or {}).get("rss_mb"))) is not None
+    ]
+    lines += _format_family("tunespace_job_rss_bytes", "gauge", "Worker RSS at the latest training log", rss)
+
+    for key, name, help_text, scale in PHASE_GAUGES:
+        samples = [
+            ({**job_labels(job), "phase": phase}, stats[key] * scale)
+            for job in jobs
+            for phase, stats in ((job.metrics or {}).get("phases") or {}).items()
+            if _number(stats.get(key)) is not None
+        ]
+        lines += _format_family(name, "gauge", help_text, samples)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,398 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+EventHandler = Callable[[str, str, Dict[str, Any]], None]
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ("completed", "failed", "paused")
+
+# Internal event a worker sends once it is ready for the next job
+IDLE_EVENT = "__idle__"
+
+# Signal asking a worker's current job to save its state and stop (POSIX only)
+INTERRUPT_SIGNAL = getattr(signal, "SIGUSR1", None)
+
+# Set in a worker process once INTERRUPT_SIGNAL arrives for the current job
+_interrupted = threading.Event()
+
+
+def _request_interrupt(signum, frame):
+    _interrupted.set()
+
+
+class JobReporter:
+    """Worker-side handle used to send events back to the scheduler"""
+
+    def __init__(self, job_id: str, events):
+        self.job_id = job_id
+        self._events = events
+
+    def emit(self, kind: str, **data):
+        self._events.put((self.job_id, kind, data))
+
+    def interrupted(self) -> bool:
+        """Whether the scheduler asked this job to checkpoint and stop, see ``JobScheduler.interrupt``"""
+        return _interrupted.is_set()
+
+
+def _worker_loop(tasks, events, cores=None):
+    """
+    Main loop of a long-lived worker process. Keeping workers alive between
+    jobs lets them reuse state such as loaded base models.
+    """
+    if cores and hasattr(os, "sched_setaffinity"):
+        # Before torch is imported, so its thread pool is sized to these cores
+        os.sched_setaffinity(0, cores)
+    if INTERRUPT_SIGNAL is not None:
+        signal.signal(INTERRUPT_SIGNAL, _request_interrupt)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        job_id, target, args = task
+        _interrupted.clear()
+        try:
+            target(*args, events)
+        except Exception as e:
+            if job_id is not None:
+                events.put((job_id, "failed", {"error": str(e)}))
+            else:
+                logger.exception("Worker task %s failed", getattr(target, "__name__", target))
+
+        if job_id is not None:
+            events.put((job_id, IDLE_EVENT, {}))
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(parts: int) -> List[Optional[List[int]]]:
+    """
+    Split the available cores into ``parts`` disjoint, contiguous sets.
+    Returns ``None`` for every part when there are fewer cores than parts.
+    """
+    cores = available_cores()
+    if len(cores) < parts:
+        return [None] * parts
+    size, extra = divmod(len(cores), parts)
+    sets, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        sets.append(cores[start:end])
+        start = end
+    return sets
+
+
+class _WorkerSlot:
+    def __init__(self, process, tasks, index: int):
+        self.process = process
+        self.tasks = tasks
+        self.index = index
+        self.job_id: Optional[str] = None
+
+
+class JobScheduler:
+    """
+    Runs jobs on a bounded pool of worker processes.
+
+    Submitted jobs wait in a priority queue (higher priority first, FIFO within
+    a priority) until one of the ``max_workers`` workers is idle. Workers are
+    started on demand and kept between jobs; cancelling a running job
+    terminates its worker, which is replaced the next time a slot is needed.
+    Events sent by workers through ``JobReporter`` are delivered to
+    ``on_event`` on the event loop that submitted the job. With
+    ``core_sets``, the worker in slot ``i`` is pinned to ``core_sets[i]`` so
+    concurrent jobs do not compete for the same cores.
+    """
+
+    # Jobs run in this process's workers and end with it, see distributed.RedisJobQueue
+    remote = False
+
+    def __init__(self, max_workers: int, on_event: EventHandler,
+                 core_sets: Optional[List[Optional[List[int]]]] = None):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if core_sets is not None and len(core_sets) < max_workers:
+            raise ValueError("core_sets needs an entry for every worker")
+
+        self.max_workers = max_workers
+        self.core_sets = core_sets
+        self._on_event = on_event
+        self._ctx = mp.get_context("spawn")
+        self._events = self._ctx.Queue()
+        self._pending: List[Tuple[int, int, str]] = []
+        self._payloads: Dict[str, Tuple[Callable, tuple]] = {}
+        self._slots: List[_WorkerSlot] = []
+        self._running: Dict[str, _WorkerSlot] = {}
+        self._reported: Set[str] = set()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._payloads)
+
+    @property
+    def running_count(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+    def is_running(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._running
+
+    def submit(self, job_id: str, target: Callable, args: tuple = (), priority: int = 0,
+               resources: Optional[Dict[str, float]] = None):
+        """
+        Queue ``target(*args, events)`` to run in a worker process.
+        ``events`` is the queue a ``JobReporter`` should be built on.
+        ``resources`` is only used by distributed queues; local workers
+        share this machine.
+        """
+        self._capture_loop()
+
+        with self._lock:
+            self._payloads[job_id] = (target, args)
+            heapq.heappush(self._pending, (-priority, next(self._counter), job_id))
+            self._ensure_listener()
+            self._dispatch()
+
+    def broadcast(self, target: Callable, args: tuple = ()):
+        """
+        Run ``target(*args, events)`` once in every worker, starting workers
+        up to ``max_workers``. Workers that are busy run it after their
+        current job.
+        """
+        self._capture_loop()
+
+        with self._lock:
+            self._ensure_listener()
+            while len(self._slots) < self.max_workers:
+                self._spawn()
+            for slot in self._slots:
+                slot.tasks.put((None, target, args))
+
+    def dequeue(self, job_id: str) -> bool:
+        """Drop a job that is still waiting for a worker"""
+        with self._lock:
+            # The heap entry is skipped lazily in _dispatch
+            return self._payloads.pop(job_id, None) is not None
+
+    def interrupt(self, job_id: str) -> bool:
+        """
+        Ask the worker running ``job_id`` to save the job's state and stop.
+        The job sees this through ``JobReporter.interrupted`` and reports
+        ``paused`` once it has stopped.
+        """
+        if INTERRUPT_SIGNAL is None:
+            return False
+        with self._lock:
+            slot = self._running.get(job_id)
+            return slot is not None and self._signal_interrupt(slot.process)
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job or terminate the worker running it"""
+        if self.dequeue(job_id):
+            return True
+        with self._lock:
+            slot = self._running.pop(job_id, None)
+            if slot is None:
+                return False
+            self._slots.remove(slot)
+
+        self._stop_process(slot.process)
+        self._reported.discard(job_id)
+
+        with self._lock:
+            self._dispatch()
+        return True
+
+    def shutdown(self, grace: float = 2):
+        """
+        Stop all workers and forget queued jobs. Running jobs are interrupted
+        and have ``grace`` seconds in total to save their state before their
+        workers are terminated.
+        """
+        self._stopping.set()
+        with self._lock:
+            self._payloads.clear()
+            self._pending.clear()
+            slots = list(self._slots)
+            self._slots.clear()
+            self._running.clear()
+
+        for slot in slots:
+            if slot.job_id is not None and INTERRUPT_SIGNAL is not None:
+                self._signal_interrupt(slot.process)
+            slot.tasks.put(None)
+
+        deadline = time.monotonic() + grace
+        for slot in slots:
+            self._stop_process(slot.process, grace=max(0.0, deadline - time.monotonic()))
+
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def _capture_loop(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    def _spawn(self) -> _WorkerSlot:
+        # Caller must hold self._lock
+        used = {slot.index for slot in self._slots}
+        index = next(i for i in range(self.max_workers) if i not in used)
+        cores = self.core_sets[index] if self.core_sets else None
+
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_loop,
+            args=(tasks, self._events, cores),
+            name=f"tunespace-worker-{index}",
+        )
+        process.start()
+        slot = _WorkerSlot(process, tasks, index)
+        self._slots.append(slot)
+        return slot
+
+    def _idle_slot(self) -> Optional[_WorkerSlot]:
+        # Caller must hold self._lock
+        for slot in self._slots:
+            if slot.job_id is None and slot.process.is_alive():
+                return slot
+        if len(self._slots) < self.max_workers:
+            return self._spawn()
+        return None
+
+    def _dispatch(self):
+        # Caller must hold self._lock
+        while self._pending:
+            slot = self._idle_slot()
+            if slot is None:
+                return
+
+            _, _, job_id = heapq.heappop(self._pending)
+            payload = self._payloads.pop(job_id, None)
+            if payload is None:
+                continue
+
+            target, args = payload
+            slot.job_id = job_id
+            slot.tasks.put((job_id, target, args))
+            self._running[job_id] = slot
+
+    def _ensure_listener(self):
+        if self._listener is None or not self._listener.is_alive():
+            self._stopping.clear()
+            self._listener = threading.Thread(
+                target=self._listen, name="tunespace-scheduler", daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            try:
+                event = self._events.get(timeout=0.5)
+            except queue.Empty:
+                pass
+            else:
+                self._handle(*event)
+            self._reap()
+
+    def _handle(self, job_id: str, kind: str, data: Dict[str, Any]):
+        if kind != IDLE_EVENT:
+            self._deliver(job_id, kind, data)
+            return
+
+        with self._lock:
+            slot = self._running.pop(job_id, None)
+            if slot is not None:
+                slot.job_id = None
+            self._dispatch()
+
+        if slot is not None and job_id not in self._reported:
+            self._deliver(job_id, "failed", {"error": "Worker finished without reporting a result"})
+        self._reported.discard(job_id)
+
+    def _reap(self):
+        with self._lock:
+            exited = [slot for slot in self._slots if not slot.process.is_alive()]
+        if not exited:
+            return
+
+        # A worker that exited has already flushed its events into the pipe,
+        # so drain them before deciding whether it died without reporting.
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self._handle(*event)
+
+        with self._lock:
+            lost = []
+            for slot in exited:
+                if slot in self._slots:
+                    self._slots.remove(slot)
+                if slot.job_id is not None and self._running.get(slot.job_id) is slot:
+                    del self._running[slot.job_id]
+                    lost.append((slot.job_id, slot.process))
+            self._dispatch()
+
+        for job_id, process in lost:
+            process.join()
+            if job_id not in self._reported:
+                self._deliver(job_id, "failed", {
+                    "error": f"Worker process exited unexpectedly (exit code {process.exitcode})",
+                    "worker_lost": True,
+                })
+            self._reported.discard(job_id)
+
+    def _deliver(self, job_id: str, kind: str, data: Dict[str, Any]):
+        if kind in TERMINAL_EVENTS:
+            self._reported.add(job_id)
+
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._on_event, job_id, kind, data)
+        else:
+            self._on_event(job_id, kind, data)
+
+    @staticmethod
+    def _signal_interrupt(process) -> bool:
+        try:
+            os.kill(process.pid, INTERRUPT_SIGNAL)
+        except (ProcessLookupError, TypeError):
+            # Already exited, or never started
+            return False
+        return True
+
+    @staticmethod
+    def _stop_process(process, grace: float = 0):
+        process.join(timeout=grace)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=10)
+        if process.is_alive():
+            process.kill()
+            process.join()
@@ -0,0 +1,377 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+from .dataset_cache import TokenizedDatasetCache, file_sha256
+from .models import FineTuningJob, JobStatus
+from .store import JobStore
+from .uploads import TEMP_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Written to a job's output_dir so only that job resumes from (or cleans up) the files there
+JOB_OWNER_FILE = "tunespace-job.json"
+
+CHECKPOINT_PREFIX = "checkpoint-"
+
+# Written to an export's output_dir, listing the files the export wrote there
+EXPORT_MANIFEST = "tunespace-export.json"
+
+# Upload sessions live in the API process, so older temporary files belong to lost sessions
+STALE_UPLOAD_SECONDS = 24 * 3600
+
+# Jobs whose output directory may be removed once they are AUTO_CLEANUP_DAYS old
+EXPIRING_STATUSES = (JobStatus.FAILED, JobStatus.CANCELLED, JobStatus.PAUSED)
+
+
+class ContentStore:
+    """
+    Stores identical files once, as hard links to a content-addressed blob.
+
+    Each distinct content is kept under ``root/<sha256[:2]>/<sha256>``; a
+    deduplicated file is a hard link to its blob, so it still reads and
+    memory-maps like any other file and deleting it never affects the other
+    copies. A blob whose only remaining link is the store's own is garbage.
+    Linked files share one inode and must not be rewritten in place: blobs
+    are made read-only, and ``unshare_tree`` gives a directory private
+    copies before anything writes to it again. ``root`` must be on the same
+    filesystem as the deduplicated files; others are skipped.
+    """
+
+    def __init__(self, root: str, min_bytes: int = 64 * 1024):
+        self.root = root
+        self.min_bytes = min_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def add(self, path: str) -> int:
+        """Deduplicate one file; returns the bytes saved (0 when it is the first copy)"""
+        stat = os.stat(path)
+        # More than one link means the file is already in the store
+        if stat.st_nlink > 1 or stat.st_size < self.min_bytes:
+            return 0
+
+        blob = self.blob_path(file_sha256(path))
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(path, blob)
+        except FileExistsError:
+            pass
+        else:
+            os.chmod(blob, stat.st_mode & ~0o222)
+            return 0
+
+        tmp_path = f"{path}.dedup-{os.getpid()}"
+        os.link(blob, tmp_path)
+        os.replace(tmp_path, path)
+        return stat.st_size
+
+    def add_tree(self, root: str) -> Tuple[int, int]:
+        """Deduplicate every file under ``root``; returns ``(files linked, bytes saved)``"""
+        linked = saved = 0
+        for path in _walk_files(root):
+            try:
+                bytes_saved = self.add(path)
+            except OSError as e:
+                # E.g. another filesystem, or the file vanished
+                logger.debug("Not deduplicating %s: %s", path, e)
+                continue
+            if bytes_saved:
+                linked += 1
+                saved += bytes_saved
+        return linked, saved
+
+    def collect_garbage(self, dry_run: bool = False) -> Tuple[int, int]:
+        """Remove blobs no file links to any more; returns ``(blobs removed, bytes freed)``"""
+        removed = freed = 0
+        for path in _walk_files(self.root):
+            stat = os.stat(path)
+            if stat.st_nlink > 1:
+                continue
+            if not dry_run:
+                os.remove(path)
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
+
+    def usage(self) -> Dict[str, int]:
+        blobs = blob_bytes = saved = 0
+        for path in _walk_files(self.root):
+            stat = os.stat(path)
+            blobs += 1
+            blob_bytes += stat.st_size
+            # One link is the store's, one is the copy that would exist anyway
+            saved += stat.st_size * max(0, stat.st_nlink - 2)
+        return {"blobs": blobs, "bytes": blob_bytes, "saved_bytes": saved}
+
+
+def unshare_tree(root: str):
+    """Replace hard-linked files under ``root`` with private, writable copies"""
+    for path in _walk_files(root):
+        stat = os.stat(path)
+        if stat.st_nlink < 2:
+            continue
+        tmp_path = f"{path}.unshare-{os.getpid()}"
+        shutil.copyfile(path, tmp_path)
+        os.chmod(tmp_path, stat.st_mode | 0o200)
+        os.replace(tmp_path, path)
+
+
+def owns_output_dir(output_dir: str, job_id: str) -> bool:
+    owner_path = os.path.join(output_dir, JOB_OWNER_FILE)
+    if not os.path.exists(owner_path):
+        return False
+    with open(owner_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("job_id") == job_id
+
+
+def read_export_manifest(output_dir: str) -> Optional[Dict[str, Any]]:
+    """The manifest of the export in ``output_dir`` (``job_id`` and ``files``), if there is one"""
+    try:
+        with open(os.path.join(output_dir, EXPORT_MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def tree_usage(root: str, seen: Optional[Set[Tuple[int, int]]] = None) -> Dict[str, int]:
+    """
+    Bytes of the files under ``root``; ``disk_bytes`` counts each inode once
+    (also across calls sharing ``seen``) and ``shared_bytes`` is the part in
+    files that are hard links to deduplicated content.
+    """
+    seen = set() if seen is None else seen
+    usage = {"files": 0, "bytes": 0, "disk_bytes": 0, "shared_bytes": 0}
+    for path in _walk_files(root):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        usage["files"] += 1
+        usage["bytes"] += stat.st_size
+        if stat.st_nlink > 1:
+            usage["shared_bytes"] += stat.st_size
+        if (stat.st_dev, stat.st_ino) not in seen:
+            seen.add((stat.st_dev, stat.st_ino))
+            usage["disk_bytes"] += stat.st_size
+    return usage
+
+
+def _walk_files(root: str) -> Iterable[str]:
+    if not os.path.isdir(root):
+        return
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if not os.path.islink(path):
+                yield path
+
+
+class StorageJanitor:
+    """
+    Applies the retention policies to jobs' output directories, the datasets
+    directory and the caches, and deduplicates what is kept.
+
+    - Completed jobs lose their intermediate checkpoints (completed jobs are
+      not resumed) and their remaining files are deduplicated. With
+      ``completed_retention_days``, their whole output goes after that long.
+    - Failed, cancelled and paused jobs whose last activity is older than
+      ``retention_days`` lose their output directory.
+    - Tokenized datasets unused for ``retention_days`` are removed, and so
+      are temporary files of abandoned uploads.
+    - Datasets are deduplicated; they are never removed.
+
+    Output directories are only touched while the job still owns them (see
+    JOB_OWNER_FILE) and never while ``is_busy(job_id)``. Job records are
+    kept, with what was done in ``metrics["storage"]``.
+    """
+
+    def __init__(self, store: JobStore, content_store: ContentStore, tokenized_cache: TokenizedDatasetCache,
+                 data_dir: str, retention_days: int, completed_retention_days: int = 0,
+                 is_busy: Callable[[str], bool] = lambda job_id: False):
+        self.store = store
+        self.content_store = content_store
+        self.tokenized_cache = tokenized_cache
+        self.data_dir = data_dir
+        self.retention_days = retention_days
+        self.completed_retention_days = completed_retention_days
+        self.is_busy = is_busy
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        """One pass of every policy; with ``dry_run`` only reports what it would do"""
+        with self._lock:
+            start = time.perf_counter()
+            report = {
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "dry_run": dry_run,
+                "jobs_removed": [],
+                "jobs_compacted": [],
+                "checkpoints_removed": 0,
+                "tokenized_entries_removed": 0,
+                "uploads_removed": 0,
+                "files_deduplicated": 0,
+                "blobs_removed": 0,
+                "freed_bytes": 0,
+            }
+            now = datetime.now()
+
+            for job in self.store.finished([JobStatus.COMPLETED]):
+                storage = (job.metrics or {}).get("storage", {})
+                if storage.get("status") == "removed" or self.is_busy(job.job_id):
+                    continue
+                if self.completed_retention_days > 0 and _last_activity(job) < now - timedelta(days=self.completed_retention_days):
+                    self._remove_output(job, report, dry_run)
+                elif storage.get("status") != "compacted":
+                    self._compact(job, report, dry_run)
+
+            if self.retention_days > 0:
+                cutoff = now - timedelta(days=self.retention_days)
+                for job in self.store.finished(EXPIRING_STATUSES, before=cutoff):
+                    if (job.metrics or {}).get("storage", {}).get("status") != "removed" and not self.is_busy(job.job_id):
+                        self._remove_output(job, report, dry_run)
+
+                for entry in self.tokenized_cache.entries():
+                    if entry["last_used"] < time.time() - self.retention_days * 86400:
+                        if not dry_run:
+                            self.tokenized_cache.remove(entry["key"])
+                        report["tokenized_entries_removed"] += 1
+                        report["freed_bytes"] += entry["size"]
+
+            self._clean_data_dir(report, dry_run)
+
+            blobs_removed, freed = self.content_store.collect_garbage(dry_run)
+            report["blobs_removed"] = blobs_removed
+            report["freed_bytes"] += freed
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            if not dry_run:
+                self.last_run = report
+            return report
+
+    def _compact(self, job: FineTuningJob, report: Dict[str, Any], dry_run: bool):
+        output_dir = job.config.output_dir
+        if not os.path.isdir(output_dir) or not owns_output_dir(output_dir, job.job_id):
+            return
+
+        checkpoints = [
+            os.path.join(output_dir, name) for name in os.listdir(output_dir)
+            if name.startswith(CHECKPOINT_PREFIX) and os.path.isdir(os.path.join(output_dir, name))
+        ]
+        freed = sum(tree_usage(path)["disk_bytes"] for path in checkpoints)
+        report["jobs_compacted"].append(job.job_id)
+        report["checkpoints_removed"] += len(checkpoints)
+        report["freed_bytes"] += freed
+        if dry_run:
+            return
+
+        for path in checkpoints:
+            shutil.rmtree(path, ignore_errors=True)
+        linked, saved = self.content_store.add_tree(output_dir)
+        report["files_deduplicated"] += linked
+        report["freed_bytes"] += saved
+        self._record(job, {
+            "status": "compacted",
+            "checkpoints_removed": len(checkpoints),
+            "deduplicated_bytes": saved,
+            "freed_bytes": freed + saved,
+        })
+
+    def _remove_output(self, job: FineTuningJob, report: Dict[str, Any], dry_run: bool):
+        output_dir = job.config.output_dir
+        if not os.path.isdir(output_dir) or not owns_output_dir(output_dir, job.job_id):
+            return
+
+        # Files linked to other copies free nothing until the blob is collected
+        freed = tree_usage(output_dir)
+        freed = freed["bytes"] - freed["shared_bytes"]
+        report["jobs_removed"].append(job.job_id)
+        report["freed_bytes"] += freed
+        if dry_run:
+            return
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        export = (job.metrics or {}).get("export")
+        if export and is_within(export.get("path") or export.get("output_dir", ""), output_dir):
+            job.metrics["export"] = {**export, "status": "removed"}
+        self._record(job, {"status": "removed", "freed_bytes": freed})
+
+    def _clean_data_dir(self, report: Dict[str, Any], dry_run: bool):
+        if not os.path.isdir(self.data_dir):
+            return
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if entry.name.startswith(TEMP_PREFIX):
+                    stat = entry.stat()
+                    if stat.st_mtime < time.time() - STALE_UPLOAD_SECONDS:
+                        if not dry_run:
+                            os.remove(entry.path)
+                        report["uploads_removed"] += 1
+                        report["freed_bytes"] += stat.st_size
+                elif not dry_run:
+                    try:
+                        saved = self.content_store.add(entry.path)
+                    except OSError as e:
+                        logger.debug("Not deduplicating %s: %s", entry.path, e)
+                        continue
+                    if saved:
+                        report["files_deduplicated"] += 1
+                        report["freed_bytes"] += saved
+
+    def _record(self, job: FineTuningJob, storage: Dict[str, Any]):
+        job.metrics = {**(job.metrics or {}), "storage": {**storage, "at": datetime.now().isoformat(timespec="seconds")}}
+        self.store.save(job)
+
+    def usage(self, areas: Dict[str, str], limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """
+        Disk usage of ``areas`` (name -> directory) and of the output
+        directories of one page of jobs, newest first
+        """
+        seen: Set[Tuple[int, int]] = set()
+        totals = {name: tree_usage(path, seen) for name, path in areas.items()}
+        jobs, total = self.store.list_jobs(limit=limit, offset=offset, full=True)
+        return {
+            "areas": totals,
+            "disk_bytes": sum(usage["disk_bytes"] for usage in totals.values()),
+            "deduplication": self.content_store.usage(),
+            "jobs": [
+                {
+                    "job_id": job.job_id,
+                    "status": job.status.value,
+                    "output_dir": job.config.output_dir,
+                    **tree_usage(job.config.output_dir),
+                    "storage": (job.metrics or {}).get("storage"),
+                }
+                for job in jobs
+            ],
+            "total_jobs": total,
+            "last_cleanup": self.last_run,
+        }
+
+    async def run_periodically(self, interval: float):
+        """Run a pass every ``interval`` seconds, starting now, off the event loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.run)
+            except Exception:
+                logger.exception("Storage cleanup failed")
+            await asyncio.sleep(interval)
+
+
+def is_within(path: str, root: str) -> bool:
+    path, root = os.path.abspath(path), os.path.abspath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def _last_activity(job: FineTuningJob) -> datetime:
+    return job.completed_at or job.started_at or job.created_at
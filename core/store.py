@@ -0,0 +1,232 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    event,
+    func,
+    insert,
+    select,
+    update,
+)
+from .models import FineTuningJob, JobStatus, JobSummary, Sweep, SweepStatus
+
+metadata = MetaData()
+
+jobs_table = Table(
+    "jobs",
+    metadata,
+    Column("job_id", String(36), primary_key=True),
+    Column("status", String(16), nullable=False),
+    Column("model_name", String(255), nullable=False),
+    Column("dataset_path", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("started_at", DateTime),
+    Column("completed_at", DateTime),
+    Column("error_message", Text),
+    Column("progress", Float, nullable=False, default=0.0),
+    Column("current_step", Integer, nullable=False, default=0),
+    Column("total_steps", Integer, nullable=False, default=0),
+    Column("config", Text, nullable=False),
+    Column("metrics", Text),
+    # (status, created_at) serves filtered listings, created_at the unfiltered one
+    Index("ix_jobs_status_created_at", "status", "created_at"),
+    Index("ix_jobs_created_at", "created_at"),
+)
+
+sweeps_table = Table(
+    "sweeps",
+    metadata,
+    Column("sweep_id", String(36), primary_key=True),
+    Column("status", String(16), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    # The whole Sweep, trials included; sweeps are read and written as a unit
+    Column("data", Text, nullable=False),
+    Index("ix_sweeps_created_at", "created_at"),
+)
+
+SUMMARY_COLUMNS = [jobs_table.c[name] for name in JobSummary.model_fields]
+
+
+class JobStore:
+    """Persists fine-tuning jobs in the database configured by DATABASE_URL"""
+
+    def __init__(self, database_url: str):
+        self.engine = create_database_engine(database_url)
+        metadata.create_all(self.engine)
+
+    def save(self, job: FineTuningJob):
+        row = self._to_row(job)
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(jobs_table).where(jobs_table.c.job_id == job.job_id).values(**row)
+            )
+            if result.rowcount == 0:
+                conn.execute(insert(jobs_table).values(job_id=job.job_id, **row))
+
+    def get(self, job_id: str) -> Optional[FineTuningJob]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(jobs_table).where(jobs_table.c.job_id == job_id)
+            ).mappings().first()
+        return self._from_row(row) if row else None
+
+    def list_jobs(self, statuses: Optional[Sequence[JobStatus]] = None, limit: int = 50,
+                  offset: int = 0, full: bool = False) -> Tuple[List[Union[JobSummary, FineTuningJob]], int]:
+        """Return one page of jobs, newest first, and the total number of matches"""
+        columns = [jobs_table] if full else SUMMARY_COLUMNS
+        query = select(*columns)
+        count_query = select(func.count()).select_from(jobs_table)
+
+        if statuses:
+            condition = jobs_table.c.status.in_([JobStatus(s).value for s in statuses])
+            query = query.where(condition)
+            count_query = count_query.where(condition)
+
+        query = query.order_by(jobs_table.c.created_at.desc()).limit(limit).offset(offset)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).mappings().all()
+            total = conn.execute(count_query).scalar_one()
+
+        if full:
+            return [self._from_row(row) for row in rows], total
+        return [JobSummary.model_validate(dict(row)) for row in rows], total
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(jobs_table.c.status, func.count()).group_by(jobs_table.c.status)
+            ).all()
+        return {status: count for status, count in rows}
+
+    def unfinished(self) -> List[FineTuningJob]:
+        """Jobs left pending or running by a previous process, oldest first"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(jobs_table)
+                .where(jobs_table.c.status.in_([JobStatus.PENDING.value, JobStatus.RUNNING.value]))
+                .order_by(jobs_table.c.created_at)
+            ).mappings().all()
+        return [self._from_row(row) for row in rows]
+
+    def fail_unfinished(self, message: str, keep: Sequence[str] = ()) -> int:
+        """Mark jobs left pending or running by a previous process, except those in ``keep``, as failed"""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(jobs_table)
+                .where(jobs_table.c.status.in_([JobStatus.PENDING.value, JobStatus.RUNNING.value]))
+                .where(jobs_table.c.job_id.not_in(list(keep)))
+                .values(
+                    status=JobStatus.FAILED.value,
+                    error_message=message,
+                    completed_at=datetime.now(),
+                )
+            )
+        return result.rowcount
+
+    def finished(self, statuses: Sequence[JobStatus], before: Optional[datetime] = None) -> List[FineTuningJob]:
+        """Jobs in ``statuses``, oldest first; with ``before``, only those last active before then"""
+        last_activity = func.coalesce(jobs_table.c.completed_at, jobs_table.c.started_at, jobs_table.c.created_at)
+        query = select(jobs_table).where(jobs_table.c.status.in_([JobStatus(s).value for s in statuses]))
+        if before is not None:
+            query = query.where(last_activity < before)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query.order_by(jobs_table.c.created_at)).mappings().all()
+        return [self._from_row(row) for row in rows]
+
+    def save_sweep(self, sweep: Sweep):
+        row = {"status": sweep.status.value, "created_at": sweep.created_at, "data": sweep.model_dump_json()}
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(sweeps_table).where(sweeps_table.c.sweep_id == sweep.sweep_id).values(**row)
+            )
+            if result.rowcount == 0:
+                conn.execute(insert(sweeps_table).values(sweep_id=sweep.sweep_id, **row))
+
+    def get_sweep(self, sweep_id: str) -> Optional[Sweep]:
+        with self.engine.connect() as conn:
+            data = conn.execute(
+                select(sweeps_table.c.data).where(sweeps_table.c.sweep_id == sweep_id)
+            ).scalar_one_or_none()
+        return Sweep.model_validate_json(data) if data else None
+
+    def list_sweeps(self, limit: int = 50, offset: int = 0) -> Tuple[List[Sweep], int]:
+        """Return one page of sweeps, newest first, and the total number of sweeps"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(sweeps_table.c.data)
+                .order_by(sweeps_table.c.created_at.desc())
+                .limit(limit)
+                .offset(offset)
+            ).scalars().all()
+            total = conn.execute(select(func.count()).select_from(sweeps_table)).scalar_one()
+        return [Sweep.model_validate_json(data) for data in rows], total
+
+    def running_sweeps(self) -> List[Sweep]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(sweeps_table.c.data).where(sweeps_table.c.status == SweepStatus.RUNNING.value)
+            ).scalars().all()
+        return [Sweep.model_validate_json(data) for data in rows]
+
+    @staticmethod
+    def _to_row(job: FineTuningJob) -> Dict[str, Any]:
+        return {
+            "status": job.status.value,
+            "model_name": job.config.model_name,
+            "dataset_path": job.config.dataset_path,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "completed_at": job.completed_at,
+            "error_message": job.error_message,
+            "progress": job.progress,
+            "current_step": job.current_step,
+            "total_steps": job.total_steps,
+            "config": job.config.model_dump_json(),
+            "metrics": json.dumps(job.metrics) if job.metrics is not None else None,
+        }
+
+    @staticmethod
+    def _from_row(row) -> FineTuningJob:
+        return FineTuningJob(
+            job_id=row["job_id"],
+            status=row["status"],
+            config=json.loads(row["config"]),
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            completed_at=row["completed_at"],
+            error_message=row["error_message"],
+            metrics=json.loads(row["metrics"]) if row["metrics"] else None,
+            progress=row["progress"],
+            current_step=row["current_step"],
+            total_steps=row["total_steps"],
+        )
+
+
+def create_database_engine(database_url: str):
+    connect_args = {}
+    if database_url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+
+    engine = create_engine(database_url, connect_args=connect_args)
+
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _configure_sqlite)
+    return engine
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
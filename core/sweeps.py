@@ -0,0 +1,228 @@
+import itertools
+import math
+import os
+import random
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from .models import (
+    SWEEP_FIELDS,
+    FineTuningJob,
+    JobStatus,
+    ParameterRange,
+    Sweep,
+    SweepConfig,
+    SweepStatus,
+    SweepTrial,
+    TrainingConfig,
+    TrialStatus,
+)
+from .store import JobStore
+
+# Trials sampled by a random search that does not set num_trials
+DEFAULT_RANDOM_TRIALS = 10
+
+MAX_TRIALS = 256
+
+FINISHED_TRIALS = (TrialStatus.COMPLETED, TrialStatus.PRUNED, TrialStatus.FAILED, TrialStatus.CANCELLED)
+
+_TRIAL_STATUSES = {
+    JobStatus.COMPLETED: TrialStatus.COMPLETED,
+    JobStatus.FAILED: TrialStatus.FAILED,
+    JobStatus.CANCELLED: TrialStatus.CANCELLED,
+    JobStatus.PAUSED: TrialStatus.PAUSED,
+}
+
+
+def expand_trials(config: SweepConfig) -> List[Dict[str, Any]]:
+    """Parameter sets of the sweep's trials, in submission order"""
+    if not config.parameters:
+        raise ValueError("A sweep needs at least one parameter")
+    unknown = sorted(set(config.parameters) - set(SWEEP_FIELDS))
+    if unknown:
+        raise ValueError(f"Cannot sweep {', '.join(unknown)}; supported: {', '.join(SWEEP_FIELDS)}")
+    for name, spec in config.parameters.items():
+        if isinstance(spec, list) and not spec:
+            raise ValueError(f"No values given for {name}")
+    if config.pruning == "asha" and (config.reduction_factor < 2 or config.grace_steps < 1):
+        raise ValueError("ASHA needs reduction_factor >= 2 and grace_steps >= 1")
+
+    rng = random.Random(config.seed)
+    if config.search == "grid":
+        ranges = [name for name, spec in config.parameters.items() if isinstance(spec, ParameterRange)]
+        if ranges:
+            raise ValueError(f"Grid search needs explicit values for {', '.join(ranges)}")
+        names = list(config.parameters)
+        trials = [dict(zip(names, values)) for values in itertools.product(*config.parameters.values())]
+        if config.num_trials and config.num_trials < len(trials):
+            trials = rng.sample(trials, config.num_trials)
+    else:
+        trials = [
+            {name: _sample(name, spec, rng) for name, spec in config.parameters.items()}
+            for _ in range(config.num_trials or DEFAULT_RANDOM_TRIALS)
+        ]
+
+    if len(trials) > MAX_TRIALS:
+        raise ValueError(f"A sweep can have at most {MAX_TRIALS} trials, this one has {len(trials)}")
+    return trials
+
+
+def _sample(name: str, spec, rng: random.Random) -> Any:
+    if not isinstance(spec, ParameterRange):
+        return rng.choice(spec)
+    if spec.log:
+        value = math.exp(rng.uniform(math.log(spec.min), math.log(spec.max)))
+    else:
+        value = rng.uniform(spec.min, spec.max)
+    return round(value) if TrainingConfig.model_fields[name].annotation is int else value
+
+
+def trial_config(config: SweepConfig, trial: SweepTrial) -> TrainingConfig:
+    update = {**trial.params, "output_dir": os.path.join(config.base.output_dir, f"trial-{trial.index:03d}")}
+    if config.pruning == "asha":
+        # Rung decisions need a loss logged at or shortly after each rung
+        update["logging_steps"] = min(config.base.logging_steps, config.grace_steps)
+    return TrainingConfig.model_validate({**config.base.model_dump(), **update})
+
+
+def sweep_cost(sweep: Sweep) -> Dict[str, Any]:
+    """Training steps run so far, and the steps the same trials would take without pruning"""
+    steps_run = sum(trial.current_step for trial in sweep.trials)
+    steps_full = sum(trial.total_steps for trial in sweep.trials)
+    known = all(trial.total_steps for trial in sweep.trials)
+    return {
+        "steps_run": steps_run,
+        "steps_without_pruning": steps_full if known else None,
+        "savings": round(1 - steps_run / steps_full, 4) if known and steps_full else None,
+    }
+
+
+class SweepManager:
+    """
+    Bookkeeping and early stopping for hyperparameter sweeps.
+
+    Trials are ordinary jobs submitted by TrainingManager, so they share its
+    bounded worker pool, the workers' cached base models and the tokenized
+    dataset cache: trials differ only in fields that do not affect
+    tokenization, so the dataset is tokenized once for the whole sweep.
+
+    With ``pruning="asha"`` trials are stopped by asynchronous successive
+    halving: rungs sit at ``grace_steps * reduction_factor ** k`` steps, and
+    a trial reaching a rung continues only if its training loss there is
+    among the best ``1 / reduction_factor`` of the losses recorded at that
+    rung so far. Until a rung has ``reduction_factor`` entries every trial
+    passes it.
+    """
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self._sweeps: Dict[str, Sweep] = {}
+        self._trials: Dict[str, Tuple[Sweep, SweepTrial]] = {}
+        for sweep in store.running_sweeps():
+            self._track(sweep)
+
+    def create(self, config: SweepConfig) -> Tuple[Sweep, List[TrainingConfig]]:
+        """Build a sweep and the configs of its trials; raises ValueError for an invalid sweep"""
+        trials = [SweepTrial(index=i, params=params) for i, params in enumerate(expand_trials(config))]
+        sweep = Sweep(
+            sweep_id=str(uuid.uuid4()),
+            status=SweepStatus.RUNNING,
+            config=config,
+            trials=trials,
+            created_at=datetime.now(),
+        )
+        return sweep, [trial_config(config, trial) for trial in trials]
+
+    def attach(self, sweep: Sweep, trial: SweepTrial, job_id: str):
+        trial.job_id = job_id
+        self._sweeps[sweep.sweep_id] = sweep
+        self._trials[job_id] = (sweep, trial)
+
+    def save(self, sweep: Sweep):
+        self.store.save_sweep(sweep)
+
+    def get(self, sweep_id: str) -> Optional[Sweep]:
+        return self._sweeps.get(sweep_id) or self.store.get_sweep(sweep_id)
+
+    def list(self, limit: int = 50, offset: int = 0) -> Tuple[List[Sweep], int]:
+        sweeps, total = self.store.list_sweeps(limit=limit, offset=offset)
+        # Trial progress of running sweeps is only saved at rungs, so prefer the live copy
+        return [self._sweeps.get(sweep.sweep_id, sweep) for sweep in sweeps], total
+
+    def job_started(self, job_id: str):
+        entry = self._trials.get(job_id)
+        if entry is not None and entry[1].status != TrialStatus.PRUNED:
+            entry[1].status = TrialStatus.RUNNING
+
+    def should_prune(self, job_id: str, step: int, loss: float) -> bool:
+        """Record a trial's training loss; True if the trial lost at a rung and should stop"""
+        entry = self._trials.get(job_id)
+        if entry is None:
+            return False
+        sweep, trial = entry
+        trial.current_step = step
+        trial.loss = loss
+        config = sweep.config
+        if config.pruning != "asha" or trial.status == TrialStatus.PRUNED:
+            return False
+
+        eta = config.reduction_factor
+        rung = config.grace_steps
+        recorded = prune = False
+        while rung <= step and not prune:
+            key = str(rung)
+            if key not in trial.rung_losses:
+                trial.rung_losses[key] = loss
+                recorded = True
+                losses = sorted(t.rung_losses[key] for t in sweep.trials if key in t.rung_losses)
+                if len(losses) >= eta:
+                    prune = loss > losses[len(losses) // eta - 1]
+            rung *= eta
+
+        if prune:
+            trial.status = TrialStatus.PRUNED
+        if recorded:
+            self.save(sweep)
+        return prune
+
+    def job_finished(self, job: FineTuningJob):
+        entry = self._trials.get(job.job_id)
+        if entry is None:
+            return
+        sweep, trial = entry
+        trial.current_step = job.current_step
+        trial.total_steps = job.total_steps
+        if isinstance((job.metrics or {}).get("loss"), (int, float)):
+            trial.loss = job.metrics["loss"]
+        if trial.status != TrialStatus.PRUNED or job.status == JobStatus.COMPLETED:
+            trial.status = _TRIAL_STATUSES.get(job.status, trial.status)
+        self._finish_if_done(sweep)
+
+    def cancel(self, sweep: Sweep):
+        """Mark a sweep cancelled; trials whose jobs are not active are cancelled here, the rest as their jobs stop"""
+        sweep.status = SweepStatus.CANCELLED
+        for trial in sweep.trials:
+            if trial.status in (TrialStatus.PENDING, TrialStatus.PAUSED):
+                trial.status = TrialStatus.CANCELLED
+        self._finish_if_done(sweep)
+
+    def _finish_if_done(self, sweep: Sweep):
+        if any(trial.status not in FINISHED_TRIALS for trial in sweep.trials):
+            self.save(sweep)
+            return
+
+        completed = [t for t in sweep.trials if t.status == TrialStatus.COMPLETED and t.loss is not None]
+        sweep.best_trial = min(completed, key=lambda t: t.loss).index if completed else None
+        if sweep.status == SweepStatus.RUNNING:
+            sweep.status = SweepStatus.COMPLETED
+        sweep.completed_at = datetime.now()
+        self.save(sweep)
+
+        self._sweeps.pop(sweep.sweep_id, None)
+        for trial in sweep.trials:
+            self._trials.pop(trial.job_id, None)
+
+    def _track(self, sweep: Sweep):
+        for trial in sweep.trials:
+            if trial.job_id is not None:
+                self.attach(sweep, trial, trial.job_id)
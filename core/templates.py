@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Label value ignored by the loss
+IGNORE_INDEX = -100
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    Formats instruction/input/output records. ``prompt`` is used for records
+    with an input, ``prompt_no_input`` for those without; the output follows
+    the prompt and is the only part trained on when prompts are masked.
+    """
+    name: str
+    prompt: str
+    prompt_no_input: str
+
+    def render(self, instruction: str, input: Optional[str] = None) -> str:
+        if input:
+            return self.prompt.format(instruction=instruction, input=input)
+        return self.prompt_no_input.format(instruction=instruction, input="")
+
+
+BUILTIN_TEMPLATES: Dict[str, PromptTemplate] = {
+    template.name: template for template in (
+        PromptTemplate(
+            "alpaca",
+            "### Instruction:\n{instruction}\n\n### Input:\n{input}\n\n### Response:\n",
+            "### Instruction:\n{instruction}\n\n### Response:\n",
+        ),
+        PromptTemplate(
+            "chatml",
+            "<|im_start|>user\n{instruction}\n\n{input}<|im_end|>\n<|im_start|>assistant\n",
+            "<|im_start|>user\n{instruction}<|im_end|>\n<|im_start|>assistant\n",
+        ),
+        PromptTemplate(
+            "plain",
+            "{instruction}\n{input}\n",
+            "{instruction}\n",
+        ),
+    )
+}
+
+
+def resolve_template(spec: str) -> PromptTemplate:
+    """
+    A built-in template by name, or a custom format string with an
+    ``{instruction}`` and optionally an ``{input}`` placeholder.
+    """
+    if spec in BUILTIN_TEMPLATES:
+        return BUILTIN_TEMPLATES[spec]
+    if "{instruction}" not in spec:
+        raise ValueError(
+            f"Unknown prompt template {spec!r}: use one of {', '.join(BUILTIN_TEMPLATES)} "
+            "or a format string containing {instruction}"
+        )
+    return PromptTemplate("custom", spec, spec)
+
+
+def tokenize_records(examples: Dict[str, List[Any]], tokenizer, template: PromptTemplate,
+                     max_length: Optional[int] = None, mask_prompt: bool = True) -> Dict[str, List[List[int]]]:
+    """
+    Batched map function turning instruction/input/output records into
+    ``input_ids``, ``attention_mask`` and ``labels`` in one pass. Prompts and
+    responses are tokenized as two batches and joined per record; prompt
+    tokens get IGNORE_INDEX labels when ``mask_prompt`` is set, and the
+    response ends with EOS so the model learns to stop.
+    """
+    count = len(examples["instruction"])
+    inputs = examples.get("input") or [None] * count
+    prompts = [
+        template.render(instruction or "", input)
+        for instruction, input in zip(examples["instruction"], inputs)
+    ]
+    prompt_ids = tokenizer(prompts, add_special_tokens=True)["input_ids"]
+    response_ids = tokenizer([output or "" for output in examples["output"]], add_special_tokens=False)["input_ids"]
+    eos = [tokenizer.eos_token_id] if tokenizer.eos_token_id is not None else []
+
+    input_ids, labels = [], []
+    for prompt, response in zip(prompt_ids, response_ids):
+        ids = prompt + response + eos
+        target = [IGNORE_INDEX] * len(prompt) + response + eos if mask_prompt else list(ids)
+        if max_length:
+            ids, target = ids[:max_length], target[:max_length]
+        input_ids.append(ids)
+        labels.append(target)
+
+    return {
+        "input_ids": input_ids,
+        "attention_mask": [[1] * len(ids) for ids in input_ids],
+        "labels": labels,
+    }
+
+
+def pad_features(features: Dict[str, List[List[int]]], pad_id: int) -> Dict[str, List[List[int]]]:
+    """Right-pad ``input_ids``, ``attention_mask`` and ``labels`` of a batch to its longest row"""
+    width = max((len(ids) for ids in features["input_ids"]), default=0)
+    fill = {"input_ids": pad_id, "attention_mask": 0, "labels": IGNORE_INDEX}
+    return {
+        name: [row + [fill[name]] * (width - len(row)) for row in rows]
+        for name, rows in features.items()
+    }
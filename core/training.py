@@ -1,159 +1,450 @@
-import asyncio
+import os
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
-import torch
-from transformers import (
-    AutoTokenizer, 
-    AutoModelForCausalLM,
-    TrainingArguments,
-    Trainer,
-    DataCollatorForLanguageModeling
-)
-from peft import LoraConfig, get_peft_model, TaskType
-from datasets import load_dataset
-from .models import FineTuningJob, TrainingConfig, JobStatus
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from config import config as app_config
+from .dataset_cache import get_dataset_cache
+from .events import JobEventBroadcaster
+from .models import ExportConfig, FineTuningJob, JobSummary, Sweep, SweepConfig, SweepStatus, TrainingConfig, JobStatus
+from .prometheus import render_metrics
+from .scheduler import JobScheduler, partition_cores
+from .storage import ContentStore, StorageJanitor, is_within, read_export_manifest
+from .store import JobStore
+from .sweeps import FINISHED_TRIALS, SweepManager
+
+# Minimum seconds between progress writes to the job store for a single job
+PROGRESS_FLUSH_INTERVAL = 2.0
+
+# Training log samples kept per job in metrics["history"]
+MAX_METRIC_HISTORY = 500
+
+# Scheduler task ids of exports are this prefix and the job id
+EXPORT_TASK_PREFIX = "export-"
 
 class TrainingManager:
-    def __init__(self):
+    """
+    Tracks fine-tuning jobs and runs them through a bounded process pool.
+
+    Use ``get_training_manager()`` rather than instantiating this directly so
+    that every request handler sees the same jobs and the same worker slots.
+    Pending and running jobs are kept in ``jobs``; every job is persisted in
+    the job store so history survives restarts.
+    """
+
+    def __init__(self, max_concurrent_jobs: Optional[int] = None, store: Optional[JobStore] = None,
+                 redis_client=None):
         self.jobs: Dict[str, FineTuningJob] = {}
-        self.active_processes: Dict[str, asyncio.Task] = {}
+        self.store = store or JobStore(app_config.DATABASE_URL)
+        self._last_flush: Dict[str, float] = {}
+        self._auto_resumes: Dict[str, int] = {}
+        # Export task id -> job id, for exports that have not finished
+        self.exports: Dict[str, str] = {}
+        self.events = JobEventBroadcaster()
+        if redis_client is not None or app_config.WORKER_MODE == "redis":
+            from .distributed import RedisJobQueue, get_redis_client
+
+            # Jobs run on worker.py nodes, see WorkerNode
+            self.scheduler = RedisJobQueue(
+                redis_client or get_redis_client(),
+                on_event=self._handle_worker_event,
+                worker_timeout=app_config.WORKER_TIMEOUT_SECONDS,
+            )
+        else:
+            max_workers = max_concurrent_jobs or app_config.MAX_CONCURRENT_JOBS
+            self.scheduler = JobScheduler(
+                max_workers=max_workers,
+                on_event=self._handle_worker_event,
+                # Each worker gets its own share of the cores instead of all of them
+                core_sets=partition_cores(max_workers) if app_config.PIN_WORKER_CORES else None,
+            )
+        # Loaded before jobs are resumed so resumed trials are tracked again
+        self.sweeps = SweepManager(self.store)
+        self.janitor = StorageJanitor(
+            self.store,
+            ContentStore(app_config.BLOB_STORE_DIR, min_bytes=app_config.DEDUP_MIN_BYTES),
+            get_dataset_cache(),
+            app_config.DATA_DIR,
+            retention_days=app_config.AUTO_CLEANUP_DAYS,
+            completed_retention_days=app_config.COMPLETED_RETENTION_DAYS,
+            is_busy=self._is_busy,
+        )
 
-    async def start_training(self, model_name: str, dataset_path: str, config: TrainingConfig) -> str:
+        # Distributed jobs keep running on their nodes while the API restarts
+        active = self.scheduler.active_jobs() if self.scheduler.remote else set()
+        for job in self.store.unfinished():
+            if job.job_id in active:
+                self.jobs[job.job_id] = job
+        for task_id in active:
+            if task_id.startswith(EXPORT_TASK_PREFIX):
+                self.exports[task_id] = task_id[len(EXPORT_TASK_PREFIX):]
+        if app_config.AUTO_RESUME_JOBS:
+            # Jobs pick up from their latest checkpoint, see _resume_checkpoint
+            for job in self.store.unfinished():
+                if job.job_id not in self.jobs:
+                    self._submit(job)
+        else:
+            self.store.fail_unfinished("Interrupted by a service restart", keep=list(self.jobs))
+        if self.scheduler.remote:
+            self.scheduler.start()
+
+    async def start_training(self, model_name: str, dataset_path: str, config: TrainingConfig,
+                             priority: int = 0) -> str:
         job_id = str(uuid.uuid4())
-        
+
         job = FineTuningJob(
             job_id=job_id,
             status=JobStatus.PENDING,
             config=config,
             created_at=datetime.now()
         )
-        
-        self.jobs[job_id] = job
-        
-        task = asyncio.create_task(self._run_training(job_id))
-        self.active_processes[job_id] = task
-        
+
+        self._submit(job, priority)
         return job_id
 
-    async def _run_training(self, job_id: str):
-        job = self.jobs[job_id]
-        
-        try:
+    def _submit(self, job: FineTuningJob, priority: int = 0):
+        job.status = JobStatus.PENDING
+        self.jobs[job.job_id] = job
+        self._persist(job)
+        self.events.publish(job.job_id, JobSummary.from_job(job).model_dump(mode="json"))
+
+        self.scheduler.submit(
+            job.job_id,
+            _run_training,
+            args=(job.model_dump(mode="json"),),
+            priority=priority,
+            resources=_job_resources(job.config),
+        )
+
+    def _handle_worker_event(self, job_id: str, kind: str, data: Dict[str, Any]):
+        if job_id.startswith(EXPORT_TASK_PREFIX):
+            self._handle_export_event(job_id, kind, data)
+            return
+        job = self.jobs.get(job_id)
+        if job is None or job.status == JobStatus.CANCELLED:
+            return
+
+        if kind == "started":
             job.status = JobStatus.RUNNING
-            job.started_at = datetime.now()
-            
-            await self._execute_training(job)
-            
+            job.started_at = job.started_at or datetime.now()
+            self._persist(job)
+            self._publish(job, "status", "started_at")
+            self.sweeps.job_started(job_id)
+        elif kind == "progress":
+            job.current_step = data["current_step"]
+            job.total_steps = data["total_steps"]
+            job.progress = data["progress"]
+            self._persist(job, force=False)
+            self._publish(job, "current_step", "total_steps", "progress")
+        elif kind == "log":
+            job.metrics = {**(job.metrics or {}), **data}
+            if "step" in data:
+                job.metrics["history"] = _append_sample(job.metrics.get("history", []), data)
+            self._persist(job, force=False)
+            self.events.publish(job_id, data)
+            if "loss" in data and "step" in data and self.sweeps.should_prune(job_id, data["step"], data["loss"]):
+                # The worker checkpoints and reports "paused", so a pruned trial can still be resumed
+                self.scheduler.interrupt(job_id)
+        elif kind == "completed":
             job.status = JobStatus.COMPLETED
             job.completed_at = datetime.now()
             job.progress = 100.0
-            
-        except Exception as e:
+            self._finish(job)
+            self._publish(job, "status", "completed_at", "progress")
+        elif kind == "paused":
+            job.status = JobStatus.PAUSED
+            job.current_step = data.get("current_step", job.current_step)
+            self._finish(job)
+            self._publish(job, "status", "current_step", "progress")
+        elif kind == "failed":
+            if data.get("worker_lost") and self._auto_resume(job):
+                return
             job.status = JobStatus.FAILED
-            job.error_message = str(e)
+            job.error_message = data.get("error")
             job.completed_at = datetime.now()
-        
-        finally:
-            if job_id in self.active_processes:
-                del self.active_processes[job_id]
-
-    async def _execute_training(self, job: FineTuningJob):
-        config = job.config
-        
-        tokenizer = AutoTokenizer.from_pretrained(config.model_name)
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
-        
-        model = AutoModelForCausalLM.from_pretrained(
-            config.model_name,
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-            device_map="auto" if torch.cuda.is_available() else None
-        )
-        
-        if config.use_lora:
-            peft_config = LoraConfig(
-                task_type=TaskType.CAUSAL_LM,
-                inference_mode=False,
-                r=config.lora_r,
-                lora_alpha=config.lora_alpha,
-                lora_dropout=config.lora_dropout,
-                target_modules=["q_proj", "k_proj", "v_proj", "o_proj"]
-            )
-            model = get_peft_model(model, peft_config)
-        
-        dataset = load_dataset('json', data_files=config.dataset_path, split='train')
-        
-        def tokenize_function(examples):
-            return tokenizer(
-                examples['text'],
-                truncation=True,
-                padding=True,
-                max_length=config.max_length,
-                return_tensors="pt"
-            )
-        
-        tokenized_dataset = dataset.map(tokenize_function, batched=True)
-        
-        training_args = TrainingArguments(
-            output_dir=config.output_dir,
-            num_train_epochs=config.num_epochs,
-            per_device_train_batch_size=config.batch_size,
-            learning_rate=config.learning_rate,
-            warmup_steps=config.warmup_steps,
-            logging_steps=config.logging_steps,
-            save_steps=config.save_steps,
-            evaluation_strategy=config.evaluation_strategy,
-            eval_steps=config.eval_steps,
-            save_total_limit=2,
-            prediction_loss_only=True,
-            remove_unused_columns=False,
-            dataloader_pin_memory=False,
-        )
-        
-        data_collator = DataCollatorForLanguageModeling(
-            tokenizer=tokenizer,
-            mlm=False,
-        )
-        
-        trainer = Trainer(
-            model=model,
-            args=training_args,
-            train_dataset=tokenized_dataset,
-            data_collator=data_collator,
-        )
-        
-        job.total_steps = len(tokenized_dataset) // config.batch_size * config.num_epochs
-        
-        class ProgressCallback:
-            def __init__(self, job_ref):
-                self.job = job_ref
-            
-            def on_step_end(self, args, state, control, **kwargs):
-                self.job.current_step = state.global_step
-                self.job.progress = (state.global_step / self.job.total_steps) * 100
-        
-        trainer.add_callback(ProgressCallback(job))
-        
-        await asyncio.get_event_loop().run_in_executor(None, trainer.train)
-        
-        model.save_pretrained(config.output_dir)
-        tokenizer.save_pretrained(config.output_dir)
+            self._finish(job)
+            self._publish(job, "status", "completed_at", "error_message")
+
+    def _handle_export_event(self, task_id: str, kind: str, data: Dict[str, Any]):
+        if kind not in ("started", "completed", "failed"):
+            return
+        # Looked up in the store, as the export may have been queued before this process started
+        job = self.store.get(task_id[len(EXPORT_TASK_PREFIX):])
+        export = dict((job.metrics or {}).get("export", {})) if job is not None else {}
+        if export.get("status") not in ("pending", "running"):
+            self.exports.pop(task_id, None)
+            return
+
+        if kind == "started":
+            export.update(status="running", started_at=datetime.now().isoformat())
+        elif kind == "completed":
+            export.update(status="completed", completed_at=datetime.now().isoformat(), **data)
+        else:
+            export.update(status="failed", completed_at=datetime.now().isoformat(), error=data.get("error"))
+        if kind != "started":
+            self.exports.pop(task_id, None)
+        job.metrics = {**(job.metrics or {}), "export": export}
+        self.store.save(job)
+        self.events.publish(job.job_id, {"export": export})
+
+    def _publish(self, job: FineTuningJob, *fields: str):
+        self.events.publish(job.job_id, job.model_dump(mode="json", include=set(fields)))
+
+    def _persist(self, job: FineTuningJob, force: bool = True):
+        now = time.monotonic()
+        if not force and now - self._last_flush.get(job.job_id, 0.0) < PROGRESS_FLUSH_INTERVAL:
+            return
+        self._last_flush[job.job_id] = now
+        self.store.save(job)
+
+    def _finish(self, job: FineTuningJob):
+        self._persist(job)
+        self.jobs.pop(job.job_id, None)
+        self._last_flush.pop(job.job_id, None)
+        self._auto_resumes.pop(job.job_id, None)
+        self.sweeps.job_finished(job)
+
+    def _is_busy(self, job_id: str) -> bool:
+        """Whether a job's files are in use: it is queued or running, or being exported"""
+        return job_id in self.jobs or f"{EXPORT_TASK_PREFIX}{job_id}" in self.exports
+
+    def _auto_resume(self, job: FineTuningJob) -> bool:
+        """Requeue a job whose worker died, e.g. when it was preempted or ran out of memory"""
+        attempts = self._auto_resumes.get(job.job_id, 0)
+        if attempts >= app_config.MAX_AUTO_RESUMES:
+            return False
+        self._auto_resumes[job.job_id] = attempts + 1
+        self._submit(job)
+        return True
 
     async def get_job(self, job_id: str) -> Optional[FineTuningJob]:
-        return self.jobs.get(job_id)
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        return self.store.get(job_id)
 
-    async def get_all_jobs(self) -> List[FineTuningJob]:
-        return list(self.jobs.values())
+    async def list_jobs(self, statuses: Optional[Sequence[JobStatus]] = None, limit: int = 50,
+                        offset: int = 0, full: bool = False) -> Tuple[List[Union[JobSummary, FineTuningJob]], int]:
+        jobs, total = self.store.list_jobs(statuses, limit=limit, offset=offset, full=full)
+
+        # Progress of active jobs is only flushed periodically, so prefer the live copy
+        for i, job in enumerate(jobs):
+            live = self.jobs.get(job.job_id)
+            if live is not None:
+                jobs[i] = live if full else JobSummary.from_job(live)
+
+        return jobs, total
 
     async def cancel_job(self, job_id: str) -> bool:
-        if job_id in self.active_processes:
-            self.active_processes[job_id].cancel()
-            del self.active_processes[job_id]
-            
-            if job_id in self.jobs:
-                self.jobs[job_id].status = JobStatus.CANCELLED
-                self.jobs[job_id].completed_at = datetime.now()
-            
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = self.store.get(job_id)
+            if job is None or job.status != JobStatus.PAUSED:
+                return False
+        elif job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            return False
+        elif not self.scheduler.cancel(job_id):
+            return False
+
+        job.status = JobStatus.CANCELLED
+        job.completed_at = datetime.now()
+        self._finish(job)
+        self._publish(job, "status", "completed_at")
+        return True
+
+    async def pause_job(self, job_id: str) -> bool:
+        """
+        Pause a pending or running job. A running job saves a checkpoint
+        first and becomes ``paused`` once its worker reports that it stopped.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            return False
+
+        if self.scheduler.dequeue(job_id):
+            job.status = JobStatus.PAUSED
+            self._finish(job)
+            self._publish(job, "status")
             return True
-        return False
\ No newline at end of file
+        return self.scheduler.interrupt(job_id)
+
+    async def resume_job(self, job_id: str, priority: int = 0) -> bool:
+        """Requeue a paused, failed or cancelled job; it continues from its latest checkpoint"""
+        if job_id in self.jobs:
+            return False
+        job = self.store.get(job_id)
+        if job is None or job.status not in (JobStatus.PAUSED, JobStatus.FAILED, JobStatus.CANCELLED):
+            return False
+
+        job.error_message = None
+        job.completed_at = None
+        self._submit(job, priority)
+        return True
+
+    async def start_sweep(self, config: SweepConfig) -> Sweep:
+        """
+        Submit one job per trial of a hyperparameter sweep. Trials queue for
+        the same workers as other jobs; raises ValueError for an invalid sweep
+        before anything is submitted.
+        """
+        sweep, trial_configs = self.sweeps.create(config)
+        for trial, trial_config in zip(sweep.trials, trial_configs):
+            job_id = await self.start_training(
+                trial_config.model_name, trial_config.dataset_path, trial_config, priority=config.priority
+            )
+            self.sweeps.attach(sweep, trial, job_id)
+        self.sweeps.save(sweep)
+        return sweep
+
+    async def get_sweep(self, sweep_id: str) -> Optional[Sweep]:
+        return self.sweeps.get(sweep_id)
+
+    async def list_sweeps(self, limit: int = 50, offset: int = 0) -> Tuple[List[Sweep], int]:
+        return self.sweeps.list(limit=limit, offset=offset)
+
+    async def cancel_sweep(self, sweep_id: str) -> bool:
+        """Cancel a running sweep and every trial that has not finished"""
+        sweep = self.sweeps.get(sweep_id)
+        if sweep is None or sweep.status != SweepStatus.RUNNING:
+            return False
+
+        sweep.status = SweepStatus.CANCELLED
+        for trial in sweep.trials:
+            if trial.job_id is not None and trial.status not in FINISHED_TRIALS:
+                await self.cancel_job(trial.job_id)
+        self.sweeps.cancel(sweep)
+        return True
+
+    async def export_job(self, job_id: str, config: ExportConfig) -> Optional[Dict[str, Any]]:
+        """
+        Queue an export of a completed job: its LoRA adapter is merged into the
+        base model, which is optionally quantized and written as sharded
+        safetensors. Progress and the result (size, load times) are recorded
+        in ``metrics["export"]``. Returns None if the job does not exist;
+        raises ValueError if it has not completed or is already exporting.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        task_id = f"{EXPORT_TASK_PREFIX}{job_id}"
+        if job.status != JobStatus.COMPLETED:
+            raise ValueError(f"Job {job_id} is {job.status.value}; only completed jobs can be exported")
+        if task_id in self.exports:
+            raise ValueError(f"Job {job_id} is already being exported")
+
+        options = config.model_dump()
+        options["output_dir"] = config.output_dir or os.path.join(job.config.output_dir, f"export-{config.quantization}")
+        _check_export_dir(options["output_dir"], job)
+        export = {"status": "pending", **options}
+        job.metrics = {**(job.metrics or {}), "export": export}
+        self.store.save(job)
+        self.events.publish(job_id, {"export": export})
+
+        self.exports[task_id] = job_id
+        self.scheduler.submit(task_id, _run_export, args=(task_id, job.model_dump(mode="json"), options),
+                              resources=_job_resources(job.config))
+        return export
+
+    def prometheus_metrics(self) -> str:
+        """Job counts, queue state and live metrics of active jobs in the Prometheus text format"""
+        return render_metrics(
+            self.store.count_by_status(),
+            list(self.jobs.values()),
+            pending=self.scheduler.pending_count,
+            running=self.scheduler.running_count,
+        )
+
+    def worker_status(self) -> Dict[str, Any]:
+        """Worker mode, queue state and, in distributed mode, the live worker nodes"""
+        status = {
+            "mode": "redis" if self.scheduler.remote else "local",
+            "pending": self.scheduler.pending_count,
+            "running": self.scheduler.running_count,
+        }
+        if self.scheduler.remote:
+            status["workers"] = self.scheduler.workers()
+        else:
+            status["max_workers"] = self.scheduler.max_workers
+        return status
+
+    def prewarm(self, model_names: List[str]):
+        """Load base models into every training worker ahead of the jobs that need them"""
+        self.scheduler.broadcast(_prewarm, args=(list(model_names),))
+
+    def shutdown(self):
+        """
+        Stop the workers, giving running jobs SHUTDOWN_GRACE_SECONDS to save a
+        checkpoint. Active jobs are stored as pending so the next process
+        resumes them. Distributed jobs keep running on their worker nodes.
+        """
+        self.scheduler.shutdown(grace=app_config.SHUTDOWN_GRACE_SECONDS)
+        if self.scheduler.remote:
+            return
+        for job in list(self.jobs.values()):
+            job.status = JobStatus.PENDING
+            self.store.save(job)
+        for task_id in list(self.exports):
+            self._handle_export_event(task_id, "failed", {"error": "Interrupted by a service restart"})
+
+
+def _append_sample(history: List[Dict[str, Any]], sample: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Append a training log sample, halving the resolution once there are
+    MAX_METRIC_HISTORY samples so the history always covers the whole run
+    """
+    history = history + [sample]
+    if len(history) > MAX_METRIC_HISTORY:
+        history = history[::2]
+    return history
+
+
+def _check_export_dir(output_dir: str, job: FineTuningJob):
+    """
+    Raise ValueError unless an export of ``job`` may write to ``output_dir``:
+    a directory inside the job's output_dir, or one that is new, empty or
+    holds an earlier export of the same job
+    """
+    if os.path.abspath(output_dir) == os.path.abspath(job.config.output_dir):
+        raise ValueError("An export cannot be written to the job's own output_dir")
+    if is_within(output_dir, job.config.output_dir) or not os.path.exists(output_dir):
+        return
+    if not os.path.isdir(output_dir):
+        raise ValueError(f"Export output_dir {output_dir} is not a directory")
+    manifest = read_export_manifest(output_dir)
+    if os.listdir(output_dir) and (manifest is None or manifest.get("job_id") != job.job_id):
+        raise ValueError(f"Export output_dir {output_dir} is not empty; use a new directory or one inside "
+                         "the job's output_dir")
+
+
+def _job_resources(config: TrainingConfig) -> Dict[str, float]:
+    """CPUs and memory a distributed worker node must have free to run a job"""
+    cpus = len(config.cpu_cores) if config.cpu_cores else config.cpu_threads or 1
+    return {"cpus": cpus, "memory_gb": config.memory_gb or app_config.JOB_MEMORY_GB}
+
+
+_training_manager: Optional[TrainingManager] = None
+
+def get_training_manager() -> TrainingManager:
+    """Return the process-wide TrainingManager"""
+    global _training_manager
+    if _training_manager is None:
+        _training_manager = TrainingManager()
+    return _training_manager
+
+
+# Worker entry points. The worker modules are imported inside the worker
+# processes only, so the API process never loads torch, transformers or peft.
+
+def _run_training(*args):
+    from .training_worker import run_training_worker
+    run_training_worker(*args)
+
+
+def _run_export(*args):
+    from .export import run_export_worker
+    run_export_worker(*args)
+
+
+def _prewarm(*args):
+    from .model_registry import prewarm_models
+    prewarm_models(*args)
@@ -0,0 +1,328 @@
+import json
+import os
+from typing import Any, Dict, Optional
+import torch
+from transformers import (
+    TrainingArguments,
+    TrainerCallback,
+    DataCollatorForLanguageModeling,
+    DataCollatorForSeq2Seq,
+)
+from transformers.trainer_utils import get_last_checkpoint
+from peft import LoraConfig, get_peft_model, TaskType
+from datasets import load_dataset
+from .batching import (
+    LENGTH_COLUMN,
+    ColumnDroppingCollator,
+    MeteredTrainer,
+    add_lengths,
+    pack_sequences,
+)
+from .cpu_profile import available_cores, bf16_supported, cpu_resources, int8_supported
+from .dataset_cache import get_dataset_cache
+from .evaluation import EvaluationCallback, companion_eval_path, eval_samples, holdout_split
+from .instrumentation import PhaseRecorder, ResourceSampler
+from .model_registry import default_dtype, get_model_registry, load_base_model
+from .models import FineTuningJob
+from .scheduler import JobReporter
+from .storage import JOB_OWNER_FILE, unshare_tree
+from .templates import IGNORE_INDEX, pad_features, resolve_template, tokenize_records
+
+LOGGED_METRICS = ("loss", "learning_rate", "epoch", "tokens_per_second", "pad_fraction")
+
+
+class ProgressCallback(TrainerCallback):
+    def __init__(self, job: FineTuningJob, reporter: JobReporter):
+        self.job = job
+        self.reporter = reporter
+        self.resources = ResourceSampler()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self.reporter.interrupted():
+            # Checkpoint this step and stop; the job is resumed from here later
+            control.should_save = True
+            control.should_training_stop = True
+
+        self.job.current_step = state.global_step
+        self.job.total_steps = state.max_steps or self.job.total_steps
+        self.job.progress = (state.global_step / self.job.total_steps) * 100 if self.job.total_steps else 0.0
+        self.reporter.emit(
+            "progress",
+            current_step=self.job.current_step,
+            total_steps=self.job.total_steps,
+            progress=self.job.progress,
+        )
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if logs and any(key in logs for key in LOGGED_METRICS):
+            self.reporter.emit(
+                "log",
+                step=state.global_step,
+                **{key: logs[key] for key in LOGGED_METRICS if key in logs},
+                **self.resources.sample(),
+            )
+
+
+def run_training_worker(job_data: Dict[str, Any], events) -> None:
+    """Entry point of a training worker process"""
+    job = FineTuningJob.model_validate(job_data)
+    reporter = JobReporter(job.job_id, events)
+
+    reporter.emit("started")
+    try:
+        finished = _execute_training(job, reporter)
+    except Exception as e:
+        reporter.emit("failed", error=str(e))
+    else:
+        if finished:
+            reporter.emit("completed")
+        else:
+            reporter.emit("paused", current_step=job.current_step)
+
+
+def _execute_training(job: FineTuningJob, reporter: JobReporter) -> bool:
+    """Train ``job``; returns False if it was interrupted before the last step"""
+    config = job.config
+
+    if torch.cuda.is_available():
+        return _load_and_train(job, reporter, load_kwargs={"device_map": "auto"})
+
+    # Requested CPU features the hardware or job cannot use fall back to fp32
+    bf16 = config.cpu_bf16 and bf16_supported()
+    int8 = config.cpu_int8_base and config.use_lora and int8_supported()
+    with cpu_resources(config.cpu_cores, config.cpu_threads) as threads:
+        reporter.emit("log", cpu_profile={
+            "bf16": bf16,
+            "int8_base": int8,
+            "threads": threads,
+            "cores": available_cores(),
+            "dataloader_num_workers": config.dataloader_num_workers,
+        })
+        return _load_and_train(job, reporter, bf16=bf16, int8=int8)
+
+
+def _load_and_train(job: FineTuningJob, reporter: JobReporter, bf16: bool = False, int8: bool = False,
+                    load_kwargs: Optional[Dict[str, Any]] = None) -> bool:
+    config = job.config
+    load_kwargs = load_kwargs or {}
+    phases = PhaseRecorder(reporter)
+
+    phases.start("tokenizer_load")
+    registry = get_model_registry()
+    tokenizer = registry.tokenizer(config.model_name)
+
+    phases.start("model_load")
+    dtype = default_dtype()
+    model = None
+    try:
+        if config.use_lora:
+            # LoRA leaves the base weights untouched, so the base model is shared
+            # with later jobs and only the adapter is created per job
+            base_model = registry.acquire(config.model_name, dtype, int8=int8, **load_kwargs)
+            try:
+                phases.start("lora_wrap")
+                peft_config = LoraConfig(
+                    task_type=TaskType.CAUSAL_LM,
+                    inference_mode=False,
+                    r=config.lora_r,
+                    lora_alpha=config.lora_alpha,
+                    lora_dropout=config.lora_dropout,
+                    target_modules=["q_proj", "k_proj", "v_proj", "o_proj"]
+                )
+                model = get_peft_model(base_model, peft_config)
+            except Exception:
+                # The base model may hold some adapter layers already, so it is not reused
+                registry.discard(config.model_name, dtype, int8=int8)
+                raise
+        else:
+            model = load_base_model(config.model_name, dtype, **load_kwargs)
+
+        return _train(job, reporter, model, tokenizer, phases, bf16=bf16)
+    finally:
+        # Also records the phase a failed job stopped in
+        phases.stop()
+        if config.use_lora and model is not None:
+            try:
+                registry.release(config.model_name, dtype, model.unload(), int8=int8)
+            except Exception:
+                registry.discard(config.model_name, dtype, int8=int8)
+
+
+def _train(job: FineTuningJob, reporter: JobReporter, model, tokenizer, phases: PhaseRecorder,
+           bf16: bool = False):
+    config = job.config
+
+    strategy = config.batching_strategy
+    template = resolve_template(config.prompt_template) if config.prompt_template else None
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+    def tokenize_function(examples, strategy):
+        if template is not None:
+            # Instruction records are formatted, tokenized and labelled in this one pass
+            features = tokenize_records(
+                examples,
+                tokenizer,
+                template,
+                max_length=config.max_length if strategy != "packed" else None,
+                mask_prompt=config.mask_prompt,
+            )
+            return pad_features(features, pad_id) if strategy == "padded" else features
+        if strategy == "padded":
+            return tokenizer(
+                examples['text'],
+                truncation=True,
+                padding=True,
+                max_length=config.max_length,
+                return_tensors="pt"
+            )
+        # Padding is left to the collator, per training batch
+        return tokenizer(
+            examples['text'],
+            truncation=strategy == "dynamic",
+            max_length=config.max_length if strategy == "dynamic" else None,
+        )
+
+    def build_tokenized_dataset(path: str = config.dataset_path, strategy: str = strategy,
+                                phase: Optional[str] = "tokenize"):
+        dataset = load_dataset('json', data_files=path, split='train')
+        if phase:
+            phases.start(phase)
+        dataset = dataset.map(
+            tokenize_function, batched=True, remove_columns=dataset.column_names, fn_kwargs={"strategy": strategy}
+        )
+        if strategy == "dynamic":
+            dataset = dataset.map(add_lengths, batched=True)
+        elif strategy == "packed":
+            dataset = dataset.map(
+                pack_sequences,
+                batched=True,
+                remove_columns=dataset.column_names,
+                fn_kwargs={"block_size": config.max_length, "separator_id": tokenizer.eos_token_id},
+            )
+        return dataset
+
+    # On a cache hit this only loads the memory-mapped entry; misses move on to "tokenize"
+    phases.start("dataset_load")
+    dataset_cache = get_dataset_cache()
+    # Only part of the key when set, so entries of text datasets stay valid
+    template_params = (
+        {"prompt_template": config.prompt_template, "mask_prompt": config.mask_prompt} if template else {}
+    )
+    cache_key = dataset_cache.key(
+        config.dataset_path,
+        tokenizer,
+        max_length=config.max_length,
+        batching_strategy=strategy,
+        **template_params,
+    )
+    tokenized_dataset, cache_hit = dataset_cache.get_or_build(cache_key, build_tokenized_dataset)
+    reporter.emit("log", tokenized_cache_hit=cache_hit)
+
+    eval_dataset = None
+    if config.evaluation_strategy != "no":
+        phases.start("eval_prepare")
+        eval_path = config.eval_dataset_path or companion_eval_path(config.dataset_path)
+        if eval_path:
+            # Unpadded and truncated like "dynamic"; the eval loop pads per batch itself
+            eval_key = dataset_cache.key(
+                eval_path, tokenizer, max_length=config.max_length, batching_strategy="dynamic", **template_params
+            )
+            eval_dataset, _ = dataset_cache.get_or_build(
+                eval_key, lambda: build_tokenized_dataset(eval_path, "dynamic", phase=None)
+            )
+        elif config.eval_holdout > 0 and len(tokenized_dataset) > 1:
+            holdout = min(max(1, round(len(tokenized_dataset) * config.eval_holdout)), len(tokenized_dataset) - 1)
+            # Split after tokenization so the cached entry stays shared with other jobs
+            tokenized_dataset, eval_dataset = holdout_split(tokenized_dataset, holdout)
+            eval_path = "holdout"
+
+    if eval_dataset is not None:
+        samples = eval_samples(eval_dataset, config.eval_max_samples)
+        reporter.emit("log", eval_dataset={
+            "source": eval_path,
+            "samples": len(samples),
+            "tokens": sum(len(ids) for ids, _ in samples),
+        })
+
+    training_args = TrainingArguments(
+        output_dir=config.output_dir,
+        num_train_epochs=config.num_epochs,
+        per_device_train_batch_size=config.batch_size,
+        learning_rate=config.learning_rate,
+        warmup_steps=config.warmup_steps,
+        logging_steps=config.logging_steps,
+        save_steps=config.save_steps,
+        # Evaluation runs in EvaluationCallback rather than the Trainer's loop
+        evaluation_strategy="no",
+        save_total_limit=2,
+        prediction_loss_only=True,
+        remove_unused_columns=False,
+        dataloader_pin_memory=False,
+        dataloader_num_workers=config.dataloader_num_workers,
+        dataloader_persistent_workers=config.dataloader_num_workers > 0,
+        bf16=bf16,
+        use_cpu=not torch.cuda.is_available(),
+        group_by_length=strategy == "dynamic",
+        length_column_name=LENGTH_COLUMN,
+    )
+
+    if template is not None:
+        # Pads the prompt-masked labels alongside the inputs instead of copying input_ids
+        base_collator = DataCollatorForSeq2Seq(tokenizer=tokenizer, padding=True, label_pad_token_id=IGNORE_INDEX)
+    else:
+        base_collator = DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False)
+    data_collator = ColumnDroppingCollator(base_collator)
+
+    trainer = MeteredTrainer(
+        model=model,
+        args=training_args,
+        train_dataset=tokenized_dataset,
+        data_collator=data_collator,
+    )
+
+    job.total_steps = len(tokenized_dataset) // config.batch_size * config.num_epochs
+
+    trainer.add_callback(ProgressCallback(job, reporter))
+    if eval_dataset is not None:
+        trainer.add_callback(EvaluationCallback(
+            reporter,
+            samples,
+            batch_size=config.eval_batch_size or config.batch_size * 4,
+            pad_id=pad_id,
+            strategy=config.evaluation_strategy,
+            eval_steps=config.eval_steps,
+            max_fraction=config.eval_max_fraction,
+        ))
+
+    phases.start("train")
+    trainer.train(resume_from_checkpoint=_resume_checkpoint(job))
+
+    if trainer.state.global_step < trainer.state.max_steps:
+        return False
+
+    phases.start("save")
+    model.save_pretrained(config.output_dir)
+    tokenizer.save_pretrained(config.output_dir)
+    return True
+
+
+def _resume_checkpoint(job: FineTuningJob) -> Optional[str]:
+    """
+    Latest checkpoint this job saved in its output directory, if any.
+    Checkpoints of other jobs that used the same directory are ignored.
+    """
+    output_dir = job.config.output_dir
+    owner_path = os.path.join(output_dir, JOB_OWNER_FILE)
+
+    checkpoint = None
+    if os.path.isdir(output_dir) and os.path.exists(owner_path):
+        with open(owner_path, "r", encoding="utf-8") as f:
+            if json.load(f).get("job_id") == job.job_id:
+                checkpoint = get_last_checkpoint(output_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Files deduplicated by the storage janitor are shared with other jobs and must not be overwritten in place
+    unshare_tree(output_dir)
+    with open(owner_path, "w", encoding="utf-8") as f:
+        json.dump({"job_id": job.job_id}, f)
+    return checkpoint
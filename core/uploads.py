@@ -0,0 +1,344 @@
+import abc
+import asyncio
+import codecs
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import aiofiles
+import aiofiles.os
+from .models import DatasetInfo
+
+SUPPORTED_FORMATS = ("json", "jsonl", "csv")
+
+# Prefix of partially uploaded files in the data directory
+TEMP_PREFIX = ".upload-"
+
+# Upper bounds of the token-length histogram buckets; longer records go in the last one
+LENGTH_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class DatasetValidationError(ValueError):
+    pass
+
+
+class UploadOffsetError(DatasetValidationError):
+    """A chunk was sent for an offset other than the session's current one"""
+
+
+def approximate_token_count(record: Dict[str, Any]) -> int:
+    """
+    Tokenizer-independent length estimate (words and punctuation marks) of
+    the text fields of a record; subword tokenizers usually produce somewhat
+    more tokens than this.
+    """
+    fields = [record["text"]] if isinstance(record.get("text"), str) else record.values()
+    return sum(len(_TOKEN_PATTERN.findall(value)) for value in fields if isinstance(value, str))
+
+
+class LengthHistogram:
+    """Counts records per approximate token-length bucket"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LENGTH_BUCKETS) + 1)
+
+    def add(self, record: Dict[str, Any]):
+        length = approximate_token_count(record)
+        for i, bound in enumerate(LENGTH_BUCKETS):
+            if length <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        labels = [f"<={bound}" for bound in LENGTH_BUCKETS] + [f">{LENGTH_BUCKETS[-1]}"]
+        return dict(zip(labels, self.counts))
+
+
+class IncrementalValidator(abc.ABC):
+    """
+    Validates a dataset as its bytes arrive, counting samples and collecting
+    column names without keeping more than one partial record in memory.
+    ``record_hook`` is called with every parsed record.
+    """
+
+    def __init__(self, record_hook: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.record_hook = record_hook
+        self.num_samples = 0
+        self.columns: List[str] = []
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+
+    def feed(self, chunk: bytes):
+        try:
+            self._buffer += self._decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise DatasetValidationError(f"File is not valid UTF-8: {e}")
+        self._consume(final=False)
+
+    def finish(self):
+        try:
+            self._buffer += self._decoder.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            raise DatasetValidationError(f"File is not valid UTF-8: {e}")
+        self._consume(final=True)
+        if self.num_samples == 0:
+            raise DatasetValidationError("Dataset contains no records")
+
+    def _add_record(self, record):
+        if not isinstance(record, dict):
+            raise DatasetValidationError(f"Record {self.num_samples + 1} is not a JSON object")
+        for key in record:
+            if key not in self.columns:
+                self.columns.append(key)
+        self.num_samples += 1
+        if self.record_hook is not None:
+            self.record_hook(record)
+
+    @abc.abstractmethod
+    def _consume(self, final: bool):
+        """Parse the complete records in ``self._buffer``, all of it when ``final``"""
+
+
+class JSONLValidator(IncrementalValidator):
+    def _consume(self, final: bool):
+        lines = self._buffer.split("\n")
+        self._buffer = "" if final else lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise DatasetValidationError(f"Invalid JSON on record {self.num_samples + 1}: {e}")
+            self._add_record(record)
+
+
+class JSONArrayValidator(IncrementalValidator):
+    """Validates a top-level JSON array of objects one element at a time"""
+
+    def __init__(self, record_hook=None):
+        super().__init__(record_hook)
+        self._json = json.JSONDecoder()
+        self._state = "start"
+
+    def _consume(self, final: bool):
+        while True:
+            self._buffer = self._buffer.lstrip()
+            if not self._buffer:
+                break
+
+            if self._state == "start":
+                if self._buffer[0] != "[":
+                    raise DatasetValidationError("JSON datasets must be an array of records")
+                self._buffer = self._buffer[1:]
+                self._state = "first"
+            elif self._state in ("first", "value"):
+                if self._state == "first" and self._buffer[0] == "]":
+                    self._buffer = self._buffer[1:]
+                    self._state = "end"
+                    continue
+                try:
+                    record, end = self._json.raw_decode(self._buffer)
+                except json.JSONDecodeError as e:
+                    if final:
+                        raise DatasetValidationError(f"Invalid JSON in record {self.num_samples + 1}: {e}")
+                    # The record is probably split across chunks
+                    break
+                self._add_record(record)
+                self._buffer = self._buffer[end:]
+                self._state = "separator"
+            elif self._state == "separator":
+                if self._buffer[0] == ",":
+                    self._state = "value"
+                elif self._buffer[0] == "]":
+                    self._state = "end"
+                else:
+                    raise DatasetValidationError(f"Expected ',' or ']' after record {self.num_samples}")
+                self._buffer = self._buffer[1:]
+            else:
+                raise DatasetValidationError("Unexpected data after the end of the JSON array")
+
+        if final and self._state != "end":
+            raise DatasetValidationError("JSON array is not terminated")
+
+
+class CSVValidator(IncrementalValidator):
+    def _consume(self, final: bool):
+        if final:
+            complete, self._buffer = self._buffer, ""
+        else:
+            cut = self._buffer.rfind("\n")
+            if cut == -1:
+                return
+            complete = self._buffer[:cut + 1]
+            # An odd number of quotes means the cut falls inside a quoted field
+            if complete.count('"') % 2:
+                return
+            self._buffer = self._buffer[cut + 1:]
+
+        for row in csv.reader(io.StringIO(complete)):
+            if not row:
+                continue
+            if not self.columns:
+                self.columns = row
+                continue
+            if len(row) != len(self.columns):
+                raise DatasetValidationError(
+                    f"Row {self.num_samples + 1} has {len(row)} fields, expected {len(self.columns)}"
+                )
+            self.num_samples += 1
+            if self.record_hook is not None:
+                self.record_hook(dict(zip(self.columns, row)))
+
+
+VALIDATORS = {
+    "json": JSONArrayValidator,
+    "jsonl": JSONLValidator,
+    "csv": CSVValidator,
+}
+
+
+class DatasetInspector:
+    """Single pass over a dataset's bytes producing its DatasetInfo metadata"""
+
+    def __init__(self, dataset_format: str):
+        self.format = dataset_format
+        self.size = 0
+        self.histogram = LengthHistogram()
+        self._sha256 = hashlib.sha256()
+        self._validator = VALIDATORS[dataset_format](record_hook=self.histogram.add)
+
+    def feed(self, chunk: bytes):
+        self._validator.feed(chunk)
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+
+    def finish(self, name: str, path: str) -> DatasetInfo:
+        self._validator.finish()
+        return DatasetInfo(
+            name=name,
+            path=path,
+            size=self.size,
+            format=self.format,
+            num_samples=self._validator.num_samples,
+            columns=self._validator.columns,
+            content_hash=self._sha256.hexdigest(),
+            token_length_histogram=self.histogram.as_dict(),
+        )
+
+
+def inspect_file(path: str, chunk_size: int = 1024 * 1024) -> DatasetInfo:
+    inspector = DatasetInspector(dataset_format(path))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            inspector.feed(chunk)
+    return inspector.finish(os.path.basename(path), path)
+
+
+def dataset_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension not in SUPPORTED_FORMATS:
+        raise DatasetValidationError("Only JSON, CSV, and JSONL files are supported")
+    return extension
+
+
+class UploadSession:
+    """
+    One dataset upload, written to a temporary file as chunks arrive.
+
+    The content hash and validation advance with every chunk, so completing
+    the upload needs no second pass over the file. Sessions are resumable:
+    a client whose connection drops asks for ``offset`` and continues from
+    there.
+    """
+
+    def __init__(self, filename: str, data_dir: str, total_size: Optional[int] = None):
+        self.upload_id = str(uuid.uuid4())
+        self.filename = os.path.basename(filename)
+        self.format = dataset_format(self.filename)
+        self.data_dir = data_dir
+        self.total_size = total_size
+        self.offset = 0
+        self.created_at = datetime.now()
+        self.temp_path = os.path.join(data_dir, f"{TEMP_PREFIX}{self.upload_id}.part")
+        self._inspector = DatasetInspector(self.format)
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def final_path(self) -> str:
+        return os.path.join(self.data_dir, self.filename)
+
+    async def write(self, chunks, offset: int) -> int:
+        """Append an async iterator of byte chunks that starts at ``offset``"""
+        async with self._write_lock:
+            if offset != self.offset:
+                raise UploadOffsetError(f"Upload is at offset {self.offset}, not {offset}")
+
+            loop = asyncio.get_running_loop()
+            async with aiofiles.open(self.temp_path, "ab") as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if self.total_size is not None and self.offset + len(chunk) > self.total_size:
+                        raise DatasetValidationError("Upload is larger than the declared size")
+                    await f.write(chunk)
+                    await f.flush()
+                    self.offset += len(chunk)
+                    # Only once the chunk is on disk, so a chunk retried after a failed write is counted once.
+                    # Parsing and the token histogram are CPU-bound and stay off the event loop.
+                    await loop.run_in_executor(None, self._inspector.feed, chunk)
+            return self.offset
+
+    async def complete(self) -> DatasetInfo:
+        if self.total_size is not None and self.offset != self.total_size:
+            raise DatasetValidationError(
+                f"Upload is incomplete: received {self.offset} of {self.total_size} bytes"
+            )
+        info = await asyncio.get_running_loop().run_in_executor(
+            None, self._inspector.finish, self.filename, self.final_path
+        )
+        await aiofiles.os.replace(self.temp_path, self.final_path)
+        return info
+
+    async def abort(self):
+        if os.path.exists(self.temp_path):
+            await aiofiles.os.remove(self.temp_path)
+
+
+class UploadManager:
+    """Tracks in-progress upload sessions of this API process"""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.sessions: Dict[str, UploadSession] = {}
+
+    def create(self, filename: str, total_size: Optional[int] = None) -> UploadSession:
+        os.makedirs(self.data_dir, exist_ok=True)
+        session = UploadSession(filename, self.data_dir, total_size)
+        self.sessions[session.upload_id] = session
+        return session
+
+    def get(self, upload_id: str) -> Optional[UploadSession]:
+        return self.sessions.get(upload_id)
+
+    async def complete(self, upload_id: str) -> DatasetInfo:
+        session = self.sessions.pop(upload_id)
+        try:
+            return await session.complete()
+        except Exception:
+            await session.abort()
+            raise
+
+    async def abort(self, upload_id: str):
+        session = self.sessions.pop(upload_id, None)
+        if session is not None:
+            await session.abort()
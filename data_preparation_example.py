@@ -6,44 +6,67 @@ This script demonstrates how to convert enterprise data into training format
 
 import json
 import csv
+import heapq
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
 import re
 from pathlib import Path
+from core.dataset_writer import write_training_splits
+from core.text_cleaning import DEFAULT_RULES, CleaningEngine, RedactionRule
+
+CHAT_COLUMNS = ['conversation_id', 'timestamp', 'role', 'message']
+
+# Chat logs larger than this are split by conversation before pairing, so
+# only one partition of about this size is in memory at a time
+CHAT_PARTITION_BYTES = 256 * 1024 * 1024
 
 class EnterpriseDataProcessor:
     """Process various enterprise data sources for LLM fine-tuning"""
     
     def __init__(self):
         self.processed_data = []
+        self.cleaning_engine = CleaningEngine()
+        self.cleaning_report = None
+        self.dataset_report = None
     
-    def process_support_tickets(self, tickets_csv: str) -> List[Dict]:
+    def process_support_tickets(self, tickets_csv: str, chunksize: int = 100_000, workers: int = 1) -> List[Dict]:
         """
         Convert support tickets to instruction-following format
         Expected CSV columns: ticket_id, subject, description, resolution, category
+        The CSV is read in chunks of ``chunksize`` rows, each converted column-wise,
+        by ``workers`` processes when above 1.
         """
-        df = pd.read_csv(tickets_csv)
         processed = []
-        
-        for _, row in df.iterrows():
-            # Skip tickets without resolutions
-            if pd.isna(row['resolution']) or not row['resolution'].strip():
-                continue
-                
-            instruction = f"Help resolve this {row['category']} issue: {row['subject']}"
-            input_text = row['description']
-            output_text = row['resolution']
-            
-            processed.append({
-                "instruction": instruction,
-                "input": input_text,
-                "output": output_text,
-                "source": "support_tickets",
-                "category": row['category']
-            })
-        
+        chunks = pd.read_csv(tickets_csv, chunksize=chunksize)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for records in _map_bounded(pool, self._tickets_to_records, chunks, window=2 * workers):
+                    processed.extend(records)
+        else:
+            for chunk in chunks:
+                processed.extend(self._tickets_to_records(chunk))
         return processed
     
+    @staticmethod
+    def _tickets_to_records(df: pd.DataFrame) -> List[Dict]:
+        # Skip tickets without resolutions
+        resolution = df['resolution']
+        df = df[resolution.notna() & resolution.astype(str).str.strip().ne('')]
+        
+        records = pd.DataFrame({
+            "instruction": "Help resolve this " + df['category'].astype(str) + " issue: " + df['subject'].astype(str),
+            "input": df['description'],
+            "output": df['resolution'],
+            "source": "support_tickets",
+            "category": df['category'],
+        })
+        return records.to_dict('records')
+    
     def process_documentation(self, docs_folder: str) -> List[Dict]:
         """
         Convert documentation files to Q&A format
@@ -96,116 +119,187 @@ class EnterpriseDataProcessor:
         
         return processed
     
-    def process_chat_logs(self, chat_csv: str) -> List[Dict]:
+    def process_chat_logs(self, chat_csv: str, chunksize: int = 500_000, workers: int = 1,
+                          partitions: Optional[int] = None) -> List[Dict]:
         """
         Convert customer chat logs to conversational format
         Expected CSV: conversation_id, timestamp, role, message
+        A conversation's messages may be anywhere in the log, so a log larger
+        than CHAT_PARTITION_BYTES (or any log with ``workers`` > 1) is first
+        split by conversation into ``partitions`` temporary files, reading
+        ``chunksize`` rows at a time. Each partition is then paired on its
+        own, by ``workers`` processes when above 1, so memory holds one
+        partition and the resulting records rather than the whole log.
         """
-        df = pd.read_csv(chat_csv)
-        conversations = {}
+        if partitions is None:
+            partitions = max(-(-os.path.getsize(chat_csv) // CHAT_PARTITION_BYTES), workers)
+        if partitions <= 1:
+            return [record for _, record in _chat_pairs(chat_csv)]
         
-        # Group by conversation
-        for _, row in df.iterrows():
-            conv_id = row['conversation_id']
-            if conv_id not in conversations:
-                conversations[conv_id] = []
-            
-            conversations[conv_id].append({
-                "role": "user" if row['role'] == 'customer' else "assistant",
-                "content": row['message'],
-                "timestamp": row['timestamp']
-            })
-        
-        processed = []
-        for conv_id, messages in conversations.items():
-            # Sort by timestamp
-            messages.sort(key=lambda x: x['timestamp'])
-            
-            # Create instruction-response pairs
-            for i in range(0, len(messages)-1, 2):
-                if i+1 < len(messages) and messages[i]['role'] == 'user':
-                    processed.append({
-                        "instruction": messages[i]['content'],
-                        "input": "",
-                        "output": messages[i+1]['content'],
-                        "source": "chat_logs",
-                        "conversation_id": conv_id
-                    })
+        workdir = os.path.dirname(os.path.abspath(chat_csv))
+        with tempfile.TemporaryDirectory(prefix=".chat-partitions-", dir=workdir) as tmp:
+            paths = _partition_chat_log(chat_csv, tmp, partitions, chunksize)
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_chat_pairs, paths))
+            else:
+                results = [_chat_pairs(path) for path in paths]
         
-        return processed
+        # Each partition holds whole conversations; restore their order of first appearance
+        return [record for _, record in heapq.merge(*results, key=itemgetter(0))]
     
-    def clean_and_filter_data(self, data: List[Dict]) -> List[Dict]:
-        """Clean and filter training data"""
-        cleaned = []
-        
-        for item in data:
-            # Skip items with very short responses
-            if len(item['output'].strip()) < 10:
-                continue
-            
-            # Skip items with very long inputs/outputs (adjust as needed)
-            if len(item['instruction']) > 500 or len(item['output']) > 2000:
-                continue
-            
-            # Clean text
-            item['instruction'] = self._clean_text(item['instruction'])
-            item['input'] = self._clean_text(item['input'])
-            item['output'] = self._clean_text(item['output'])
-            
-            # Skip if cleaning removed too much content
-            if len(item['output'].strip()) < 10:
-                continue
-                
-            cleaned.append(item)
-        
+    def clean_and_filter_data(self, data: List[Dict], workers: int = 1,
+                              rules: Sequence[str] = DEFAULT_RULES,
+                              extra_rules: Sequence[RedactionRule] = ()) -> List[Dict]:
+        """
+        Clean and filter training data. ``workers`` > 1 cleans batches in a
+        process pool; ``rules`` names the PII redaction rules to apply (see
+        core.text_cleaning.BUILTIN_RULES). Per-stage throughput of the last
+        run is kept in ``self.cleaning_report``.
+        """
+        engine = self.cleaning_engine
+        if tuple(rules) != DEFAULT_RULES or extra_rules:
+            engine = CleaningEngine(rules=rules, extra_rules=extra_rules)
+
+        cleaned, report = engine.clean_and_filter(data, workers=workers)
+        self.cleaning_report = report.as_dict()
         return cleaned
     
     def _clean_text(self, text: str) -> str:
         """Clean text content"""
-        if not text:
-            return ""
-        
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove email addresses and phone numbers (privacy)
-        text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', text)
-        text = re.sub(r'\b\d{3}-\d{3}-\d{4}\b', '[PHONE]', text)
-        
-        # Remove excessive punctuation
-        text = re.sub(r'[!]{2,}', '!', text)
-        text = re.sub(r'[?]{2,}', '?', text)
-        
-        return text.strip()
+        return self.cleaning_engine.clean_text(text)
     
-    def create_training_dataset(self, output_file: str, test_split: float = 0.1):
-        """Create final training dataset with train/test split"""
-        if not self.processed_data:
-            raise ValueError("No processed data available. Process some data sources first.")
-        
-        # Shuffle data
-        import random
-        random.shuffle(self.processed_data)
-        
-        # Split train/test
-        split_idx = int(len(self.processed_data) * (1 - test_split))
-        train_data = self.processed_data[:split_idx]
-        test_data = self.processed_data[split_idx:]
-        
-        # Save training data
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(train_data, f, ensure_ascii=False, indent=2)
-        
-        # Save test data
-        test_file = output_file.replace('.json', '_test.json')
-        with open(test_file, 'w', encoding='utf-8') as f:
-            json.dump(test_data, f, ensure_ascii=False, indent=2)
-        
+    def create_training_dataset(self, output_file: str, test_split: float = 0.1,
+                                records: Optional[Iterable[Dict]] = None, seed: int = 0,
+                                dedup: bool = True, shard_size: Optional[int] = None,
+                                compression: Optional[str] = None, dedup_memory_mb: float = 128):
+        """
+        Create final training dataset with train/test split.
+
+        Records (``self.processed_data`` unless an iterable such as a generator
+        is passed) are deduplicated, shuffled with ``seed`` and split. For an
+        ``output_file`` such as ``data.jsonl`` they are streamed to
+        ``data.jsonl`` and ``data_test.jsonl``, sharded every ``shard_size``
+        records and gzip-compressed with ``compression="gzip"``, and the
+        report with duplicate counts and timings is returned. For
+        ``data.json`` they are written as JSON arrays to ``data.json`` and
+        ``data_test.json`` and ``(train_data, test_data)`` is returned, which
+        holds every record in memory. Deduplication uses ``dedup_memory_mb``
+        however large the input; raise it for datasets of more than a few
+        million records. The report of the last run is kept in
+        ``self.dataset_report``.
+        """
+        if not output_file.endswith(('.json', '.jsonl')):
+            raise ValueError(f"output_file must end in .jsonl or .json, got {output_file!r}")
+        as_json = output_file.endswith('.json')
+        if as_json and (shard_size or compression):
+            raise ValueError("shard_size and compression need a .jsonl output_file")
+        if records is None:
+            if not self.processed_data:
+                raise ValueError("No processed data available. Process some data sources first.")
+            records = self.processed_data
+
+        options = dict(test_split=test_split, seed=seed, dedup=dedup, dedup_memory_mb=dedup_memory_mb)
+        if not as_json:
+            stem = re.sub(r'\.jsonl$', '', output_file)
+            report = write_training_splits(records, train_stem=stem, test_stem=f"{stem}_test",
+                                           shard_size=shard_size, compression=compression, **options)
+            self.dataset_report = report
+            self._print_duplicates(report)
+            print(f"Training dataset: {report['train_records']} examples -> {', '.join(report['train_files'])}")
+            print(f"Test dataset: {report['test_records']} examples -> {', '.join(report['test_files'])}")
+            return report
+
+        # JSON arrays are written from JSONL splits made the same way
+        with tempfile.TemporaryDirectory(prefix=".dataset-", dir=os.path.dirname(os.path.abspath(output_file))) as tmp:
+            stem = os.path.join(tmp, "data")
+            report = write_training_splits(records, train_stem=stem, test_stem=f"{stem}_test", **options)
+            train_data, test_data = [_read_json_lines(path) for path in report['train_files'] + report['test_files']]
+        self.dataset_report = report
+        self._print_duplicates(report)
+
+        test_file = re.sub(r'\.json$', '_test.json', output_file)
+        for path, data in ((output_file, train_data), (test_file, test_data)):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
         print(f"Training dataset: {len(train_data)} examples -> {output_file}")
         print(f"Test dataset: {len(test_data)} examples -> {test_file}")
-        
+
         return train_data, test_data
 
+    @staticmethod
+    def _print_duplicates(report: Dict[str, Any]):
+        print(f"Removed {report['exact_duplicates']} exact and {report['near_duplicates']} near duplicates "
+              f"({report['duplicate_rate']:.1%})")
+
+
+def _read_json_lines(path: str) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def _map_bounded(pool: ProcessPoolExecutor, func: Callable, items: Iterable, window: int) -> Iterator:
+    """``pool.map`` that reads ``items`` at most ``window`` ahead of the results, in order"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _partition_chat_log(chat_csv: str, directory: str, partitions: int, chunksize: int) -> List[str]:
+    """
+    Split a chat log into CSV files in ``directory`` by a hash of the
+    conversation id, keeping each row's position in the log in a ``row`` column
+    """
+    paths = [os.path.join(directory, f"part-{i:04d}.csv") for i in range(partitions)]
+    for chunk in pd.read_csv(chat_csv, usecols=CHAT_COLUMNS, chunksize=chunksize):
+        # The index continues across chunks
+        chunk['row'] = chunk.index
+        # Hashed as text, so an id hashes the same whichever dtype its chunk was read as
+        part = pd.util.hash_pandas_object(chunk['conversation_id'].astype(str), index=False).to_numpy() % partitions
+        for index, rows in chunk.groupby(part, sort=False):
+            rows.to_csv(paths[index], mode='a', header=not os.path.exists(paths[index]), index=False)
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _chat_pairs(chat_csv: str) -> List[Tuple[int, Dict]]:
+    """
+    Instruction-response records of a chat log or partition, each with the
+    log position of its conversation's first message
+    """
+    df = pd.read_csv(chat_csv, usecols=lambda column: column in CHAT_COLUMNS or column == 'row',
+                     dtype={'role': 'category'})
+    if df.empty:
+        return []
+    if 'row' not in df:
+        df['row'] = df.index
+    
+    # Conversations in order of first appearance, messages by timestamp
+    df['first_row'] = df.groupby('conversation_id', sort=False, dropna=False)['row'].transform('min')
+    df = df.sort_values(['first_row', 'timestamp'], kind='stable', ignore_index=True)
+    
+    # Create instruction-response pairs: every even position that is a user
+    # message followed by another message in the same conversation
+    conversation = df.groupby('first_row', sort=False)
+    position = conversation.cumcount()
+    length = conversation['message'].transform('size')
+    is_pair_start = (position % 2 == 0) & (position + 1 < length) & df['role'].eq('customer')
+    
+    responses = df['message'].shift(-1)
+    records = pd.DataFrame({
+        "instruction": df.loc[is_pair_start, 'message'],
+        "input": "",
+        "output": responses[is_pair_start],
+        "source": "chat_logs",
+        "conversation_id": df.loc[is_pair_start, 'conversation_id'],
+    })
+    return list(zip(df.loc[is_pair_start, 'first_row'].tolist(), records.to_dict('records')))
+
+
 # Example usage
 def main():
     processor = EnterpriseDataProcessor()
@@ -217,10 +311,11 @@ def main():
     # processor.processed_data.extend(processor.process_chat_logs('chat_logs.csv'))
     
     # Clean and filter
-    # processor.processed_data = processor.clean_and_filter_data(processor.processed_data)
+    # processor.processed_data = processor.clean_and_filter_data(processor.processed_data, workers=4)
+    # print(processor.cleaning_report)
     
     # Create final dataset
-    # processor.create_training_dataset('enterprise_training_data.json')
+    # processor.create_training_dataset('enterprise_training_data.jsonl')
     
     print("Data preparation script ready!")
     print("Uncomment and modify the data processing calls in main() function")
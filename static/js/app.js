@@ -26,7 +26,6 @@ class TuneSpaceApp {
     async handleUpload(event) {
         event.preventDefault();
         
-        const formData = new FormData();
         const fileInput = document.getElementById('datasetFile');
         const file = fileInput.files[0];
         
@@ -35,20 +34,14 @@ class TuneSpaceApp {
             return;
         }
 
-        formData.append('file', file);
-
         try {
             this.showSpinner(event.target);
             
-            const response = await fetch(`${this.baseUrl}/api/data/upload`, {
-                method: 'POST',
-                body: formData
-            });
-
+            const response = await this.uploadInChunks(file);
             const result = await response.json();
 
             if (response.ok) {
-                this.showAlert(`File uploaded successfully: ${result.filename}`, 'success');
+                this.showAlert(`File uploaded successfully: ${result.name} (${result.num_samples} samples)`, 'success');
                 fileInput.value = '';
                 this.loadDatasets();
             } else {
@@ -61,6 +54,51 @@ class TuneSpaceApp {
         }
     }
 
+    async uploadInChunks(file) {
+        const chunkSize = 8 * 1024 * 1024;
+        const createResponse = await fetch(`${this.baseUrl}/api/data/uploads`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, total_size: file.size })
+        });
+        if (!createResponse.ok) {
+            return createResponse;
+        }
+        const upload = await createResponse.json();
+        const uploadUrl = `${this.baseUrl}/api/data/uploads/${upload.upload_id}`;
+
+        let offset = 0;
+        let retries = 0;
+        while (offset < file.size) {
+            try {
+                const response = await fetch(`${uploadUrl}?offset=${offset}`, {
+                    method: 'PUT',
+                    body: file.slice(offset, offset + chunkSize)
+                });
+                if (response.status === 400) {
+                    return response;
+                }
+                if (!response.ok) {
+                    throw new Error(`Chunk upload failed with status ${response.status}`);
+                }
+                offset = (await response.json()).offset;
+                retries = 0;
+            } catch (error) {
+                if (++retries > 3) {
+                    throw error;
+                }
+                // Resume from whatever the server actually received
+                const status = await fetch(uploadUrl);
+                if (!status.ok) {
+                    throw error;
+                }
+                offset = (await status.json()).offset;
+            }
+        }
+
+        return fetch(`${uploadUrl}/complete`, { method: 'POST' });
+    }
+
     async handleTraining(event) {
         event.preventDefault();
         
@@ -122,7 +160,12 @@ class TuneSpaceApp {
                 result.datasets.forEach(dataset => {
                     const option = document.createElement('option');
                     option.value = dataset.path;
-                    option.textContent = `${dataset.name} (${this.formatFileSize(dataset.size)})`;
+                    const samples = dataset.num_samples !== null ? `, ${dataset.num_samples} samples` : '';
+                    option.textContent = `${dataset.name} (${this.formatFileSize(dataset.size)}${samples})`;
+                    if (dataset.validation_error) {
+                        option.textContent += ' - invalid';
+                        option.title = dataset.validation_error;
+                    }
                     select.appendChild(option);
                 });
             }
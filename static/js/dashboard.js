@@ -1,12 +1,18 @@
 class Dashboard {
     constructor() {
         this.refreshInterval = null;
+        this.eventSource = null;
+        this.jobs = [];
         this.init();
     }
 
     init() {
         this.refreshJobs();
-        this.startAutoRefresh();
+        if (window.EventSource) {
+            this.connectStream();
+        } else {
+            this.startAutoRefresh();
+        }
     }
 
     async refreshJobs() {
@@ -14,13 +20,43 @@ class Dashboard {
             const response = await fetch('/api/tuning/jobs');
             const result = await response.json();
             
-            this.renderJobsTable(result.jobs);
+            this.jobs = result.jobs;
+            this.renderJobsTable(this.jobs);
         } catch (error) {
             console.error('Failed to refresh jobs:', error);
             this.showError('Failed to load jobs');
         }
     }
 
+    connectStream() {
+        this.eventSource = new EventSource('/api/tuning/jobs/stream');
+
+        // Updates sent while disconnected are lost, so resync after every reconnect
+        let connectedOnce = false;
+        this.eventSource.onopen = () => {
+            if (connectedOnce) {
+                this.refreshJobs();
+            }
+            connectedOnce = true;
+        };
+
+        this.eventSource.addEventListener('jobs', (event) => {
+            this.applyUpdates(JSON.parse(event.data));
+        });
+    }
+
+    applyUpdates(updates) {
+        updates.forEach(update => {
+            const job = this.jobs.find(j => j.job_id === update.job_id);
+            if (job) {
+                Object.assign(job, update);
+            } else if (update.created_at) {
+                this.jobs.unshift(update);
+            }
+        });
+        this.renderJobsTable(this.jobs);
+    }
+
     renderJobsTable(jobs) {
         const container = document.getElementById('jobsTable');
         
@@ -67,7 +103,7 @@ class Dashboard {
                 <td>
                     <code class="text-muted">${job.job_id.substring(0, 8)}...</code>
                 </td>
-                <td>${job.config.model_name}</td>
+                <td>${job.model_name}</td>
                 <td>
                     <span class="job-status ${statusClass}">${job.status}</span>
                 </td>
@@ -83,6 +119,7 @@ class Dashboard {
                         </div>
                     </div>
                     ${job.current_step ? `<small class="text-muted">Step ${job.current_step}/${job.total_steps}</small>` : ''}
+                    ${job.loss !== undefined ? `<small class="text-muted ms-2">Loss ${job.loss.toFixed(4)}</small>` : ''}
                 </td>
                 <td>${createdAt}</td>
                 <td>
@@ -90,7 +127,17 @@ class Dashboard {
                         <button class="btn btn-outline-primary" onclick="dashboard.viewJob('${job.job_id}')" title="View Details">
                             <i class="fas fa-eye"></i>
                         </button>
-                        ${job.status === 'running' ? 
+                        ${job.status === 'running' || job.status === 'pending' ? 
+                            `<button class="btn btn-outline-secondary" onclick="dashboard.pauseJob('${job.job_id}')" title="Pause">
+                                <i class="fas fa-pause"></i>
+                            </button>` : ''
+                        }
+                        ${['paused', 'failed', 'cancelled'].includes(job.status) ? 
+                            `<button class="btn btn-outline-success" onclick="dashboard.resumeJob('${job.job_id}')" title="Resume">
+                                <i class="fas fa-play"></i>
+                            </button>` : ''
+                        }
+                        ${['running', 'pending', 'paused'].includes(job.status) ? 
                             `<button class="btn btn-outline-danger" onclick="dashboard.cancelJob('${job.job_id}')" title="Cancel">
                                 <i class="fas fa-stop"></i>
                             </button>` : ''
@@ -107,7 +154,8 @@ class Dashboard {
             'running': 'status-running',
             'completed': 'status-completed',
             'failed': 'status-failed',
-            'cancelled': 'status-cancelled'
+            'cancelled': 'status-cancelled',
+            'paused': 'status-paused'
         };
         return statusMap[status] || 'status-pending';
     }
@@ -117,7 +165,8 @@ class Dashboard {
             'running': 'bg-primary',
             'completed': 'bg-success',
             'failed': 'bg-danger',
-            'cancelled': 'bg-warning'
+            'cancelled': 'bg-warning',
+            'paused': 'bg-info'
         };
         return classMap[status] || 'bg-secondary';
     }
@@ -134,6 +183,30 @@ class Dashboard {
         }
     }
 
+    renderPhases(metrics) {
+        const phases = (metrics && metrics.phases) || {};
+        const rows = Object.entries(phases).map(([name, stats]) => `
+            <tr>
+                <td>${name}</td>
+                <td>${stats.wall_seconds.toFixed(2)}s</td>
+                <td>${stats.cpu_utilization.toFixed(2)}</td>
+                <td>${stats.peak_rss_mb.toFixed(0)} MB</td>
+            </tr>
+        `).join('');
+        if (!rows) {
+            return '';
+        }
+        return `
+            <div class="mt-3">
+                <h6>Phases</h6>
+                <table class="table table-sm">
+                    <thead><tr><th>Phase</th><th>Wall time</th><th>CPU (cores)</th><th>Peak RSS</th></tr></thead>
+                    <tbody>${rows}</tbody>
+                </table>
+            </div>
+        `;
+    }
+
     showJobModal(job) {
         const modalHtml = `
             <div class="modal fade" id="jobModal" tabindex="-1">
@@ -166,6 +239,7 @@ class Dashboard {
                                     </ul>
                                 </div>
                             </div>
+                            ${this.renderPhases(job.metrics)}
                             ${job.error_message ? `
                                 <div class="mt-3">
                                     <h6>Error Message</h6>
@@ -204,7 +278,6 @@ class Dashboard {
 
             if (response.ok) {
                 this.showSuccess('Job cancelled successfully');
-                this.refreshJobs();
             } else {
                 const result = await response.json();
                 this.showError(`Failed to cancel job: ${result.detail}`);
@@ -215,6 +288,32 @@ class Dashboard {
         }
     }
 
+    async pauseJob(jobId) {
+        await this.jobAction(jobId, 'pause', 'Pause requested; the job stops after saving a checkpoint');
+    }
+
+    async resumeJob(jobId) {
+        await this.jobAction(jobId, 'resume', 'Job resumed from its latest checkpoint');
+    }
+
+    async jobAction(jobId, action, successMessage) {
+        try {
+            const response = await fetch(`/api/tuning/jobs/${jobId}/${action}`, {
+                method: 'POST'
+            });
+
+            if (response.ok) {
+                this.showSuccess(successMessage);
+            } else {
+                const result = await response.json();
+                this.showError(`Failed to ${action} job: ${result.detail}`);
+            }
+        } catch (error) {
+            console.error(`Failed to ${action} job:`, error);
+            this.showError(`Failed to ${action} job`);
+        }
+    }
+
     startAutoRefresh() {
         this.refreshInterval = setInterval(() => {
             this.refreshJobs();
@@ -226,6 +325,10 @@ class Dashboard {
             clearInterval(this.refreshInterval);
             this.refreshInterval = null;
         }
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
     }
 
     showSuccess(message) {
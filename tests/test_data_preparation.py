@@ -0,0 +1,41 @@
+import json
+import pandas as pd
+import pytest
+
+from data_preparation_example import EnterpriseDataProcessor
+
+
+def test_partitioned_chat_logs_match_whole_log(tmp_path):
+    # Conversations interleaved across the log, with messages out of timestamp order
+    rows = []
+    for i in range(40):
+        for conversation in range(7):
+            rows.append((f"c{conversation}", f"2024-01-01T00:{(i * 7) % 60:02d}:{i:02d}",
+                         "customer" if (i + conversation) % 2 == 0 else "agent", f"message {i} of c{conversation}"))
+    path = tmp_path / "chats.csv"
+    pd.DataFrame(rows, columns=["conversation_id", "timestamp", "role", "message"]).to_csv(path, index=False)
+
+    processor = EnterpriseDataProcessor()
+    expected = processor.process_chat_logs(str(path))
+
+    assert expected
+    assert processor.process_chat_logs(str(path), partitions=3, chunksize=17) == expected
+    assert [p.name for p in tmp_path.iterdir()] == ["chats.csv"]
+
+
+def test_training_dataset_keeps_json_arrays_and_tuple_for_json_names(tmp_path):
+    processor = EnterpriseDataProcessor()
+    processor.processed_data = [{"instruction": f"question {i}", "output": f"answer number {i}"} for i in range(20)]
+
+    train, test = processor.create_training_dataset(str(tmp_path / "data.json"), test_split=0.25)
+
+    assert len(train) == 15 and len(test) == 5
+    assert json.loads((tmp_path / "data.json").read_text()) == train
+    assert json.loads((tmp_path / "data_test.json").read_text()) == test
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data.json", "data_test.json"]
+
+    report = processor.create_training_dataset(str(tmp_path / "data.jsonl"), test_split=0.25)
+    assert report["train_records"] == 15 and report == processor.dataset_report
+
+    with pytest.raises(ValueError):
+        processor.create_training_dataset(str(tmp_path / "data.txt"))
@@ -0,0 +1,13 @@
+from core.dataset_writer import MinHashDeduplicator
+
+TEXT = "the customer reports that the service page fails to load after login and the invoice total is wrong"
+
+
+def test_deduplicator_finds_exact_and_near_duplicates_within_and_across_batches():
+    deduplicator = MinHashDeduplicator(memory_mb=1)
+    near = TEXT.replace("invoice", "bill")
+
+    assert deduplicator.check_many([TEXT, "  The CUSTOMER " + TEXT[13:], near]) == [None, "exact", "near"]
+    assert deduplicator.check("a completely different record about shipping labels and refunds") is None
+    assert deduplicator.check(TEXT.upper()) == "exact"
+    assert deduplicator.check(near) == "near"
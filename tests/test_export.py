@@ -0,0 +1,72 @@
+import json
+from datetime import datetime
+import pytest
+from torch import nn
+from core.events import JobEventBroadcaster
+from core.export import quantized_state_dict
+from core.models import FineTuningJob, JobStatus, TrainingConfig
+from core.storage import EXPORT_MANIFEST
+from core.store import JobStore
+from core.training import TrainingManager, _check_export_dir
+
+
+@pytest.fixture
+def job(tmp_path):
+    config = TrainingConfig(model_name="base", dataset_path="data.jsonl", output_dir=str(tmp_path / "job"))
+    return FineTuningJob(job_id="job-1", status=JobStatus.COMPLETED, config=config, created_at=datetime.now())
+
+
+def test_export_dir_must_be_new_empty_or_inside_the_job(tmp_path, job):
+    _check_export_dir(str(tmp_path / "new"), job)
+    (tmp_path / "empty").mkdir()
+    _check_export_dir(str(tmp_path / "empty"), job)
+    (tmp_path / "job" / "export-int8").mkdir(parents=True)
+    (tmp_path / "job" / "export-int8" / "model.safetensors").write_text("")
+    _check_export_dir(str(tmp_path / "job" / "export-int8"), job)
+
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "train.jsonl").write_text("{}\n")
+    with pytest.raises(ValueError):
+        _check_export_dir(str(tmp_path / "data"), job)
+    with pytest.raises(ValueError):
+        _check_export_dir(job.config.output_dir, job)
+
+
+def test_export_dir_may_hold_an_earlier_export_of_the_same_job(tmp_path, job):
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / EXPORT_MANIFEST).write_text(json.dumps({"job_id": "job-1", "files": []}))
+    _check_export_dir(str(tmp_path / "out"), job)
+
+    (tmp_path / "out" / EXPORT_MANIFEST).write_text(json.dumps({"job_id": "job-2", "files": []}))
+    with pytest.raises(ValueError):
+        _check_export_dir(str(tmp_path / "out"), job)
+
+
+def test_int4_skips_layers_that_do_not_fit_group_size_and_fails_when_none_do():
+    model = nn.Sequential(nn.Linear(64, 32), nn.Linear(32, 8))
+
+    state, quantized, skipped = quantized_state_dict(model, 4, group_size=64)
+    assert quantized == ["0"] and skipped == ["1"]
+    assert "0.weight_packed" in state and "1.weight" in state
+
+    with pytest.raises(ValueError):
+        quantized_state_dict(model, 4, group_size=128)
+
+
+def test_export_events_after_a_restart_update_the_persisted_export(tmp_path, job):
+    store = JobStore(f"sqlite:///{tmp_path / 'jobs.db'}")
+    job.metrics = {"export": {"status": "pending", "quantization": "int8"}}
+    store.save(job)
+
+    # A new API process: the export was queued by the previous one
+    manager = TrainingManager.__new__(TrainingManager)
+    manager.store, manager.exports, manager.events = store, {}, JobEventBroadcaster()
+    manager._handle_worker_event("export-job-1", "started", {})
+    manager._handle_worker_event("export-job-1", "completed", {"bytes": 10})
+
+    export = store.get("job-1").metrics["export"]
+    assert export["status"] == "completed" and export["bytes"] == 10
+
+    # Events of an export that is no longer pending or running are ignored
+    manager._handle_worker_event("export-job-1", "failed", {"error": "late"})
+    assert store.get("job-1").metrics["export"]["status"] == "completed"
@@ -0,0 +1,32 @@
+import os
+from core.dataset_writer import ShardedJSONLWriter
+from core.storage import ContentStore
+
+
+def _write(stem, records):
+    writer = ShardedJSONLWriter(stem)
+    for record in records:
+        writer.write(record)
+    return writer.close()
+
+
+def test_rewriting_a_deduplicated_dataset_leaves_other_copies_unchanged(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    records = [{"text": f"sample {i}"} for i in range(100)]
+    _write(str(data_dir / "train"), records)
+    _write(str(data_dir / "train_copy"), records)
+    original = (data_dir / "train_copy.jsonl").read_bytes()
+
+    store = ContentStore(str(tmp_path / "blobs"), min_bytes=0)
+    assert store.add_tree(str(data_dir)) == (1, len(original))
+    assert os.stat(data_dir / "train.jsonl").st_ino == os.stat(data_dir / "train_copy.jsonl").st_ino
+
+    _write(str(data_dir / "train"), [{"text": "rewritten"}])
+
+    assert (data_dir / "train.jsonl").read_text() == '{"text": "rewritten"}\n'
+    assert (data_dir / "train_copy.jsonl").read_bytes() == original
+    blob = store.blob_path(next(p.name for p in (tmp_path / "blobs").rglob("*") if p.is_file()))
+    with open(blob, "rb") as f:
+        assert f.read() == original
+    assert sorted(os.listdir(data_dir)) == ["train.jsonl", "train_copy.jsonl"]
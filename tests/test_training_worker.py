@@ -0,0 +1,28 @@
+import queue
+from datetime import datetime
+import pytest
+from transformers import GPT2Config, GPT2LMHeadModel
+from core import training_worker
+from core.model_registry import ModelRegistry
+from core.models import FineTuningJob, JobStatus, TrainingConfig
+from core.scheduler import JobReporter
+
+
+def test_base_model_is_not_left_in_use_when_lora_wrapping_fails(tmp_path, monkeypatch):
+    model_dir = str(tmp_path / "gpt2")
+    GPT2LMHeadModel(GPT2Config(n_layer=1, n_embd=16, n_head=2, vocab_size=64)).save_pretrained(model_dir)
+    registry = ModelRegistry(max_bytes=1024 ** 3)
+    registry._tokenizers[model_dir] = object()
+    monkeypatch.setattr(training_worker, "get_model_registry", lambda: registry)
+
+    config = TrainingConfig(model_name=model_dir, dataset_path="data.jsonl", output_dir=str(tmp_path / "job"))
+    job = FineTuningJob(job_id="job-1", status=JobStatus.RUNNING, config=config, created_at=datetime.now())
+    events = queue.Queue()
+
+    # GPT-2 has no q_proj/k_proj/v_proj/o_proj layers for the adapter
+    with pytest.raises(ValueError):
+        training_worker._load_and_train(job, JobReporter(job.job_id, events))
+
+    assert registry.loaded() == []
+    phases = [data["phases"] for _, kind, data in events.queue if kind == "log"][-1]
+    assert "lora_wrap" in phases
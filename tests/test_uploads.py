@@ -0,0 +1,53 @@
+import asyncio
+import json
+import aiofiles
+import pytest
+from core.uploads import UploadSession
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_chunk_retried_after_a_failed_write_is_counted_once(tmp_path, monkeypatch):
+    lines = [json.dumps({"text": f"sample {i}"}).encode() + b"\n" for i in range(4)]
+    first, second = b"".join(lines[:2]), b"".join(lines[2:])
+    session = UploadSession("train.jsonl", str(tmp_path))
+    real_open = aiofiles.open
+    opened = []
+
+    class FailingWrites:
+        """The second append fails like a full disk"""
+
+        def __init__(self, context):
+            self.context = context
+
+        async def __aenter__(self):
+            await self.context.__aenter__()
+            return self
+
+        async def __aexit__(self, *exc):
+            return await self.context.__aexit__(*exc)
+
+        async def write(self, chunk):
+            raise OSError("No space left on device")
+
+    def flaky_open(*args, **kwargs):
+        opened.append(args)
+        context = real_open(*args, **kwargs)
+        return FailingWrites(context) if len(opened) == 2 else context
+
+    monkeypatch.setattr(aiofiles, "open", flaky_open)
+
+    async def upload():
+        assert await session.write(_chunks(first), 0) == len(first)
+        with pytest.raises(OSError):
+            await session.write(_chunks(second), len(first))
+        assert session.offset == len(first)
+        assert await session.write(_chunks(second), len(first)) == len(first) + len(second)
+        return await session.complete()
+
+    info = asyncio.run(upload())
+    assert info.num_samples == 4
+    assert (tmp_path / "train.jsonl").read_bytes() == first + second
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Worker node for WORKER_MODE=redis: claims queued jobs from REDIS_URL that fit
+this machine's declared capacity and runs them until stopped with Ctrl+C or
+SIGTERM. Start one per machine; datasets and job output directories must be
+on storage shared with the API and the other nodes.
+
+    python worker.py --cpus 16 --memory-gb 64 --max-jobs 2
+"""
+
+import argparse
+import logging
+import os
+import signal
+from config import config
+from core.distributed import WorkerNode, get_redis_client
+from core.scheduler import available_cores, partition_cores
+
+
+def total_memory_gb() -> float:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3
+    except (AttributeError, ValueError, OSError):
+        return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cpus", type=float, default=config.WORKER_CPUS or len(available_cores()),
+                        help="CPUs jobs may use on this node (default: WORKER_CPUS, else all)")
+    parser.add_argument("--memory-gb", type=float, default=config.WORKER_MEMORY_GB or total_memory_gb(),
+                        help="Memory jobs may use on this node (default: WORKER_MEMORY_GB, else all)")
+    parser.add_argument("--max-jobs", type=int, default=config.WORKER_MAX_JOBS,
+                        help="Jobs run at once (default: WORKER_MAX_JOBS)")
+    parser.add_argument("--redis-url", default=config.REDIS_URL)
+    parser.add_argument("--worker-id", help="Defaults to <hostname>-<pid>-<random>")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    node = WorkerNode(
+        get_redis_client(args.redis_url),
+        cpus=args.cpus,
+        memory_gb=args.memory_gb,
+        max_jobs=args.max_jobs,
+        worker_id=args.worker_id,
+        heartbeat_interval=config.WORKER_HEARTBEAT_SECONDS,
+        worker_timeout=config.WORKER_TIMEOUT_SECONDS,
+        shutdown_grace=config.SHUTDOWN_GRACE_SECONDS,
+        core_sets=partition_cores(args.max_jobs) if config.PIN_WORKER_CORES else None,
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: node.stop())
+    node.run()
+
+
+if __name__ == "__main__":
+    main()